@@ -63,6 +63,10 @@ def create_app(test_config=None):
     # Initialisiere Datenbank
     db.init_app(app)
     migrate.init_app(app, db)
+
+    # Gemeinsamer Event-Loop für asynchrone Arbeit (Marktdaten, Hintergrund-Aktualisierungen)
+    from .utils.async_runtime import async_runtime
+    async_runtime.init_app(app)
     
     with app.app_context():
         # Importiere Modelle vor der Datenbankerstellung
@@ -75,6 +79,26 @@ def create_app(test_config=None):
         from . import routes
         routes.init_routes(app)
         
+        # Registriere CLI-Befehle
+        from . import cli
+        cli.init_cli(app)
+
+        # Hintergrund-Abgleich der Booklooker-Importstatus
+        from .utils.booklooker_sync_service import booklooker_sync_worker
+        booklooker_sync_worker.init_app(app)
+
+        # Hintergrund-Abgleich der eBay-Angebotsstatus
+        from .utils.ebay_listing_sync import ebay_listing_sync_worker
+        ebay_listing_sync_worker.init_app(app)
+
+        # Löschen der Bilder gelöschter Bücher im Hintergrund
+        from .utils.image_deleter import image_deleter
+        image_deleter.init_app(app)
+
+        # Marktplatzübergreifender Bestandsabgleich nach Verkäufen
+        from .utils.stock_sync import stock_sync_worker
+        stock_sync_worker.init_app(app)
+        
         # Füge 'float' zur Jinja2-Umgebung hinzu
         app.jinja_env.globals.update(float=float)
         
@@ -2,13 +2,17 @@ import os
 import json
 import logging
 import requests
-import tempfile
 import traceback
 import csv
+import io
 import time
 import re
-from datetime import datetime
+import threading
+import uuid
+from datetime import datetime, timedelta
 from functools import wraps
+from requests.adapters import HTTPAdapter
+from app.utils.sparten_index import get_sparten_index
 
 def retry_on_failure(max_retries=3, delay=1):
     """Decorator für Retry-Logik bei API-Aufrufen"""
@@ -31,13 +35,45 @@ def retry_on_failure(max_retries=3, delay=1):
         return wrapper
     return decorator
 
+class BooklookerAuthError(Exception):
+    """Authentifizierung bei Booklooker fehlgeschlagen"""
+
+
 class BooklookerAPI:
+    # Grenzen einer Importdatei; größere Exporte werden auf mehrere Dateien verteilt
+    MAX_IMPORT_ROWS = int(os.getenv('BOOKLOOKER_MAX_IMPORT_ROWS', 5000))
+    MAX_IMPORT_BYTES = int(os.getenv('BOOKLOOKER_MAX_IMPORT_BYTES', 10 * 1024 * 1024))
+    # Höchstens so viele Bytes einer Importdatei werden (auf DEBUG-Ebene) protokolliert
+    LOG_CONTENT_LIMIT = 2000
+    # Gültigkeit eines Tokens; Booklooker-Tokens laufen nach 10 Minuten ab
+    TOKEN_TTL = timedelta(seconds=int(os.getenv('BOOKLOOKER_TOKEN_TTL', 540)))
+    # Zeitlimits (Verbindungsaufbau, Antwort) in Sekunden
+    TIMEOUT = (5, 30)
+    UPLOAD_TIMEOUT = (5, 120)
+    # Größe des Verbindungspools
+    POOL_SIZE = 10
+    # dataType von /file_import: Artikel ergänzen/aktualisieren bzw. löschen
+    DATA_TYPE_UPDATE = 0
+    DATA_TYPE_DELETE = int(os.getenv('BOOKLOOKER_DELETE_DATA_TYPE', 2))
+    # Endpunkt des Artikel-Exports (TSV im Format der Importvorlage)
+    EXPORT_PATH = os.getenv('BOOKLOOKER_EXPORT_PATH', 'article_export')
+    # Endpunkte für Bestellungen und das sofortige Entfernen einzelner Artikel
+    ORDER_PATH = os.getenv('BOOKLOOKER_ORDER_PATH', 'order')
+    ARTICLE_PATH = os.getenv('BOOKLOOKER_ARTICLE_PATH', 'article')
+
     def __init__(self):
         """Initialisiert die Booklooker API mit Zugangsdaten aus Umgebungsvariablen"""
         self.api_key = os.getenv('BOOKLOOKER_API_KEY', '').strip('" ')
         self.base_url = "https://api.booklooker.de/2.0"
         self.token = None
+        self.token_expires_at = None
+        self._auth_lock = threading.RLock()
+
+        # Gepoolte Keep-Alive-Session für alle Anfragen
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         if not self.api_key:
             logging.warning("Booklooker API-Key fehlt. Bitte setzen Sie BOOKLOOKER_API_KEY.")
@@ -95,12 +131,16 @@ class BooklookerAPI:
             logging.error("Booklooker API-Key fehlt. Authentifizierung nicht möglich.")
             return False
         
+        with self._auth_lock:
+            return self._authenticate()
+
+    def _authenticate(self):
         try:
             logging.info(f"Starte Booklooker Authentifizierung")
             
-            response = requests.post(f"{self.base_url}/authenticate", params={
+            response = self.session.post(f"{self.base_url}/authenticate", params={
                 "apiKey": self.api_key
-            })
+            }, timeout=self.TIMEOUT)
             
             # Debug-Log für HTTP-Details
             logging.debug(f"Auth Response Status: {response.status_code}")
@@ -112,13 +152,13 @@ class BooklookerAPI:
             try:
                 data = response.json()
                 if data.get("status") == "OK" and "returnValue" in data:
-                    self.token = data["returnValue"]
+                    self._set_token(data["returnValue"])
                     logging.info("Booklooker Authentifizierung erfolgreich")
                     return True
             except json.JSONDecodeError:
                 # Wenn kein JSON, prüfe ob die Antwort direkt ein Token ist
                 if response_text and len(response_text) == 32:  # Booklooker Tokens sind 32 Zeichen lang
-                    self.token = response_text
+                    self._set_token(response_text)
                     logging.info("Booklooker Authentifizierung erfolgreich (Raw Token)")
                     return True
             
@@ -132,11 +172,69 @@ class BooklookerAPI:
             logging.error(f"Unerwarteter Fehler bei der Authentifizierung: {str(e)}")
             return False
 
+    def _set_token(self, token):
+        self.token = token
+        self.token_expires_at = datetime.utcnow() + self.TOKEN_TTL
+
+    def _token_valid(self):
+        return self.token is not None and self.token_expires_at is not None \
+            and datetime.utcnow() < self.token_expires_at
+
     def check_token(self):
         """Prüft, ob ein gültiges Token vorhanden ist, andernfalls neu authentifizieren"""
-        if self.token is None:
-            return self.authenticate()
-        return True
+        if self._token_valid():
+            return True
+        with self._auth_lock:
+            # Ein anderer Thread hat währenddessen eventuell schon authentifiziert
+            if self._token_valid():
+                return True
+            return self._authenticate()
+
+    def invalidate_token(self, token):
+        """Verwirft das Token, sofern es nicht bereits von einem anderen Thread erneuert wurde"""
+        with self._auth_lock:
+            if self.token == token:
+                self.token = None
+                self.token_expires_at = None
+
+    @staticmethod
+    def _token_rejected(response, inspect_body=True):
+        """Erkennt Antworten, die auf ein ungültiges oder abgelaufenes Token hinweisen"""
+        if response.status_code == 401:
+            return True
+        if not inspect_body:
+            return False
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        return isinstance(data, dict) and data.get('status') != 'OK' \
+            and 'token' in str(data.get('returnValue', '')).lower()
+
+    def _request(self, method, path, params=None, timeout=None, **kwargs):
+        """
+        Sendet eine Anfrage mit Token über die gepoolte Session. Wird das Token
+        abgelehnt, wird einmal neu authentifiziert und die Anfrage wiederholt.
+        """
+        response = None
+        for attempt in range(2):
+            if not self.check_token():
+                raise BooklookerAuthError('Authentifizierung bei Booklooker fehlgeschlagen')
+            token = self.token
+            response = self.session.request(
+                method,
+                f"{self.base_url}/{path}",
+                params={**(params or {}), 'token': token},
+                timeout=timeout or self.TIMEOUT,
+                **kwargs
+            )
+            # Gestreamte Antworten nicht vorab einlesen
+            if attempt == 0 and self._token_rejected(response, inspect_body=not kwargs.get('stream')):
+                logging.info("Booklooker-Token abgelehnt, authentifiziere neu")
+                self.invalidate_token(token)
+                continue
+            break
+        return response
 
     def clean_description(self, text):
         """Bereinigt die Beschreibung für das Booklooker-Format"""
@@ -177,139 +275,113 @@ class BooklookerAPI:
         
         return text
         
+    def _book_to_row(self, book):
+        """Erzeugt die Zeile eines Buches in der Spaltenreihenfolge der Booklooker-Importdatei"""
+        # Beschreibung bereinigen
+        description = self.clean_description(
+            book.description if hasattr(book, 'description') and book.description
+            else "Gut erhaltenes Exemplar."
+        )
+
+        # Bereite die Buchdaten vor
+        # Validierte Spartennummer, ohne Angabe aus Genre und Titel vorgeschlagen
+        sparte = self.validate_sparte(getattr(book, 'sparte', '')) or self.suggest_sparte(book)
+        author = getattr(book, 'author', '') or ''
+        author = str(author).strip()
+        title = str(getattr(book, 'title', '')).strip()
+        publisher = getattr(book, 'publisher', '') or ''
+        publisher = str(publisher).strip()
+        edition = getattr(book, 'edition', '') or ''
+        edition = str(edition).strip()
+        year = getattr(book, 'publication_year', '') or ''
+        year = str(year).strip()
+        location = getattr(book, 'publication_location', '') or ''
+        location = str(location).strip()
+        binding = getattr(book, 'binding', 'Gebundene Ausgabe') or 'Gebundene Ausgabe'
+        binding = str(binding).strip()
+        condition = self.map_condition(getattr(book, 'condition', 'Gut'))
+        language = "de"
+        isbn = getattr(book, 'isbn', '') or ''
+        isbn = str(isbn).strip()
+        pages = getattr(book, 'pages', '') or ''
+        pages = str(pages).strip()
+        format_info = getattr(book, 'format', '') or ''
+        format_info = str(format_info).strip()
+        order_nr = getattr(book, 'id', None)
+        if order_nr is None:
+            order_nr = f"BK-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_nr = str(order_nr).strip()
+        weight = getattr(book, 'weight', '') or ''
+        weight = str(weight).strip()
+        price = f"{float(getattr(book, 'price', 0.0)):.2f}"
+
+        # Spalten in der korrekten Booklooker-Reihenfolge
+        return [
+            sparte,            # Sparten-Nr.
+            author,            # Autor
+            title,             # Titel
+            publisher,         # Verlag
+            edition,           # Auflage
+            year,              # Jahr
+            location,          # Ort
+            binding,           # Einband
+            condition,         # Zustand (1-4)
+            description,       # Beschreibung
+            language,          # Sprache
+            isbn,              # ISBN
+            pages,             # Seiten
+            format_info,       # Format
+            order_nr,          # Bestell-Nr
+            weight,            # Gewicht in g
+            price,             # Ihr Preis in €
+            "",               # unbenutzt
+            "",               # unbenutzt
+            "",               # Cover-URL
+            "",               # Stichwort
+            "nein",           # unbegrenzte Stückzahl?
+            "nein",           # Neuware?
+            "nein",           # Erstausgabe?
+            "nein"            # Signiert?
+        ]
+
     def create_booklooker_format(self, book):
-        """Erstellt eine Textdatei im Booklooker-Format für ein einzelnes Buch"""
-        tmp_dir = None
-        file_path = None
-        
+        """Erzeugt den Inhalt einer Booklooker-Importdatei für ein einzelnes Buch (UTF-8, im Speicher)"""
         try:
-            # Temporäres Verzeichnis erstellen
-            tmp_dir = tempfile.mkdtemp()
-            logging.debug(f"Temporäres Verzeichnis erstellt: {tmp_dir}")
-            
-            # Dateipfad generieren
-            file_path = os.path.join(tmp_dir, f"book_{book.id}.txt")
-            logging.debug(f"Temporärer Dateipfad: {file_path}")
-            
-            # Beschreibung bereinigen
-            description = self.clean_description(
-                book.description if hasattr(book, 'description') and book.description
-                else "Gut erhaltenes Exemplar."
-            )
-            
-            # Bereite die Buchdaten vor
-            sparte = self.validate_sparte(getattr(book, 'sparte', ''))  # Validiere Spartennummer
-            author = getattr(book, 'author', '') or ''
-            author = str(author).strip()
-            title = str(getattr(book, 'title', '')).strip()
-            publisher = getattr(book, 'publisher', '') or ''
-            publisher = str(publisher).strip()
-            edition = getattr(book, 'edition', '') or ''
-            edition = str(edition).strip()
-            year = getattr(book, 'publication_year', '') or ''
-            year = str(year).strip()
-            location = getattr(book, 'publication_location', '') or ''
-            location = str(location).strip()
-            binding = getattr(book, 'binding', 'Gebundene Ausgabe') or 'Gebundene Ausgabe'
-            binding = str(binding).strip()
-            condition = self.map_condition(getattr(book, 'condition', 'Gut'))
-            language = "de"
-            isbn = getattr(book, 'isbn', '') or ''
-            isbn = str(isbn).strip()
-            pages = getattr(book, 'pages', '') or ''
-            pages = str(pages).strip()
-            format_info = getattr(book, 'format', '') or ''
-            format_info = str(format_info).strip()
-            order_nr = getattr(book, 'id', None)
-            if order_nr is None:
-                order_nr = f"BK-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            order_nr = str(order_nr).strip()
-            weight = getattr(book, 'weight', '') or ''
-            weight = str(weight).strip()
-            price = f"{float(getattr(book, 'price', 0.0)):.2f}"
-
-            # Datei schreiben
-            with open(file_path, 'w', encoding='utf-8', newline='') as tmp_file:
-                writer = csv.writer(tmp_file,
-                                  delimiter='\t',
-                                  quoting=csv.QUOTE_MINIMAL,
-                                  quotechar='"')
-                
-                # Schreibe die Daten in der korrekten Booklooker-Reihenfolge
-                writer.writerow([
-                    sparte,            # Sparten-Nr.
-                    author,            # Autor
-                    title,             # Titel
-                    publisher,         # Verlag
-                    edition,           # Auflage
-                    year,              # Jahr
-                    location,          # Ort
-                    binding,           # Einband
-                    condition,         # Zustand (1-4)
-                    description,       # Beschreibung
-                    language,          # Sprache
-                    isbn,              # ISBN
-                    pages,             # Seiten
-                    format_info,       # Format
-                    order_nr,          # Bestell-Nr
-                    weight,            # Gewicht in g
-                    price,             # Ihr Preis in €
-                    "",               # unbenutzt
-                    "",               # unbenutzt
-                    "",               # Cover-URL
-                    "",               # Stichwort
-                    "nein",           # unbegrenzte Stückzahl?
-                    "nein",           # Neuware?
-                    "nein",           # Erstausgabe?
-                    "nein"            # Signiert?
-                ])
-                
-                tmp_file.flush()
-                os.fsync(tmp_file.fileno())
-            
-            # Überprüfe die erstellte Datei
-            with open(file_path, 'r', encoding='utf-8') as test_file:
-                content = test_file.read()
-                logging.info(f"Erstellte Booklooker-Datei ({len(content)} Zeichen):")
-                logging.info("=== Dateiinhalt Anfang ===")
-                logging.info(content)
-                logging.info("=== Dateiinhalt Ende ===")
-                
-            return file_path, tmp_dir
-            
+            content = self._format_row(self._book_to_row(book))
+            self._log_content(f"book_{book.id}.txt", content)
+            return content
         except Exception as e:
             logging.error(f"Fehler beim Erstellen der Booklooker-Datei: {str(e)}")
-            if tmp_dir and os.path.exists(tmp_dir):
-                try:
-                    if file_path and os.path.exists(file_path):
-                        os.unlink(file_path)
-                    os.rmdir(tmp_dir)
-                except Exception as cleanup_error:
-                    logging.error(f"Fehler beim Aufräumen: {str(cleanup_error)}")
-            return None, None
-    
+            return None
+
+    def _log_content(self, filename, content):
+        """Protokolliert den Dateiinhalt nur auf DEBUG-Ebene und gekürzt"""
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+        preview = content[:self.LOG_CONTENT_LIMIT].decode('utf-8', errors='replace')
+        suffix = ' [gekürzt]' if len(content) > self.LOG_CONTENT_LIMIT else ''
+        logging.debug(f"Booklooker-Datei {filename} ({len(content)} Bytes):\n{preview}{suffix}")
+
     def validate_sparte(self, sparte):
-        """Validiert eine Spartennummer für Bücher"""
-        # Liste gültiger Sparten aus der Booklooker-Vorlage
-        valid_sparten = {
-            "2573", "886", "887", "881", "880", "1806", "2968", "2534", "873",
-            "879", "878", "877", "884", "883", "693", "885", "882", "665",
-            "666", "667", "960", "2648", "668", "798", "2008", "669", "670",
-            "671", "672", "673", "674", "1211", "675", "874", "876", "875",
-            "2561", "2597", "3031", "2932", "680"
-            # Weitere Sparten können hier hinzugefügt werden
-        }
-        
+        """Validiert eine Spartennummer gegen die vollständige Booklooker-Spartenliste"""
         if not sparte:
             return ""  # Leere Sparte ist erlaubt
             
         sparte = str(sparte).strip()
-        if sparte not in valid_sparten:
+        if not get_sparten_index().is_valid(sparte):
             logging.warning(f"Ungültige Spartennummer: {sparte}")
             return ""
             
         return sparte
 
+    def suggest_sparte(self, book):
+        """Schlägt eine Spartennummer aus Genre, Titel und Sprache des Buches vor ('' wenn keine passt)"""
+        return get_sparten_index().best_match(
+            getattr(book, 'genre', None),
+            getattr(book, 'title', None),
+            getattr(book, 'language', None)
+        ) or ""
+
     def map_condition(self, condition):
         """Konvertiert Zustandsbeschreibungen in Booklooker Zahlenwerte (1-4)"""
         # Erst englische in deutsche Zustände übersetzen
@@ -332,128 +404,316 @@ class BooklookerAPI:
         german_condition = condition_translation.get(condition, condition)
         return condition_values.get(german_condition, '3')  # Standardmäßig "3" (Gut)
     
+    def _format_row(self, row, writer=None, buffer=None):
+        """
+        Serialisiert eine Zeile als TSV im Booklooker-Format (UTF-8). Für viele Zeilen
+        können Writer und Puffer (aus _row_writer) wiederverwendet werden.
+        """
+        if writer is None:
+            writer, buffer = self._row_writer()
+        writer.writerow(row)
+        line = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    @staticmethod
+    def _row_writer():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer,
+                            delimiter='\t',
+                            quoting=csv.QUOTE_MINIMAL,
+                            quotechar='"',
+                            lineterminator='\r\n')
+        return writer, buffer
+
+    def iter_import_files(self, books, errors, prefix=None, validate_price=True):
+        """
+        Erzeugt die Importdateien für beliebig viele Bücher nacheinander im Speicher.
+
+        Eine neue Datei wird begonnen, sobald MAX_IMPORT_ROWS Zeilen oder MAX_IMPORT_BYTES
+        erreicht wären; es liegt also höchstens eine Datei gleichzeitig im Speicher.
+        Liefert Dicts mit filename, content (Bytes), book_ids und size. Bücher, die die
+        Validierung nicht bestehen, werden übersprungen und in `errors` (Buch-ID ->
+        Fehlermeldung) eingetragen.
+        """
+        # Eindeutiger Präfix, damit sich Statusabfragen verschiedener Uploads nicht überschneiden
+        prefix = prefix or f"booklooker_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        count = 0
+        buffer = io.BytesIO()
+        book_ids = []
+        writer, row_buffer = self._row_writer()
+
+        def _finish():
+            content = buffer.getvalue()
+            filename = f"{prefix}_{count:03d}.txt"
+            self._log_content(filename, content)
+            return {
+                'filename': filename,
+                'content': content,
+                'book_ids': list(book_ids),
+                'size': len(content)
+            }
+
+        for book in books:
+            is_valid, validation_errors = self.validate_book_data(book, validate_price=validate_price)
+            if not is_valid:
+                errors[book.id] = ', '.join(validation_errors)
+                continue
+            try:
+                line = self._format_row(self._book_to_row(book), writer, row_buffer)
+            except Exception as e:
+                errors[book.id] = f"Fehler beim Erstellen der Zeile: {str(e)}"
+                continue
+
+            if book_ids and (len(book_ids) >= self.MAX_IMPORT_ROWS
+                             or buffer.tell() + len(line) > self.MAX_IMPORT_BYTES):
+                yield _finish()
+                buffer = io.BytesIO()
+                book_ids = []
+
+            if not book_ids:
+                count += 1
+            buffer.write(line)
+            book_ids.append(book.id)
+
+        if book_ids:
+            yield _finish()
+
+    def write_import_files(self, books, directory, prefix=None, validate_price=True):
+        """
+        Schreibt beliebig viele Bücher in eine oder mehrere Importdateien im Verzeichnis
+        (Export ohne Upload). Liefert (Dateien, Fehler): Dateien als Liste von Dicts mit
+        path, filename, book_ids und size; Fehler als Dict Buch-ID -> Fehlermeldung.
+        """
+        files = []
+        errors = {}
+        for import_file in self.iter_import_files(books, errors, prefix=prefix, validate_price=validate_price):
+            path = os.path.join(directory, import_file.pop('filename'))
+            with open(path, 'wb') as handle:
+                handle.write(import_file.pop('content'))
+            files.append({'path': path, 'filename': os.path.basename(path), **import_file})
+
+        logging.info(f"Booklooker-Export: {sum(len(f['book_ids']) for f in files)} Zeilen in "
+                     f"{len(files)} Datei(en), {len(errors)} Bücher übersprungen")
+        return files, errors
+
     @retry_on_failure(max_retries=3, delay=1)
-    def upload_book(self, book):
-        """Lädt ein einzelnes Buch zu Booklooker hoch"""
+    def _upload_import_file(self, filename, content, data_type=DATA_TYPE_UPDATE):
+        """Sendet den Inhalt einer Importdatei an /file_import"""
+        # API Parameter
+        params = {
+            "fileType": "article",
+            "dataType": data_type,
+            "mediaType": 0,
+            "formatID": 1,
+            "encoding": "UTF-8"
+        }
+
+        # Datei als Multipart-Form senden
+        files = {
+            'file': (filename, content, 'text/plain; charset=utf-8')
+        }
+
+        logging.info(f"Sende Datei {filename} zu Booklooker...")
+        response = self._request(
+            'POST',
+            'file_import',
+            params=params,
+            files=files,
+            timeout=self.UPLOAD_TIMEOUT
+        )
+        logging.info(f"Booklooker Response: Status={response.status_code}, Content={response.text[:200]}")
+
+        # Upload erfolgreich
+        if response.status_code == 200 and ('OK' in response.text or 'success' in response.text.lower()):
+            logging.info(f"Upload erfolgreich, Datei {filename} wurde angenommen")
+            return {
+                'success': True,
+                'message': 'Datei erfolgreich zu Booklooker hochgeladen',
+                'file_status': 'FILE_RECEIVED',
+                'filename': filename  # Dateiname für spätere Status-Abfragen
+            }
+
+        # Verarbeite die Response
+        response_text = response.text.strip()
         try:
-            logging.info(f"Starte Upload für Buch: {book.title}")
-            
-            # Authentifizierung prüfen
-            if not self.check_token():
-                return {
+            data = response.json()
+            error = data.get('returnValue', 'Unbekannter Fehler')
+            return {
+                'success': False,
+                'error': error,
+                'message': f'Booklooker Fehler: {error}'
+            }
+        except json.JSONDecodeError:
+            return {
+                'success': False,
+                'error': 'Invalid response',
+                'message': f'Unerwartete API-Antwort: {response_text[:200]}'
+            }
+
+    def upload_books(self, books, validate_price=True):
+        """
+        Lädt beliebig viele Bücher in möglichst wenigen Importdateien zu Booklooker hoch.
+
+        Liefert neben dem Gesamtergebnis pro Datei und pro Buch (results, nach Buch-ID)
+        ob der Upload angenommen wurde, mit Dateiname bzw. Fehlermeldung.
+        """
+        results = {}
+        file_results = []
+
+        # Authentifizierung einmal für den gesamten Export
+        if not self.check_token():
+            return {
+                'success': False,
+                'error': 'Authentication failed',
+                'message': 'Authentifizierung bei Booklooker fehlgeschlagen',
+                'files': [],
+                'results': {
+                    book.id: {'success': False, 'message': 'Authentifizierung bei Booklooker fehlgeschlagen'}
+                    for book in books
+                }
+            }
+
+        errors = {}
+        for import_file in self.iter_import_files(books, errors, validate_price=validate_price):
+            try:
+                result = self._upload_import_file(import_file['filename'], import_file['content'])
+            except requests.exceptions.RequestException as e:
+                result = {
                     'success': False,
-                    'error': 'Authentication failed',
-                    'message': 'Authentifizierung bei Booklooker fehlgeschlagen'
+                    'error': 'connection_error',
+                    'message': f"Verbindungsfehler beim Upload zu Booklooker: {str(e)}"
                 }
-            
-            # Erstelle die Textdatei im Booklooker-Format
-            file_path, tmp_dir = self.create_booklooker_format(book)
-            if not file_path or not tmp_dir:
-                return {
+            except Exception as e:
+                logging.error(f"Stack trace: {traceback.format_exc()}")
+                result = {
                     'success': False,
-                    'error': 'File creation failed',
-                    'message': 'Fehler beim Erstellen der Upload-Datei'
+                    'error': 'unknown_error',
+                    'message': f"Unerwarteter Fehler beim Upload: {str(e)}"
                 }
-            
-            logging.debug(f"Datei erstellt und bereit zum Upload: {file_path}")
-            
-            try:
-                # Prüfe Dateiinhalt vor dem Upload
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    logging.info("=== Zu sendender Dateiinhalt ===")
-                    logging.info(content)
-                    logging.info("==============================")
-                
-                # Datei hochladen
-                with open(file_path, 'rb') as file:
-                    # API Parameter
-                    params = {
-                        "token": self.token,
-                        "fileType": "article",
-                        "dataType": 0,
-                        "mediaType": 0,
-                        "formatID": 1,
-                        "encoding": "UTF-8"
-                    }
-                    
-                    # Datei als Multipart-Form senden
-                    files = {
-                        'file': ('book.txt', file, 'text/plain; charset=utf-8')
-                    }
-                    
-                    logging.debug(f"Sende Upload-Request mit Parametern: {params}")
-                    
-                    # Hier könnten wir optional auch multipart/form-data verwenden
-                    # POST-Request senden
-                    # Upload durchführen
-                    logging.info("Sende Datei zu Booklooker...")
-                    response = requests.post(
-                        f"{self.base_url}/file_import",
-                        params=params,
-                        files=files
-                    )
-                    logging.info(f"Booklooker Response: Status={response.status_code}, Content={response.text[:200]}")
-                    
-                    # Upload erfolgreich
-                    if response.status_code == 200 and ('OK' in response.text or 'success' in response.text.lower()):
-                        logging.info("Upload erfolgreich, Datei wurde angenommen")
-                        return {
-                            'success': True,
-                            'message': 'Buch erfolgreich zu Booklooker hochgeladen',
-                            'file_status': 'FILE_RECEIVED',
-                            'filename': 'book.txt'  # Speichere den Dateinamen für spätere Status-Abfragen
-                        }
-                    
-                    # Verarbeite die Response
-                    response_text = response.text.strip()
-                    logging.debug(f"Upload Response: Status={response.status_code}, Content={response_text[:200]}")
-
-                    try:
-                        data = response.json()
-                        if data.get("status") != "OK":
-                            error = data.get('returnValue', 'Unbekannter Fehler')
-                            return {
-                                'success': False,
-                                'error': error,
-                                'message': f'Booklooker Fehler: {error}'
-                            }
-                    except json.JSONDecodeError:
-                        if not ("OK" in response_text or "success" in response_text.lower()):
-                            return {
-                                'success': False,
-                                'error': 'Invalid response',
-                                'message': f'Unerwartete API-Antwort: {response_text[:200]}'
-                            }
-            finally:
-                try:
-                    # Aufräumen: Datei und Verzeichnis löschen
-                    if os.path.exists(file_path):
-                        os.unlink(file_path)
-                        logging.debug(f"Temporäre Datei gelöscht: {file_path}")
-                    if os.path.exists(tmp_dir):
-                        os.rmdir(tmp_dir)
-                        logging.debug(f"Temporäres Verzeichnis gelöscht: {tmp_dir}")
-                except Exception as cleanup_error:
-                    logging.error(f"Fehler beim Aufräumen: {str(cleanup_error)}")
-                
+            if not result['success']:
+                logging.error(f"Upload von {import_file['filename']} fehlgeschlagen: {result['message']}")
+
+            file_results.append({
+                'filename': import_file['filename'],
+                'rows': len(import_file['book_ids']),
+                'size': import_file['size'],
+                'success': result['success'],
+                'message': result['message']
+            })
+            for book_id in import_file['book_ids']:
+                results[book_id] = {
+                    'success': result['success'],
+                    'message': result['message'],
+                    'filename': import_file['filename'],
+                    'file_status': result.get('file_status')
+                }
+        for book_id, message in errors.items():
+            results[book_id] = {'success': False, 'message': f'Validierungsfehler: {message}'}
+
+        uploaded = sum(1 for result in results.values() if result['success'])
+        return {
+            'success': bool(results) and uploaded == len(results),
+            'message': f'{uploaded} von {len(results)} Büchern zu Booklooker hochgeladen',
+            'files': file_results,
+            'results': results
+        }
+
+    def delete_articles(self, order_numbers):
+        """
+        Entfernt Artikel anhand ihrer Bestell-Nr. mit einer Löschdatei (nur die Spalte
+        Bestell-Nr. ist gefüllt). Liefert das Ergebnis des Datei-Uploads.
+        """
+        order_numbers = [str(number) for number in order_numbers]
+        if not order_numbers:
+            return {'success': True, 'message': 'Keine Artikel zu entfernen', 'filename': None}
+        if not self.check_token():
+            return {
+                'success': False,
+                'error': 'Authentication failed',
+                'message': 'Authentifizierung bei Booklooker fehlgeschlagen'
+            }
+
+        writer, row_buffer = self._row_writer()
+        content = io.BytesIO()
+        for number in order_numbers:
+            row = [''] * 25
+            row[14] = number  # Bestell-Nr
+            content.write(self._format_row(row, writer, row_buffer))
+        filename = f"booklooker_delete_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.txt"
+        self._log_content(filename, content.getvalue())
+        try:
+            return self._upload_import_file(filename, content.getvalue(), data_type=self.DATA_TYPE_DELETE)
         except requests.exceptions.RequestException as e:
-            error_msg = f"Verbindungsfehler beim Upload zu Booklooker: {str(e)}"
-            logging.error(error_msg)
             return {
                 'success': False,
                 'error': 'connection_error',
-                'message': error_msg
+                'message': f"Verbindungsfehler beim Upload zu Booklooker: {str(e)}"
             }
-        except Exception as e:
-            error_msg = f"Unerwarteter Fehler beim Upload: {str(e)}"
-            logging.error(error_msg)
-            logging.error(f"Stack trace: {traceback.format_exc()}")
+
+    def get_orders(self, date_from, date_to):
+        """
+        Bestellungen im Zeitraum (Tagesgenauigkeit). Liefert je bestelltem Artikel die
+        Bestell-Nr. (= Buch-ID), die Bestellnummer und das Bestelldatum.
+        """
+        if not self.check_token():
+            raise BooklookerAuthError('Authentifizierung bei Booklooker fehlgeschlagen')
+        response = self._request('GET', self.ORDER_PATH, params={
+            'dateFrom': date_from.strftime('%Y-%m-%d'),
+            'dateTo': date_to.strftime('%Y-%m-%d')
+        })
+        response.raise_for_status()
+        data = response.json()
+        if data.get('status') != 'OK':
+            raise ValueError(f"Booklooker Fehler: {data.get('returnValue')}")
+
+        orders = data.get('returnValue') or []
+        if isinstance(orders, dict):
+            orders = [orders]
+        items = []
+        for order in orders:
+            order_items = order.get('orderItems') or order.get('items') or []
+            if isinstance(order_items, dict):
+                order_items = [order_items]
+            for item in order_items:
+                order_no = item.get('orderNo') or item.get('orderNumber') or item.get('articleNumber')
+                if order_no:
+                    items.append({
+                        'order_no': str(order_no),
+                        'order_id': str(order.get('orderId', '')),
+                        'order_date': order.get('orderDate') or order.get('date')
+                    })
+        return items
+
+    def remove_article(self, order_no):
+        """
+        Entfernt einen Artikel sofort aus dem Bestand. Lehnt Booklooker das ab, wird
+        ersatzweise eine Löschdatei hochgeladen (wird asynchron verarbeitet).
+        """
+        try:
+            response = self._request('DELETE', self.ARTICLE_PATH, params={'orderNo': str(order_no)})
+            if response.ok and response.json().get('status') == 'OK':
+                return {'success': True, 'message': 'Artikel bei Booklooker entfernt'}
+            logging.warning(f"Booklooker-Artikel {order_no} nicht direkt entfernt: {response.text[:200]}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.warning(f"Booklooker-Artikel {order_no} nicht direkt entfernt: {str(e)}")
+        return self.delete_articles([order_no])
+
+    def upload_book(self, book):
+        """Lädt ein einzelnes Buch zu Booklooker hoch (Sonderfall von upload_books)"""
+        logging.info(f"Starte Upload für Buch: {book.title}")
+        bulk = self.upload_books([book])
+        result = bulk['results'].get(book.id)
+        if result is None:
             return {
                 'success': False,
-                'error': 'unknown_error',
-                'message': error_msg
+                'error': bulk.get('error', 'unknown_error'),
+                'message': bulk['message']
             }
+        if result['success']:
+            result['message'] = 'Buch erfolgreich zu Booklooker hochgeladen'
+        return result
     
     @retry_on_failure(max_retries=3, delay=1)
     def check_file_status(self, filename):
@@ -468,13 +728,7 @@ class BooklookerAPI:
                 }
             
             # Status abfragen
-            response = requests.get(
-                f"{self.base_url}/file_status",
-                params={
-                    "token": self.token,
-                    "filename": filename
-                }
-            )
+            response = self._request('GET', 'file_status', params={"filename": filename})
             response.raise_for_status()
             
             data = response.json()
@@ -490,7 +744,14 @@ class BooklookerAPI:
                 'file_status': data['returnValue'],
                 'message': f"Dateistatus: {data['returnValue']}"
             }
-            
+
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Verbindungsfehler beim Prüfen des Dateistatus: {str(e)}")
+            return {
+                'success': False,
+                'error': 'connection_error',
+                'message': f"Verbindungsfehler beim Prüfen des Dateistatus: {str(e)}"
+            }
         except Exception as e:
             logging.error(f"Fehler beim Prüfen des Dateistatus: {str(e)}")
             return {
@@ -499,6 +760,47 @@ class BooklookerAPI:
                 'message': 'Fehler beim Prüfen des Dateistatus'
             }
             
+    def download_article_export(self, target, chunk_size=64 * 1024):
+        """Lädt den Artikel-Export gestreamt in `target` (binär geöffnete Datei), liefert die Bytezahl"""
+        if not self.check_token():
+            raise BooklookerAuthError('Authentifizierung bei Booklooker fehlgeschlagen')
+
+        size = 0
+        response = self._request('GET', self.EXPORT_PATH, params={'fileType': 'article'},
+                                 timeout=self.UPLOAD_TIMEOUT, stream=True)
+        with response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=chunk_size)
+            first = next(chunks, b'')
+            self._check_export_response(response, first)
+            target.write(first)
+            size += len(first)
+            for chunk in chunks:
+                target.write(chunk)
+                size += len(chunk)
+        logging.info(f"Booklooker-Artikelexport geladen: {size} Bytes")
+        return size
+
+    @staticmethod
+    def _check_export_response(response, first_chunk):
+        """
+        Stellt sicher, dass der Export eine TSV-Datei ist. Fehler meldet Booklooker als
+        JSON (status/returnValue) mit HTTP 200; ein solcher Export darf nicht als leerer
+        Bestand abgeglichen werden.
+        """
+        content_type = response.headers.get('Content-Type', '').lower()
+        head = first_chunk.lstrip()[:1]
+        if 'json' not in content_type and 'html' not in content_type and head not in (b'{', b'<'):
+            return
+        try:
+            data = json.loads(first_chunk.decode('utf-8', errors='replace'))
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            raise ValueError(f"Booklooker Fehler beim Artikelexport: {data.get('returnValue', data.get('status'))}")
+        raise ValueError(f"Unerwartete Antwort beim Artikelexport ({content_type or 'ohne Content-Type'}), "
+                         f"keine TSV-Datei")
+
     def get_status_message(self, status):
         """Gibt eine benutzerfreundliche Statusmeldung zurück"""
         status_map = {
@@ -513,4 +815,22 @@ class BooklookerAPI:
             'ERROR': 'Fehler beim Import',
             'UNKNOWN': 'Status unbekannt'
         }
-        return status_map.get(status, status)
\ No newline at end of file
+        return status_map.get(status, status)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_booklooker_api():
+    """
+    Liefert den prozessweiten Booklooker-Client. Token und Verbindungspool werden
+    so von allen Requests und Hintergrundjobs gemeinsam genutzt.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BooklookerAPI()
+    return _client
+
@@ -0,0 +1,274 @@
+import click
+from datetime import timedelta
+
+
+def init_cli(app):
+    """Registriert die Kommandozeilenbefehle der Anwendung (flask <befehl>)."""
+
+    @app.cli.command('reprice')
+    @click.option('--max-age-hours', default=24.0, show_default=True,
+                  help='Bücher mit jüngerer Marktanalyse werden übersprungen')
+    @click.option('--chunk-size', default=200, show_default=True,
+                  help='Anzahl Bücher pro Block und Commit')
+    @click.option('--concurrency', default=8, show_default=True,
+                  help='Maximale Zahl gleichzeitiger Upstream-Anfragen')
+    @click.option('--limit', type=int, default=None, help='Höchstens so viele Bücher verarbeiten')
+    @click.option('--force-refresh', is_flag=True, help='Marktdaten-Cache ignorieren')
+    @click.option('--restart', is_flag=True, help='Checkpoint ignorieren und von vorn beginnen')
+    @click.option('--push-ebay', is_flag=True, help='Geänderte Preise anschließend an aktive eBay-Angebote übertragen')
+    def reprice(max_age_hours, chunk_size, concurrency, limit, force_refresh, restart, push_ebay):
+        """Bepreist den Bestand anhand aktueller Marktdaten neu."""
+        from app.utils.repricing_service import RepricingService
+
+        service = RepricingService(
+            max_age=timedelta(hours=max_age_hours),
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            force_refresh=force_refresh
+        )
+        stats = service.run(
+            resume=not restart,
+            limit=limit,
+            progress=lambda s: click.echo(
+                f"{s['processed']} Bücher, {s['price_changes']} Preisänderungen, "
+                f"{s['books_per_minute']} Bücher/min"
+            )
+        )
+        click.echo(
+            f"Fertig: {stats['processed']} Bücher verarbeitet, {stats['price_changes']} Preisänderungen, "
+            f"{stats['no_market_data']} ohne Marktdaten, {stats['errors']} Fehler, "
+            f"{stats['books_per_minute']} Bücher/min"
+            + ('' if stats['completed'] else ' (unvollständig, wird beim nächsten Lauf fortgesetzt)')
+        )
+        if push_ebay:
+            ctx = click.get_current_context()
+            ctx.invoke(ebay_revise_prices)
+
+    @app.cli.command('booklooker-upload')
+    @click.option('--ids', default='', help='Kommagetrennte Buch-IDs; ohne Angabe alle noch nicht hochgeladenen Bücher')
+    @click.option('--export-dir', type=click.Path(file_okay=False), default=None,
+                  help='Importdateien nur in dieses Verzeichnis schreiben, nicht hochladen')
+    def booklooker_upload(ids, export_dir):
+        """Lädt Bücher gebündelt in möglichst wenigen Importdateien zu Booklooker hoch."""
+        import os
+        from app import db
+        from app.controllers.booklooker_controller import BooklookerController
+
+        try:
+            book_ids = [int(book_id) for book_id in ids.split(',') if book_id.strip()]
+        except ValueError:
+            raise click.BadParameter('Buch-IDs müssen Zahlen sein', param_hint='--ids')
+
+        booklooker = BooklookerController()
+        books = booklooker.books_for_upload(book_ids).all()
+        if not books:
+            click.echo('Keine Bücher für den Upload gefunden')
+            return
+
+        if export_dir:
+            os.makedirs(export_dir, exist_ok=True)
+            files, errors = booklooker.api.write_import_files(books, export_dir)
+            for import_file in files:
+                click.echo(f"{import_file['path']}: {len(import_file['book_ids'])} Zeilen, {import_file['size']} Bytes")
+            for book_id, message in errors.items():
+                click.echo(f"Buch {book_id} übersprungen: {message}")
+            return
+
+        result = booklooker.upload_books(books)
+        db.session.commit()
+        for import_file in result['files']:
+            click.echo(f"{import_file['filename']}: {import_file['rows']} Zeilen, "
+                       f"{'OK' if import_file['success'] else import_file['message']}")
+        for book_id, row in result['results'].items():
+            if not row['success']:
+                click.echo(f"Buch {book_id}: {row['message']}")
+        click.echo(result['message'])
+
+    @app.cli.command('booklooker-sync')
+    @click.option('--limit', type=int, default=None, help='Höchstens so viele Importdateien prüfen')
+    @click.option('--batch-size', default=50, show_default=True,
+                  help='Anzahl Importdateien pro Block und Commit')
+    @click.option('--concurrency', default=4, show_default=True,
+                  help='Maximale Zahl gleichzeitiger Statusabfragen')
+    def booklooker_sync(limit, batch_size, concurrency):
+        """Gleicht den Importstatus offener Booklooker-Uploads ab."""
+        from app.utils.booklooker_sync_service import BooklookerSyncService
+        from app.utils.single_flight import try_advisory_lock
+
+        with try_advisory_lock(BooklookerSyncService.LOCK_KEY) as acquired:
+            if not acquired:
+                click.echo('Booklooker-Abgleich läuft bereits in einem anderen Prozess')
+                return
+            stats = BooklookerSyncService(batch_size=batch_size, concurrency=concurrency).run(limit=limit)
+        click.echo(
+            f"Fertig: {stats['files_checked']} Dateien geprüft, {stats['books_updated']} Bücher aktualisiert "
+            f"({stats['imported']} importiert, {stats['failed']} abgelehnt, {stats['still_pending']} offen), "
+            f"{stats['errors']} Fehler"
+        )
+
+    @app.cli.command('booklooker-reconcile')
+    @click.option('--file', 'path', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='Lokale Exportdatei statt des aktuellen Booklooker-Exports')
+    @click.option('--apply', is_flag=True, help='Statuskorrekturen übernehmen')
+    @click.option('--prices', type=click.Choice(['local', 'remote']), default=None,
+                  help='Preisabweichungen beheben: local = erneut hochladen, remote = Booklooker-Preis übernehmen')
+    @click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None,
+                  help='Vollständigen Diff als JSON in diese Datei schreiben')
+    @click.option('--force', is_flag=True,
+                  help='Auch anwenden, wenn der Export leer ist oder viele gelistete Bücher fehlen')
+    def booklooker_reconcile(path, apply, prices, output, force):
+        """Gleicht den Booklooker-Bestand mit der Datenbank ab."""
+        import json
+        from app.utils.booklooker_reconciliation import BooklookerReconciliation
+
+        diff = BooklookerReconciliation().run(path, apply=apply or bool(prices), prices=prices, force=force)
+        if output:
+            with open(output, 'w', encoding='utf-8') as handle:
+                json.dump(diff, handle, ensure_ascii=False, indent=2)
+        summary = diff['summary']
+        click.echo(
+            f"{diff['rows']} Artikel geprüft: {summary['missing']} fehlen bei Booklooker, "
+            f"{summary['extra']} unbekannt, {summary['price_mismatch']} Preisabweichungen, "
+            f"{summary['status_mismatch']} Statusabweichungen, {summary['duplicates']} doppelt"
+        )
+        if 'refused' in diff:
+            click.echo(f"Nicht angewendet: {diff['refused']}. Mit --force trotzdem übernehmen.")
+        if 'applied' in diff:
+            applied = diff['applied']
+            click.echo(
+                f"Angewendet: {applied['activated']} aktiviert, {applied['removed']} als entfernt markiert, "
+                f"{applied['prices_updated']} Preise übernommen, {applied['prices_uploaded']} Preise hochgeladen"
+            )
+
+    @app.cli.command('booklooker-delta-sync')
+    @click.option('--limit', default=5000, show_default=True, help='Höchstens so viele Änderungen pro Lauf')
+    def booklooker_delta_sync(limit):
+        """Überträgt geänderte und gelöschte Bücher seit dem letzten Lauf zu Booklooker."""
+        from app.utils.booklooker_delta_sync import BooklookerDeltaSync
+        from app.utils.booklooker_sync_service import BooklookerSyncService
+        from app.utils.single_flight import try_advisory_lock
+
+        with try_advisory_lock(BooklookerSyncService.LOCK_KEY) as acquired:
+            if not acquired:
+                click.echo('Booklooker-Abgleich läuft bereits in einem anderen Prozess')
+                return
+            stats = BooklookerDeltaSync(limit=limit).run()
+        click.echo(
+            f"{stats['changed']} geänderte Bücher, {stats['uploaded']} hochgeladen, {stats['failed']} fehlgeschlagen, "
+            f"{stats['removed']} entfernt" + ('' if stats['success'] else ' (wird beim nächsten Lauf wiederholt)')
+        )
+
+    @app.cli.command('ebay-categories')
+    @click.option('--force', is_flag=True, help='Kategoriebaum unabhängig von der Version neu laden')
+    def ebay_categories(force):
+        """Prüft die eBay-CategoryVersion und aktualisiert den lokalen Kategoriebaum bei Bedarf."""
+        from app.ebay_api import EbayAPI, SITE_ID
+        from app.utils.ebay_category_index import get_category_store
+
+        result = get_category_store(SITE_ID).refresh(EbayAPI().api, force=force)
+        click.echo(
+            f"Version {result['version']}: {result['categories']} Kategorien"
+            + (' (neu geladen)' if result['updated'] else ' (unverändert)')
+        )
+
+    @app.cli.command('ebay-bulk-list')
+    @click.option('--ids', default='', help='Kommagetrennte Buch-IDs; ohne Angabe alle noch nicht eingestellten Bücher')
+    @click.option('--concurrency', default=4, show_default=True, help='Gleichzeitige eBay-Aufrufe')
+    @click.option('--batch-size', default=50, show_default=True, help='Anzahl Bücher pro Block und Commit')
+    @click.option('--limit', type=int, default=None, help='Höchstens so viele Bücher einstellen')
+    def ebay_bulk_list(ids, concurrency, batch_size, limit):
+        """Stellt Bücher gesammelt mit begrenzter Parallelität bei eBay ein."""
+        from app.utils.ebay_bulk_lister import EbayBulkLister
+
+        try:
+            book_ids = [int(book_id) for book_id in ids.split(',') if book_id.strip()] or None
+        except ValueError:
+            raise click.BadParameter('Buch-IDs müssen Zahlen sein', param_hint='--ids')
+
+        stats = EbayBulkLister(concurrency=concurrency, batch_size=batch_size).run(
+            book_ids=book_ids,
+            limit=limit,
+            progress=lambda s: click.echo(f"{s['processed']}/{s['total']} Bücher, {s['items_per_minute']} Bücher/min")
+        )
+        click.echo(
+            f"{stats['listed']} eingestellt ({stats['warnings']} mit Warnungen), {stats['failed']} fehlgeschlagen, "
+            f"{stats['skipped']} übersprungen"
+        )
+
+    @app.cli.command('ebay-sync')
+    @click.option('--full', is_flag=True,
+                  help='Alle laufenden und in den letzten 119 Tagen beendeten Angebote abgleichen')
+    @click.option('--entries-per-page', default=200, show_default=True,
+                  help='Angebote pro GetSellerList-Seite (nur beim vollständigen Abgleich)')
+    def ebay_sync(full, entries_per_page):
+        """Gleicht die Status aktiver, verkaufter und beendeter eBay-Angebote ab."""
+        from app.utils.ebay_listing_sync import EbayListingSync
+
+        stats = EbayListingSync(entries_per_page=entries_per_page).run(full=full)
+        click.echo(
+            f"{stats['items']} Angebote seit {stats['mod_time_from']} ({stats['mode']}, {stats['pages']} Antworten), "
+            f"{stats['updated']} Bücher aktualisiert, {stats['unmatched']} ohne Buch: {stats['statuses']}"
+        )
+
+    @app.cli.command('cleanup-images')
+    @click.option('--min-age-days', default=7, show_default=True, help='Nur verwaiste Bilder löschen, die älter sind')
+    @click.option('--dry-run', is_flag=True, help='Verwaiste Bilder nur zählen')
+    def cleanup_images(min_age_days, dry_run):
+        """Löscht Bilder im GCS-Bucket, die mit keinem Buch mehr verknüpft sind."""
+        from app.utils.cleanup_service import CleanupService
+
+        stats = CleanupService(max_orphan_age=timedelta(days=min_age_days)).sweep_orphaned_images(dry_run=dry_run)
+        click.echo(
+            f"{stats['scanned']} Bilder in {stats['duration_seconds']}s geprüft ({stats['blobs_per_second']}/s), "
+            f"{stats['referenced']} verknüpft, {stats['orphaned']} verwaist "
+            f"({stats['orphaned_size'] / (1024 * 1024):.1f} MB), {stats['too_young']} zu jung"
+        )
+        if not dry_run:
+            click.echo(
+                f"{stats['deleted']} gelöscht ({stats['deletes_per_second']}/s, {stats['delete_requests']} Batch-Anfragen), "
+                f"{stats['missing']} bereits entfernt, {stats['failed']} fehlgeschlagen"
+            )
+
+    @app.cli.command('stock-sync')
+    def stock_sync():
+        """Fragt Verkäufe auf allen Marktplätzen ab und beendet die übrigen Angebote."""
+        from app.utils.single_flight import try_advisory_lock
+        from app.utils.stock_sync import StockSyncService, propagation_stats
+
+        with try_advisory_lock(StockSyncService.LOCK_KEY) as acquired:
+            if not acquired:
+                click.echo('Bestandsabgleich läuft bereits in einem anderen Prozess')
+                return
+            stats = StockSyncService().run_once()
+        click.echo(
+            f"{stats['sales']} neue Verkäufe, {stats['propagated']} weitergegeben, {stats['failed']} fehlgeschlagen, "
+            f"{stats['retried']} wiederholt, {stats['duplicates']} bereits bekannt"
+        )
+        for marketplace, error in stats['errors'].items():
+            click.echo(f"Fehler bei {marketplace}: {error}")
+        metrics = propagation_stats()
+        if metrics['count']:
+            click.echo(
+                f"Verzögerung (7 Tage, {metrics['count']} Verkäufe): p50 {metrics['p50_seconds']}s, "
+                f"p95 {metrics['p95_seconds']}s, max {metrics['max_seconds']}s, "
+                f"{metrics['over_target']} über dem Ziel von {metrics['target_seconds']:.0f}s"
+            )
+
+    @app.cli.command('ebay-revise-prices')
+    @click.option('--ids', default='', help='Kommagetrennte Buch-IDs; ohne Angabe alle geänderten Preise')
+    @click.option('--concurrency', default=4, show_default=True, help='Gleichzeitige eBay-Aufrufe')
+    @click.option('--limit', type=int, default=None, help='Höchstens so viele Angebote ändern')
+    def ebay_revise_prices(ids='', concurrency=4, limit=None):
+        """Überträgt seit der letzten eBay-Synchronisation geänderte Preise (ReviseInventoryStatus)."""
+        from app.utils.ebay_price_revision import EbayPriceRevision
+
+        try:
+            book_ids = [int(book_id) for book_id in ids.split(',') if book_id.strip()] or None
+        except ValueError:
+            raise click.BadParameter('Buch-IDs müssen Zahlen sein', param_hint='--ids')
+
+        stats = EbayPriceRevision(concurrency=concurrency).run(book_ids=book_ids, limit=limit)
+        click.echo(
+            f"{stats['revised']} eBay-Preise übertragen, {stats['failed']} fehlgeschlagen, "
+            f"{stats['skipped']} übersprungen ({stats['calls']} Aufrufe)"
+        )
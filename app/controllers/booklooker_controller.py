@@ -1,11 +1,12 @@
 import logging
 import os
 from datetime import datetime
-from ..booklooker_api import BooklookerAPI
+from ..booklooker_api import get_booklooker_api
 
 class BooklookerController:
-    def __init__(self):
-        self.api = BooklookerAPI()
+    def __init__(self, api=None):
+        # Prozessweiter Client: Token und Verbindungen werden zwischen Requests geteilt
+        self.api = api or get_booklooker_api()
         
     def verify_connection(self):
         """Überprüft die Verbindung zu Booklooker"""
@@ -36,19 +37,59 @@ class BooklookerController:
         
         # Buch hochladen
         result = self.api.upload_book(book)
-        
+        self._apply_upload_result(book, result)
         if result['success']:
             logging.info(f"Buch wurde erfolgreich zu Booklooker hochgeladen")
-            # Status aktualisieren
+        else:
+            logging.error(f"Fehler beim Hochladen zu Booklooker: {result.get('message', '')}")
+        
+        return result
+
+    def upload_books(self, books):
+        """
+        Lädt mehrere Bücher gebündelt auf Booklooker hoch und aktualisiert den
+        Upload-Status jedes Buches. Committet nicht.
+        """
+        books = list(books)
+        result = self.api.upload_books(books)
+        for book in books:
+            book_result = result['results'].get(book.id)
+            if book_result is not None:
+                self._apply_upload_result(book, book_result)
+        logging.info(result['message'])
+        return result
+
+    @staticmethod
+    def books_for_upload(book_ids=None):
+        """
+        Bücher für einen Sammel-Upload: die angegebenen IDs oder alle Bücher mit Preis,
+        die noch nicht oder nicht erfolgreich hochgeladen wurden.
+        """
+        from sqlalchemy import or_
+        from app.models import Book
+
+        query = Book.query
+        if book_ids:
+            query = query.filter(Book.id.in_(book_ids))
+        else:
+            query = query.filter(
+                Book.price > 0,
+                or_(Book.booklooker_status.is_(None), Book.booklooker_status == 'error')
+            )
+        return query.order_by(Book.id)
+
+    def _apply_upload_result(self, book, result):
+        """Überträgt das Upload-Ergebnis auf die Booklooker-Felder des Buches"""
+        if result['success']:
             book.booklooker_status = 'pending'
+            book.booklooker_upload_file = result.get('filename')
+            book.booklooker_import_status = result.get('file_status') or 'PENDING'
+            book.booklooker_listing_error = None
             book.booklooker_last_sync = datetime.utcnow()
         else:
-            logging.error(f"Fehler beim Hochladen zu Booklooker: {result.get('message', '')}")
             book.booklooker_listing_error = result.get('message', 'Unbekannter Fehler')
             book.booklooker_status = 'error'
         
-        return result
-        
     def check_file_status(self, filename):
         """Überprüft den Status einer hochgeladenen Datei"""
         if not self.api.check_token():
@@ -10,6 +10,7 @@ from PIL import Image
 from flask import current_app as app
 import requests # Hinzugefügt für URL-Downloads
 import io # Hinzugefügt für BytesIO
+from app.utils.single_flight import open_library_flight
 
 class ImageAnalysisController:
     def __init__(self, api_key: str):
@@ -30,9 +31,11 @@ class ImageAnalysisController:
                 raise ValueError(error_msg)
 
 
-    def analyze_book_images(self, book_id: int, image_urls: List[str]) -> Dict[str, Any]: # Parameter umbenannt
+    def analyze_book_images(self, book_id: int, image_urls: List[str],
+                            include_market_research: bool = True) -> Dict[str, Any]: # Parameter umbenannt
         """
         Analysiert mehrere Buchbilder von URLs und extrahiert relevante Metadaten.
+        Mit include_market_research=False entfällt die aufwendige Marktrecherche im Prompt.
         """
         try:
             # Lade alle Bilder von URLs
@@ -60,7 +63,7 @@ class ImageAnalysisController:
                  raise ValueError("Keine Bilder konnten erfolgreich von URLs geladen werden.")
             
             # Erstelle den Analyse-Prompt
-            prompt = self._create_analysis_prompt()
+            prompt = self._create_analysis_prompt(include_market_research)
             app.logger.info(f"Gemini-Prompt wird gesendet:\n{prompt[:500]}...") # Log Prompt Start
             
             # Führe Gemini-Analyse mit allen Bildern durch
@@ -95,42 +98,14 @@ class ImageAnalysisController:
                 'processing_timestamp': datetime.utcnow().isoformat()
             }
 
-    def _create_analysis_prompt(self) -> str:
+    def _create_analysis_prompt(self, include_market_research: bool = True) -> str:
         """
         Erstellt einen detaillierten Prompt für die Gemini-Analyse.
+        Ohne Marktrecherche entfallen die Vergleichsangebote und die Preisempfehlung;
+        abgefragt wird dann nur der Neupreis.
         """
-        return """
-        Analysiere die bereitgestellten Buchbilder und führe eine umfassende Recherche durch.
-        Beachte dabei alle sichtbaren Details auf den Bildern (Cover, Rückseite, Impressum etc.).
-
-        1. Grundinformationen extrahieren:
-        - Deutscher Titel und Originaltitel (falls abweichend)
-        - Autor(en)
-        - ISBN/EAN
-        - Verlag
-        - Erscheinungsjahr
-        - Auflage/Edition (mit Details wie "Erstausgabe", "limitiert" etc.)
-        - Format (Hardcover/Paperback/Sonderformat)
-        - Seitenanzahl
-        - Sprache
-        - Genre/Kategorie
-        
-        2. Maße und physische Eigenschaften:
-        - WICHTIG: Suche auf den Bildern nach einem Zollstock/Maßband
-        - Miss die Länge, Breite und Höhe des Buches anhand des Zollstocks/Maßbands
-        - Gib die Maße in Zentimetern an (Länge x Breite x Höhe)
-        - Achte auf korrekte Perspektive und Ausrichtung bei der Messung
-        - Vermerke wenn kein Maßstab im Bild erkennbar ist
-
-        3. Zustandsanalyse (basierend auf allen Bildern):
-        - Detaillierte Beschreibung des Zustands
-        - Vorhandene Mängel oder Besonderheiten
-        - Gebrauchsspuren
-        - Zustandseinschätzung (Neu/Wie neu/Sehr gut/Gut/Akzeptabel)
-        - Vollständigkeit (falls erkennbar)
-        - Besondere Merkmale oder Schäden
-
-        3. Preisrecherche und Marktanalyse:
+        if include_market_research:
+            market_section = """        3. Preisrecherche und Marktanalyse:
         - Neupreis (wenn verfügbar, z.B. von Rückseite oder Verlagsangabe)
 
         - Marktrecherche (basierend auf aktuellen Online-Angeboten):
@@ -164,46 +139,8 @@ class ImageAnalysisController:
             - Saisonale Faktoren
             - Aktuelle Markttrends
 
-        4. Zusatzinformationen:
-        - Kurze Inhaltszusammenfassung
-        - Zielgruppe
-        - Besonderheiten der Edition
-        - Auszeichnungen/Rezensionen
-        - Sammlungsrelevanz
-        - Historische oder kulturelle Bedeutung
-
-        Formatiere die Ausgabe als JSON mit folgender Struktur:
-        {
-            "metadata": {
-                "deutscher_titel": string,
-                "originaltitel": string,
-                "autor": string,
-                "isbn": string,
-                "verlag": string,
-                "erscheinungsjahr": number,
-                "auflage": string,
-                "format": string,
-                "seitenanzahl": number,
-                "sprache": string,
-                "genre": string
-            },
-            "physical_properties": {
-                "dimensions": {
-                    "length": number,  // Länge in cm
-                    "width": number,   // Breite in cm
-                    "height": number,  // Höhe in cm
-                    "measurement_confidence": number,  // Konfidenz der Messung (0-1)
-                    "measurement_method": string,  // z.B. "Zollstock im Bild"
-                    "notes": string    // Zusätzliche Bemerkungen zur Messung
-                }
-            },
-            "condition_analysis": {
-                "zustand_beschreibung": string,
-                "maengel_besonderheiten": string,
-                "zustand_einschätzung": string,
-                "confidence_score": number
-            },
-            "market_data": {
+"""
+            market_format = """            "market_data": {
                 "neupreis": {
                     "preis": string (format: "X.XX EUR"),
                     "quelle": string
@@ -337,7 +274,91 @@ class ImageAnalysisController:
                 },
                 "confidence_score": number
             },
-            "additional_info": {
+"""
+        else:
+            market_section = """        3. Preisangaben:
+        - Neupreis (wenn verfügbar, z.B. von Rückseite oder Verlagsangabe)
+        - Keine Marktrecherche durchführen, die Preisermittlung erfolgt anhand vorhandener Vergleichsangebote
+
+"""
+            market_format = """            "market_data": {
+                "neupreis": {
+                    "preis": string (format: "X.XX EUR"),
+                    "quelle": string
+                }
+            },
+"""
+        return """
+        Analysiere die bereitgestellten Buchbilder und führe eine umfassende Recherche durch.
+        Beachte dabei alle sichtbaren Details auf den Bildern (Cover, Rückseite, Impressum etc.).
+
+        1. Grundinformationen extrahieren:
+        - Deutscher Titel und Originaltitel (falls abweichend)
+        - Autor(en)
+        - ISBN/EAN
+        - Verlag
+        - Erscheinungsjahr
+        - Auflage/Edition (mit Details wie "Erstausgabe", "limitiert" etc.)
+        - Format (Hardcover/Paperback/Sonderformat)
+        - Seitenanzahl
+        - Sprache
+        - Genre/Kategorie
+        
+        2. Maße und physische Eigenschaften:
+        - WICHTIG: Suche auf den Bildern nach einem Zollstock/Maßband
+        - Miss die Länge, Breite und Höhe des Buches anhand des Zollstocks/Maßbands
+        - Gib die Maße in Zentimetern an (Länge x Breite x Höhe)
+        - Achte auf korrekte Perspektive und Ausrichtung bei der Messung
+        - Vermerke wenn kein Maßstab im Bild erkennbar ist
+
+        3. Zustandsanalyse (basierend auf allen Bildern):
+        - Detaillierte Beschreibung des Zustands
+        - Vorhandene Mängel oder Besonderheiten
+        - Gebrauchsspuren
+        - Zustandseinschätzung (Neu/Wie neu/Sehr gut/Gut/Akzeptabel)
+        - Vollständigkeit (falls erkennbar)
+        - Besondere Merkmale oder Schäden
+
+""" + market_section + """        4. Zusatzinformationen:
+        - Kurze Inhaltszusammenfassung
+        - Zielgruppe
+        - Besonderheiten der Edition
+        - Auszeichnungen/Rezensionen
+        - Sammlungsrelevanz
+        - Historische oder kulturelle Bedeutung
+
+        Formatiere die Ausgabe als JSON mit folgender Struktur:
+        {
+            "metadata": {
+                "deutscher_titel": string,
+                "originaltitel": string,
+                "autor": string,
+                "isbn": string,
+                "verlag": string,
+                "erscheinungsjahr": number,
+                "auflage": string,
+                "format": string,
+                "seitenanzahl": number,
+                "sprache": string,
+                "genre": string
+            },
+            "physical_properties": {
+                "dimensions": {
+                    "length": number,  // Länge in cm
+                    "width": number,   // Breite in cm
+                    "height": number,  // Höhe in cm
+                    "measurement_confidence": number,  // Konfidenz der Messung (0-1)
+                    "measurement_method": string,  // z.B. "Zollstock im Bild"
+                    "notes": string    // Zusätzliche Bemerkungen zur Messung
+                }
+            },
+            "condition_analysis": {
+                "zustand_beschreibung": string,
+                "maengel_besonderheiten": string,
+                "zustand_einschätzung": string,
+                "confidence_score": number
+            },
+""" + market_format + """            "additional_info": {
                 "inhaltszusammenfassung": string,
                 "zielgruppe": string,
                 "besonderheiten": string,
@@ -418,6 +439,14 @@ class ImageAnalysisController:
     def _query_open_library(self, isbn: str) -> Dict[str, Any]:
         """
         Fragt die OpenLibrary API nach zusätzlichen Buchinformationen ab.
+        Gleichzeitige Abfragen derselben ISBN werden zu einem Request gebündelt.
+        """
+        key = 'openlibrary:' + re.sub(r'[^0-9Xx]', '', isbn).upper()
+        return open_library_flight.do(key, self._fetch_open_library, isbn)
+
+    def _fetch_open_library(self, isbn: str) -> Dict[str, Any]:
+        """
+        Führt die eigentliche OpenLibrary-Abfrage durch.
         """
         try:
             import requests
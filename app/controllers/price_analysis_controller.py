@@ -1,26 +1,40 @@
 from datetime import datetime
 from typing import Dict, Any, Optional
+import asyncio
 import logging
+import time
 from decimal import Decimal
-import statistics
+from app.utils.book_keys import CONDITION_FACTORS, MarketQuery
+from app.utils.cache_manager import CacheManager
+from app.utils.http_session import get_client_session
+from app.utils.async_runtime import async_runtime
+from app.utils.price_stats import summarize_market_data, price_confidence
+from app.utils.price_history import get_history, observations_from_market_data, record_observations
+from app.market_sources import DEFAULT_SOURCES, PendingMarketSource, get_adapters
+from app.utils.single_flight import market_data_flight
 
 class PriceAnalysisController:
-    def __init__(self):
+    # Zeitlimits für die Marktdatenerhebung in Sekunden
+    SOURCE_TIMEOUT = 8.0
+    MARKET_DEADLINE = 12.0
+
+    def __init__(self, cache_manager: Optional[CacheManager] = None,
+                 source_timeout: Optional[float] = None,
+                 market_deadline: Optional[float] = None):
         """
         Initialisiert den Price Analysis Controller.
         """
-        self.condition_factors = {
-            'New': 1.0,
-            'Like New': 0.9,
-            'Very Good': 0.8,
-            'Good': 0.7,
-            'Fair': 0.6,
-            'Poor': 0.4
-        }
+        self.cache_manager = cache_manager or CacheManager()
+        self.source_timeout = source_timeout or self.SOURCE_TIMEOUT
+        self.market_deadline = market_deadline or self.MARKET_DEADLINE
+        self.condition_factors = dict(CONDITION_FACTORS)
 
-    async def analyze_book_price(self, book_id: int) -> Dict[str, Any]:
+    def analyze_book_price(self, book_id: int, force_refresh: bool = False) -> Dict[str, Any]:
         """
         Führt eine detaillierte Preisanalyse für ein Buch durch.
+        Mit force_refresh=True werden die Marktdaten unabhängig vom Cache neu erhoben.
+        Die Marktdatenerhebung läuft auf dem gemeinsamen Event-Loop, Datenbankzugriffe
+        im aufrufenden Thread.
         """
         from app.models import Book
         
@@ -29,56 +43,14 @@ class PriceAnalysisController:
             raise ValueError(f"Buch mit ID {book_id} nicht gefunden")
 
         try:
-            # Sammle Marktdaten
-            market_data = await self._collect_market_data(book)
-            
-            # Analysiere historische Daten
-            try:
-                historical_data = {
-                    'price_trends': {},
-                    'seasonal_patterns': {},
-                    'long_term_trend': {}
-                }
-            except Exception as e:
-                logging.error(f"Fehler bei der historischen Analyse: {str(e)}")
-                historical_data = {}
-            
-            # Bewerte den Zustand
-            condition_impact = self._analyze_condition_impact(book.condition)
-            
-            # Analysiere die Seltenheit
-            rarity_analysis = self._analyze_rarity(book, market_data)
+            # Sammle Marktdaten (aus dem Cache, falls vorhanden)
+            query = MarketQuery.from_book(book)
+            market_data, cache_status = async_runtime.run(self._get_market_data(query, force_refresh))
             
-            # Regionale Preisanalyse
-            regional_analysis = self._analyze_regional_prices(market_data)
-            
-            # Berechne den Schätzwert
-            value_estimation = self._estimate_value(
-                book,
-                market_data,
-                condition_impact,
-                rarity_analysis
-            )
-
-            analysis_results = {
-                'market_prices': market_data,
-                'historical_data': historical_data,
-                'condition_impact': condition_impact,
-                'rarity_analysis': rarity_analysis,
-                'regional_analysis': regional_analysis,
-                'value_estimation': value_estimation,
-                'collector_indicators': self._get_collector_indicators(book),
-                'timestamp': datetime.utcnow().isoformat()
-            }
+            analysis_results = self.build_analysis(book, market_data, query, cache_status)
 
             # Aktualisiere das Buch mit den Analyseergebnissen
-            book.price_analysis = analysis_results
-            book.price = value_estimation['price_range']['recommended']
-            book.price_details = {
-                'last_analysis': datetime.utcnow().isoformat(),
-                'confidence_score': value_estimation['confidence_score'],
-                'price_range': value_estimation['price_range']
-            }
+            self.apply_analysis(book, analysis_results)
 
             from app import db
             db.session.commit()
@@ -89,35 +61,279 @@ class PriceAnalysisController:
             logging.error(f"Fehler bei der Preisanalyse: {str(e)}")
             return self._get_default_analysis()
 
-    async def _collect_market_data(self, book) -> Dict[str, Any]:
+    def build_analysis(self, book, market_data: Dict[str, Any],
+                       query: Optional[MarketQuery] = None,
+                       cache_status: Optional[str] = None,
+                       historical_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Sammelt aktuelle Marktdaten von verschiedenen Quellen.
+        Berechnet die vollständige Preisanalyse aus bereits erhobenen Marktdaten.
+        Ohne historical_data wird die Preishistorie des Titels aus den Aggregaten gelesen;
+        Stapelverarbeitungen übergeben sie vorab geladen.
         """
-        market_data = {
-            'booklooker': await self._get_booklooker_prices(book),
-            'zvab': await self._get_zvab_prices(book),
-            'abebooks': await self._get_abebooks_prices(book),
-            'eurobuch': await self._get_eurobuch_prices(book)
-        }
+        query = query or MarketQuery.from_book(book)
         
-        # Füge Statistiken für jede Quelle hinzu
-        for source, data in market_data.items():
-            if data.get('prices'):
-                prices = [float(p) for p in data['prices']]
-                data['stats'] = {
-                    'min': min(prices),
-                    'max': max(prices),
-                    'avg': statistics.mean(prices),
-                    'median': statistics.median(prices),
-                    'count': len(prices)
-                }
-            else:
-                data['stats'] = {}
-            
-            data['timestamp'] = datetime.utcnow().isoformat()
-            
+        # Analysiere historische Daten
+        if historical_data is None:
+            historical_data = get_history(query.item_key)
+        
+        # Statistiken je Quelle und über alle Preise in einem Durchlauf
+        aggregate_stats = summarize_market_data(market_data)
+        
+        # Bewerte den Zustand
+        condition_impact = self._analyze_condition_impact(book.condition)
+        
+        # Analysiere die Seltenheit
+        rarity_analysis = self._analyze_rarity(book, market_data)
+        
+        # Regionale Preisanalyse
+        regional_analysis = self._analyze_regional_prices(market_data)
+        
+        # Berechne den Schätzwert
+        value_estimation = self._estimate_value(
+            book,
+            market_data,
+            condition_impact,
+            rarity_analysis,
+            aggregate_stats,
+            historical_data
+        )
+
+        return {
+            'market_prices': market_data,
+            'historical_data': historical_data,
+            'condition_impact': condition_impact,
+            'rarity_analysis': rarity_analysis,
+            'regional_analysis': regional_analysis,
+            'value_estimation': value_estimation,
+            'collector_indicators': self._get_collector_indicators(book),
+            'market_data_cache': {
+                'key': query.key,
+                'status': cache_status
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def apply_analysis(self, book, analysis_results: Dict[str, Any], update_price: bool = True):
+        """
+        Überträgt die Analyseergebnisse auf das Buch, ohne zu committen.
+        Mit update_price=False bleibt der bisherige Preis erhalten.
+        """
+        value_estimation = analysis_results['value_estimation']
+        now = datetime.utcnow()
+        book.price_analysis = analysis_results
+        if update_price:
+            book.price = value_estimation['price_range']['recommended']
+        book.price_details = {
+            'last_analysis': now.isoformat(),
+            'confidence_score': value_estimation['confidence_score'],
+            'price_range': value_estimation['price_range']
+        }
+        book.market_snapshot_at = now
+
+    async def _get_market_data(self, query: MarketQuery,
+                               force_refresh: bool = False) -> tuple:
+        """
+        Liefert Marktdaten nach dem Stale-While-Revalidate-Prinzip.
+        Gibt (Marktdaten, Cache-Status) zurück; der Status ist 'fresh', 'stale' oder 'refreshed'.
+        """
+        if not force_refresh:
+            cached = self.cache_manager.get_cached_market_data(query.key)
+            if cached is not None:
+                market_data, is_stale = cached
+                if is_stale:
+                    self._schedule_refresh(query)
+                    return market_data, 'stale'
+                return market_data, 'fresh'
+
+        return await self._collect_market_data(query), 'refreshed'
+
+    def _schedule_refresh(self, query: MarketQuery):
+        """
+        Startet eine Hintergrund-Aktualisierung veralteter Marktdaten, sofern nicht bereits eine läuft.
+        """
+        if market_data_flight.in_flight(query.key):
+            return
+        logging.debug(f"Veraltete Marktdaten für {query.key}, aktualisiere im Hintergrund")
+
+        def _log_failure(future):
+            if not future.cancelled() and future.exception() is not None:
+                logging.error(f"Fehler bei der Hintergrund-Aktualisierung für {query.key}: "
+                              f"{str(future.exception())}")
+
+        async_runtime.submit(self._collect_market_data(query)).add_done_callback(_log_failure)
+
+    async def _collect_market_data(self, query: MarketQuery) -> Dict[str, Any]:
+        """
+        Sammelt aktuelle Marktdaten von verschiedenen Quellen und legt sie im Cache ab.
+        Gleichzeitige Abfragen für denselben Titel teilen sich eine Berechnung.
+        """
+        return await market_data_flight.do_async(
+            query.key,
+            self._refresh_market_data,
+            query
+        )
+
+    async def _refresh_market_data(self, query: MarketQuery) -> Dict[str, Any]:
+        """Erhebt die Marktdaten neu und aktualisiert den Cache."""
+        market_data = await self._fetch_market_data(query)
+        await self._store_observations([query], {query.key: market_data})
+        # Nur vollständige Ergebnisse cachen, Teilergebnisse werden lediglich zurückgegeben
+        cacheable = self._cacheable(market_data)
+        if cacheable is not None:
+            self.cache_manager.cache_market_data(query.key, cacheable)
+        else:
+            logging.warning(f"Unvollständige Marktdaten für {query.key}, werden nicht gecacht")
         return market_data
 
+    @staticmethod
+    def _cacheable(market_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Die zu cachenden Marktdaten oder None, wenn sie unvollständig sind. Quellen
+        ohne API-Anbindung ('unavailable') werden nicht gecacht und zählen nicht mit;
+        es muss aber mindestens eine Quelle erfolgreich geantwortet haben.
+        """
+        available = {
+            source: data for source, data in market_data.items()
+            if data.get('status') != PendingMarketSource.UNAVAILABLE
+        }
+        if not available or any(data.get('status') != 'ok' for data in available.values()):
+            return None
+        return available
+
+    async def _fetch_source(self, adapter, queries, session,
+                            concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fragt eine einzelne Quelle für alle Titel ab und protokolliert die Latenz.
+        """
+        start = time.perf_counter()
+        try:
+            results = await adapter.fetch_batch(queries, session, timeout=self.source_timeout,
+                                                concurrency=concurrency)
+        except Exception as e:
+            logging.error(f"Fehler bei der Marktdatenabfrage ({adapter.name}): {str(e)}")
+            results = {
+                query.item_key: {'prices': [], 'offers': [], 'status': 'error', 'error': str(e)}
+                for query in queries
+            }
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        for data in results.values():
+            data['latency_ms'] = latency_ms
+        return results
+
+    async def _fetch_market_data(self, query: MarketQuery) -> Dict[str, Any]:
+        """
+        Fragt alle Marktquellen parallel über eine gemeinsame Session ab und berechnet
+        die Statistiken je Quelle. Quellen, die die Gesamtfrist überschreiten, werden
+        abgebrochen und mit Status 'deadline_exceeded' zurückgegeben.
+        """
+        return (await self._fetch_market_data_batch([query]))[query.key]
+
+    async def _fetch_market_data_batch(self, queries,
+                                       concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Erhebt Marktdaten für viele Titel auf einmal. Jede Quelle erhält alle Titel
+        und bündelt sie gemäß ihrer Batch-Größe in möglichst wenige Upstream-Anfragen.
+        Liefert die Marktdaten pro Cache-Schlüssel (MarketQuery.key).
+        """
+        session = get_client_session()
+        start = time.perf_counter()
+        tasks = {
+            adapter.name: asyncio.ensure_future(self._fetch_source(adapter, queries, session, concurrency))
+            for adapter in get_adapters()
+        }
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=self.market_deadline)
+
+        source_results = {}
+        for source, task in tasks.items():
+            if task.done():
+                source_results[source] = task.result()
+            else:
+                task.cancel()
+                source_results[source] = {}
+
+        deadline_latency = round((time.perf_counter() - start) * 1000, 1)
+        batch = {}
+        for query in queries:
+            market_data = {}
+            for source, results in source_results.items():
+                data = results.get(query.item_key)
+                if data is None:
+                    data = {'prices': [], 'offers': [], 'status': 'deadline_exceeded',
+                            'latency_ms': deadline_latency}
+                else:
+                    # Kopie, da sich Titel mit unterschiedlichem Zustand ein Ergebnis teilen
+                    data = dict(data)
+                data['timestamp'] = datetime.utcnow().isoformat()
+                market_data[source] = data
+            batch[query.key] = market_data
+        return batch
+
+    async def collect_market_data_batch(self, queries, force_refresh: bool = False,
+                                        concurrency: Optional[int] = None,
+                                        observations: Optional[list] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Liefert Marktdaten für viele Titel, z.B. für die Neubepreisung des Bestands.
+        Frische Cache-Einträge werden übernommen, alle übrigen Titel werden
+        gemeinsam erhoben und anschließend gecacht.
+        Ist `observations` eine Liste, werden die Preisbeobachtungen dort angehängt,
+        statt in einer eigenen Transaktion gespeichert zu werden.
+        """
+        results = {}
+        missing = []
+        for query in {q.key: q for q in queries}.values():
+            cached = None if force_refresh else self.cache_manager.get_cached_market_data(query.key)
+            if cached is not None and not cached[1]:
+                results[query.key] = cached[0]
+            else:
+                missing.append(query)
+
+        if missing:
+            fetched = await self._fetch_market_data_batch(missing, concurrency)
+            if observations is not None:
+                observations.extend(self._observation_rows(missing, fetched))
+            else:
+                await self._store_observations(missing, fetched)
+            for key, market_data in fetched.items():
+                cacheable = self._cacheable(market_data)
+                if cacheable is not None:
+                    self.cache_manager.cache_market_data(key, cacheable)
+            results.update(fetched)
+        return results
+
+    async def _store_observations(self, queries, batch: Dict[str, Dict[str, Any]]):
+        """
+        Übernimmt neu erhobene Angebote in die Preishistorie, einmal pro Titel.
+        Gespeichert wird in einer eigenen Transaktion im Thread-Pool der Runtime;
+        ohne hinterlegte App wird nichts gespeichert.
+        """
+        if async_runtime.app is None:
+            return
+        rows = self._observation_rows(queries, batch)
+        if rows:
+            await async_runtime.run_blocking(self._save_observations, rows)
+
+    @staticmethod
+    def _observation_rows(queries, batch: Dict[str, Dict[str, Any]]) -> list:
+        rows = []
+        seen = set()
+        for query in queries:
+            if query.item_key in seen or query.key not in batch:
+                continue
+            seen.add(query.item_key)
+            rows.extend(observations_from_market_data(query.item_key, batch[query.key]))
+        return rows
+
+    @staticmethod
+    def _save_observations(rows):
+        from app import db
+        try:
+            record_observations(rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Fehler beim Speichern der Preisbeobachtungen: {str(e)}")
+
     def _analyze_condition_impact(self, condition: Optional[str]) -> Dict[str, Any]:
         """
         Analysiert den Einfluss des Buchzustands auf den Preis.
@@ -196,20 +412,20 @@ class PriceAnalysisController:
 
     def _estimate_value(self, book, market_data: Dict[str, Any],
                        condition_impact: Dict[str, Any],
-                       rarity_analysis: Dict[str, Any]) -> Dict[str, Any]:
+                       rarity_analysis: Dict[str, Any],
+                       aggregate_stats: Optional[Dict[str, Any]] = None,
+                       historical_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Berechnet den geschätzten Wert des Buches.
         """
-        # Sammle alle verfügbaren Preise
-        all_prices = []
-        for source in market_data.values():
-            all_prices.extend(float(p) for p in source.get('prices', []))
+        if aggregate_stats is None:
+            aggregate_stats = summarize_market_data(market_data)
             
-        if not all_prices:
+        if not aggregate_stats:
             return self._get_default_value_estimation()
             
-        # Berechne Basiswert
-        base_value = statistics.median(all_prices)
+        # Berechne Basiswert (Median nach Ausreißerfilter)
+        base_value = aggregate_stats['robust_median']
         
         # Passe basierend auf Zustand an
         condition_factor = condition_impact['condition_factor']
@@ -218,7 +434,7 @@ class PriceAnalysisController:
         rarity_factor = rarity_analysis['rarity_score']
         
         # Berücksichtige Markttrends
-        market_trend_factor = self._calculate_market_trend(market_data)
+        market_trend_factor = self._calculate_market_trend(historical_data or {})
         
         # Berechne angepassten Wert
         adjusted_value = base_value * condition_factor * rarity_factor * market_trend_factor
@@ -239,8 +455,9 @@ class PriceAnalysisController:
                 'rarity': rarity_factor,
                 'market_trend': market_trend_factor
             },
+            'price_statistics': aggregate_stats,
             'confidence_score': self._calculate_confidence_score(
-                all_prices,
+                aggregate_stats,
                 condition_impact,
                 rarity_analysis
             )
@@ -257,7 +474,7 @@ class PriceAnalysisController:
                     'stats': {},
                     'timestamp': datetime.utcnow().isoformat()
                 }
-                for source in ['booklooker', 'zvab', 'abebooks', 'eurobuch']
+                for source in DEFAULT_SOURCES
             },
             'historical_data': {
                 'price_trends': {},
@@ -308,26 +525,6 @@ class PriceAnalysisController:
 
     # Hilfsmethoden
 
-    async def _get_booklooker_prices(self, book) -> Dict[str, Any]:
-        """Sammelt Preise von Booklooker."""
-        # TODO: Implementiere Booklooker API Integration
-        return {'prices': [], 'stats': {}}
-
-    async def _get_zvab_prices(self, book) -> Dict[str, Any]:
-        """Sammelt Preise von ZVAB."""
-        # TODO: Implementiere ZVAB API Integration
-        return {'prices': [], 'stats': {}}
-
-    async def _get_abebooks_prices(self, book) -> Dict[str, Any]:
-        """Sammelt Preise von AbeBooks."""
-        # TODO: Implementiere AbeBooks API Integration
-        return {'prices': [], 'stats': {}}
-
-    async def _get_eurobuch_prices(self, book) -> Dict[str, Any]:
-        """Sammelt Preise von Eurobuch."""
-        # TODO: Implementiere Eurobuch API Integration
-        return {'prices': [], 'stats': {}}
-
     def _get_condition_description(self, condition: str) -> str:
         """Liefert eine detaillierte Beschreibung des Zustands."""
         descriptions = {
@@ -377,35 +574,47 @@ class PriceAnalysisController:
         
         return round(weighted_score, 2)
 
-    def _calculate_market_trend(self, market_data: Dict[str, Any]) -> float:
-        """Berechnet den aktuellen Markttrend."""
-        # TODO: Implementiere Trendanalyse
-        return 1.0
+    def _calculate_market_trend(self, historical_data: Dict[str, Any]) -> float:
+        """
+        Trendfaktor aus der Preishistorie (letzte 30 Tage gegenüber den 30 Tagen davor).
+        Ohne ausreichende Historie 1.0.
+        """
+        return historical_data.get('price_trends', {}).get('factor', 1.0)
 
     def _calculate_confidence_score(self,
-                                 prices: list,
+                                 price_stats: Dict[str, Any],
                                  condition_impact: Dict[str, Any],
                                  rarity_analysis: Dict[str, Any]) -> float:
         """Berechnet einen Konfidenzwert für die Preisschätzung."""
-        if not prices:
+        if not price_stats:
             return 0.5
             
         # Preisvarianz
-        try:
-            variance = statistics.variance(prices)
-            price_confidence = 1.0 - min(1.0, variance / (max(prices) ** 2))
-        except statistics.StatisticsError:
-            price_confidence = 0.5
+        price_conf = price_confidence(price_stats)
             
         # Gewichteter Durchschnitt der Faktoren
         confidence = (
-            price_confidence * 0.4 +
+            price_conf * 0.4 +
             condition_impact['condition_factor'] * 0.3 +
             rarity_analysis['rarity_score'] * 0.3
         )
         
         return round(confidence, 2)
 
+    def _estimate_collector_value(self, book, rarity_score: float) -> Dict[str, Any]:
+        """Schätzt den Sammlerwert anhand des Seltenheitswerts."""
+        if rarity_score >= 0.7:
+            rating = 'High'
+        elif rarity_score >= 0.4:
+            rating = 'Medium'
+        else:
+            rating = 'Low'
+        return {
+            'rating': rating,
+            'score': rarity_score,
+            'features': self._get_special_features(book)
+        }
+
     def _get_collector_indicators(self, book) -> Dict[str, Any]:
         """Identifiziert Sammlerrelevante Merkmale."""
         return {}  # TODO: Implementiere Sammleranalyse
@@ -7,60 +7,74 @@ import requests
 from datetime import datetime
 from ebaysdk.trading import Connection as Trading
 from ebaysdk.exception import ConnectionError
+from app.utils.ebay_category_index import get_category_store
+
+SITE_ID = '77'  # Deutschland (eBay.de)
+BOOKS_CATEGORY_ID = '267'  # Bücher
+MAX_INVENTORY_STATUS_ITEMS = 4  # Obergrenze von ReviseInventoryStatus
+MAX_SELLER_EVENTS = 3000  # Obergrenze einer GetSellerEvents-Antwort
+MAX_PICTURES = 12  # Kostenlose Bilder pro Angebot
 
 class EbayAPI:
-    def __init__(self):
+    def __init__(self, connection=None):
         try:
-            is_sandbox = os.getenv('EBAY_SANDBOX', 'True').lower() == 'true'
-            domain = 'api.sandbox.ebay.com' if is_sandbox else 'api.ebay.com'
-            
-            # Basis-Konfiguration
-            config = {
-                'domain': domain,
-                'appid': os.getenv('EBAY_APP_ID', '').strip('" '),
-                'devid': os.getenv('EBAY_DEV_ID', '').strip('" '),
-                'certid': os.getenv('EBAY_CERT_ID', '').strip('" '),
-                'token': os.getenv('EBAY_TOKEN', '').strip('" '),
-                'version': '1199',  # Aktuellste Trading API Version
-                'siteid': '77',     # Deutschland (eBay.de)
-                'warnings': True,
-                'timeout': 20,
-                'https': True,
-                'debug': True
-            }
-            
-            logging.debug("Initializing eBay API...")
-            logging.debug(f"Domain: {domain}")
-            logging.debug(f"APP_ID: {config['appid'][:8]}...")  # Erste 8 Zeichen für Sicherheit
-            
-            # API Initialisierung mit User Token
-            self.api = Trading(
-                domain=domain,
-                config_file=None,
-                appid=config['appid'],
-                devid=config['devid'],
-                certid=config['certid'],
-                token=config['token'],
-                version=config['version'],
-                siteid=config['siteid']
-            )
-            logging.debug("eBay API initialized successfully")
+            # Eine übergebene Verbindung wird wiederverwendet (z.B. eine pro Worker beim Sammel-Listing)
+            self.api = connection or self.create_connection()
         except Exception as e:
             logging.error(f"Failed to initialize eBay API: {str(e)}")
             raise
 
+    @staticmethod
+    def create_connection():
+        """Erstellt eine Trading-Verbindung (nicht thread-sicher: eine Verbindung pro Thread)"""
+        is_sandbox = os.getenv('EBAY_SANDBOX', 'True').lower() == 'true'
+        # EBAY_TRADING_DOMAIN erlaubt z.B. einen lokalen Test-Endpunkt (mit EBAY_TRADING_HTTPS=false)
+        domain = os.getenv('EBAY_TRADING_DOMAIN') or ('api.sandbox.ebay.com' if is_sandbox else 'api.ebay.com')
+        
+        # Basis-Konfiguration
+        config = {
+            'domain': domain,
+            'appid': os.getenv('EBAY_APP_ID', '').strip('" '),
+            'devid': os.getenv('EBAY_DEV_ID', '').strip('" '),
+            'certid': os.getenv('EBAY_CERT_ID', '').strip('" '),
+            'token': os.getenv('EBAY_TOKEN', '').strip('" '),
+            'version': '1199',  # Aktuellste Trading API Version
+            'siteid': SITE_ID,
+            'warnings': True,
+            'timeout': int(os.getenv('EBAY_TIMEOUT', 20)),
+            'https': os.getenv('EBAY_TRADING_HTTPS', 'True').lower() == 'true',
+            # Protokolliert komplette Requests und Responses, nur zur Fehlersuche
+            'debug': os.getenv('EBAY_DEBUG', 'False').lower() == 'true'
+        }
+        
+        logging.debug("Initializing eBay API...")
+        logging.debug(f"Domain: {domain}")
+        logging.debug(f"APP_ID: {config['appid'][:8]}...")  # Erste 8 Zeichen für Sicherheit
+        
+        # API Initialisierung mit User Token
+        connection = Trading(
+            domain=domain,
+            config_file=None,
+            appid=config['appid'],
+            devid=config['devid'],
+            certid=config['certid'],
+            token=config['token'],
+            version=config['version'],
+            siteid=config['siteid'],
+            warnings=config['warnings'],
+            timeout=config['timeout'],
+            debug=config['debug']
+        )
+        # ebaysdk setzt https fest auf True
+        connection.config.set('https', config['https'], force=True)
+        logging.debug("eBay API initialized successfully")
+        return connection
+
     def find_best_category(self, category, description):
         """Findet die beste passende eBay-Kategorie basierend auf der Buchkategorie und Beschreibung"""
         try:
-            # GetCategories API-Aufruf
-            response = self.api.execute('GetCategories', {
-                'DetailLevel': 'ReturnAll',
-                'CategorySiteID': 77,  # Deutschland
-                'LevelLimit': 4,       # Bis zu 4 Ebenen tief suchen
-            })
-            
-            # Extrahiere alle Kategorien
-            categories = response.dict().get('CategoryArray', {}).get('Category', [])
+            # Lokaler Kategoriebaum; eBay wird nur bei neuer CategoryVersion erneut abgefragt
+            index = get_category_store(SITE_ID).get_index(self.api)
             
             # Keywords für die Suche
             keywords = ['antiquarisch', 'antik', 'gebraucht', 'historisch']
@@ -69,33 +83,15 @@ class EbayAPI:
             if 'theater' in description.lower():
                 keywords.extend(['theater', 'bühne'])
             
-            # Finde beste Übereinstimmung
-            best_match = None
-            best_score = 0
-            
-            for cat in categories:
-                score = 0
-                cat_name = cat.get('CategoryName', '').lower()
-                
-                # Prüfe Keywords
-                for keyword in keywords:
-                    if keyword in cat_name:
-                        score += 1
-                
-                # Prüfe ob es eine Leaf-Kategorie ist
-                if cat.get('LeafCategory', 'false') == 'true':
-                    score += 2
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = cat.get('CategoryID')
+            # Finde beste Übereinstimmung unterhalb der Bücher-Kategorie
+            best_match = index.best_category(keywords, root_id=BOOKS_CATEGORY_ID)
             
             # Fallback-Kategorie für Bücher
-            return best_match if best_match else '267'
+            return best_match if best_match else BOOKS_CATEGORY_ID
             
         except Exception as e:
             logging.error(f"Fehler beim Abrufen der Kategorien: {str(e)}")
-            return '267'  # Fallback zur Bücher-Kategorie
+            return BOOKS_CATEGORY_ID  # Fallback zur Bücher-Kategorie
 
     def get_condition_id(self, condition):
         """Konvertiert unsere Zustandsbeschreibungen in eBay Condition IDs für antiquarische Bücher"""
@@ -169,16 +165,172 @@ class EbayAPI:
                 'message': f'Unerwarteter Fehler bei der Validierung: {error_msg}'
             }
 
+    def get_seller_list(self, end_time_from, end_time_to, page=1, entries_per_page=200):
+        """
+        Eine Seite der eigenen Angebote, deren Laufzeit im Zeitfenster endet (GetSellerList).
+        GetSellerList filtert nur nach Start- oder Endzeit, nicht nach Änderungszeit.
+        """
+        response = self.api.execute('GetSellerList', {
+            'EndTimeFrom': end_time_from.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'EndTimeTo': end_time_to.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'GranularityLevel': 'Coarse',
+            'Pagination': {'EntriesPerPage': entries_per_page, 'PageNumber': page},
+            # Nur die für den Statusabgleich benötigten Felder übertragen
+            'OutputSelector': [
+                'ItemArray.Item.ItemID',
+                'ItemArray.Item.SellingStatus.ListingStatus',
+                'ItemArray.Item.SellingStatus.QuantitySold',
+                'ItemArray.Item.ListingDetails.EndTime',
+                'PaginationResult',
+                'HasMoreItems'
+            ]
+        })
+        return response.dict()
+
+    def get_seller_events(self, mod_time_from, mod_time_to):
+        """
+        Eigene Angebote, die im Zeitfenster geändert wurden (GetSellerEvents). Die Antwort
+        ist nicht paginiert und auf MAX_SELLER_EVENTS Angebote begrenzt.
+        """
+        response = self.api.execute('GetSellerEvents', {
+            'ModTimeFrom': mod_time_from.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'ModTimeTo': mod_time_to.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'OutputSelector': [
+                'ItemArray.Item.ItemID',
+                'ItemArray.Item.SellingStatus.ListingStatus',
+                'ItemArray.Item.SellingStatus.QuantitySold',
+                'TimeTo'
+            ]
+        })
+        return response.dict()
+
+    def get_seller_transactions(self, mod_time_from, mod_time_to, page=1, entries_per_page=200):
+        """Eine Seite der Verkäufe, die im Zeitfenster angelegt oder geändert wurden (GetSellerTransactions)"""
+        response = self.api.execute('GetSellerTransactions', {
+            'ModTimeFrom': mod_time_from.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'ModTimeTo': mod_time_to.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'Pagination': {'EntriesPerPage': entries_per_page, 'PageNumber': page},
+            'OutputSelector': [
+                'TransactionArray.Transaction.Item.ItemID',
+                'TransactionArray.Transaction.TransactionID',
+                'TransactionArray.Transaction.CreatedDate',
+                'PaginationResult',
+                'HasMoreTransactions'
+            ]
+        })
+        return response.dict()
+
+    def end_listing(self, item_id, reason='NotAvailable'):
+        """Beendet ein Festpreisangebot vorzeitig (EndFixedPriceItem)"""
+        try:
+            self.api.execute('EndFixedPriceItem', {'ItemID': item_id, 'EndingReason': reason})
+            return {'success': True, 'message': 'Angebot beendet'}
+        except ConnectionError as e:
+            error_dict = e.response.dict() if hasattr(e, 'response') and hasattr(e.response, 'dict') else {}
+            errors = error_dict.get('Errors') or []
+            if isinstance(errors, dict):
+                errors = [errors]
+            # 1047: Angebot ist bereits beendet
+            if any(str(error.get('ErrorCode')) == '1047' for error in errors):
+                return {'success': True, 'message': 'Angebot war bereits beendet'}
+            message = errors[0].get('LongMessage') or errors[0].get('ShortMessage') if errors else str(e)
+            logging.error(f"eBay-Angebot {item_id} konnte nicht beendet werden: {message}")
+            return {'success': False, 'error': str(e), 'message': message}
+
+    def revise_inventory_status(self, entries):
+        """
+        Ändert Preis und/oder Menge von bis zu vier Angeboten mit einem Aufruf
+        (ReviseInventoryStatus). Liefert je ItemID ein Ergebnis mit 'success' und 'message'.
+        """
+        if len(entries) > MAX_INVENTORY_STATUS_ITEMS:
+            raise ValueError(f"Höchstens {MAX_INVENTORY_STATUS_ITEMS} Angebote pro ReviseInventoryStatus")
+        try:
+            response_dict = self.api.execute('ReviseInventoryStatus', {'InventoryStatus': entries}).dict()
+        except ConnectionError as e:
+            response_dict = e.response.dict() if hasattr(e, 'response') and hasattr(e.response, 'dict') else {}
+            if not response_dict:
+                logging.error(f"eBay ReviseInventoryStatus fehlgeschlagen: {str(e)}")
+                return {str(entry['ItemID']): {'success': False, 'message': str(e)} for entry in entries}
+
+        revised = response_dict.get('InventoryStatus') or []
+        if isinstance(revised, dict):
+            revised = [revised]
+        revised_ids = {str(status.get('ItemID')) for status in revised}
+
+        errors = response_dict.get('Errors') or []
+        if isinstance(errors, dict):
+            errors = [errors]
+        # Fehler nennen das betroffene Angebot in den ErrorParameters
+        item_errors = {}
+        for error in errors:
+            if error.get('SeverityCode') == 'Warning':
+                continue
+            message = error.get('LongMessage') or error.get('ShortMessage') or 'Unbekannter Fehler'
+            parameters = error.get('ErrorParameters') or []
+            if isinstance(parameters, dict):
+                parameters = [parameters]
+            for parameter in parameters:
+                item_errors.setdefault(str(parameter.get('Value')), message)
+            item_errors.setdefault(None, message)
+
+        results = {}
+        for entry in entries:
+            item_id = str(entry['ItemID'])
+            if item_id in revised_ids:
+                results[item_id] = {'success': True, 'message': 'Angebot aktualisiert'}
+            else:
+                results[item_id] = {
+                    'success': False,
+                    'message': item_errors.get(item_id) or item_errors.get(None) or 'Keine Bestätigung von eBay',
+                    'error_codes': [str(error.get('ErrorCode')) for error in errors]
+                }
+        return results
+
+    def upload_picture(self, data, name):
+        """
+        Lädt ein Bild zu eBay Picture Services hoch (UploadSiteHostedPictures) und liefert
+        die gehostete URL samt Ablaufdatum (UseByDate).
+        """
+        response = self.api.execute(
+            'UploadSiteHostedPictures',
+            {'PictureName': name[:100], 'PictureSet': 'Supersize'},
+            files={'file': ('EbayImage', data)}
+        )
+        details = response.dict().get('SiteHostedPictureDetails') or {}
+        if not details.get('FullURL'):
+            raise ValueError('Keine Bild-URL in der API-Antwort')
+        return {'url': details['FullURL'], 'use_by': details.get('UseByDate')}
+
     def create_listing(self, book):
         """Erstellt ein eBay Listing für ein Buch"""
         try:
             logging.debug("Creating eBay listing for book: %s", book.title)
-            
-            # Kürze den Titel wenn nötig
-            title = book.title[:80]
-            
-            # Erstelle detaillierte Beschreibung und ersetze Sonderzeichen
-            description = f"""
+            from app.utils.ebay_pictures import EbayPicturePublisher
+
+            picture_urls = EbayPicturePublisher().publish(book.image_urls or [])
+            item_data = self.build_item_data(book, picture_urls=picture_urls)
+            return self.submit_listing(item_data)
+
+        except Exception as e:
+            logging.error("Unexpected error: %s", str(e))
+            logging.error("Stack trace: %s", traceback.format_exc())
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Unerwarteter Fehler beim Erstellen des eBay Listings',
+                'stack_trace': traceback.format_exc()
+            }
+
+    def build_item_data(self, book, picture_urls=None):
+        """
+        Baut die AddFixedPriceItem-Daten für ein Buch (ValueError bei fehlenden Pflichtfeldern).
+        picture_urls sind bereits bei eBay gehostete Bilder (siehe EbayPicturePublisher).
+        """
+        # Kürze den Titel wenn nötig
+        title = book.title[:80]
+        
+        # Erstelle detaillierte Beschreibung und ersetze Sonderzeichen
+        description = f"""
 {book.description.replace('&', '&amp;')}
 
 Zustand: Antiquarisches Buch in gutem Zustand
@@ -187,89 +339,96 @@ Erscheinungsjahr: {book.publication_year if book.publication_year else 'Nicht an
 
 Bitte beachten Sie: Dies ist ein historisches Buch aus dem Verlag J.F. Schreiber.
 """.replace('&', '&amp;')
-            
-            # Finde beste passende Kategorie
-            category_id = self.find_best_category(book.category, book.description)
-            
-            # Standard Item-Spezifikationen für antiquarische Bücher
-            item_specifics = [
-                {'Name': 'Format', 'Value': 'Gebundene Ausgabe'},
-                {'Name': 'Erscheinungsjahr', 'Value': str(book.publication_year) if book.publication_year else 'Nicht angegeben'},
-                {'Name': 'Sprache', 'Value': 'Deutsch'},
-                {'Name': 'Autor', 'Value': book.author},
-                {'Name': 'Produktart', 'Value': 'Antiquarisches Buch'},
-                {'Name': 'Verlag', 'Value': 'J.F. Schreiber'},
-                {'Name': 'Original/Reproduktion', 'Value': 'Original'},
-                {'Name': 'Genre', 'Value': 'Antiquarische Bücher'},
-                {'Name': 'Besonderheiten', 'Value': 'Historische Ausgabe'},
-                {'Name': 'Marke', 'Value': 'J.F. Schreiber'},
-                {'Name': 'Herausgeber', 'Value': 'J.F. Schreiber'}
-            ]
-            
-            # Basis Item-Daten
-            item_data = {
-                'Item': {
-                    'Title': title,
-                    'Description': description,
-                    'PrimaryCategory': {'CategoryID': category_id},
-                    'StartPrice': str(book.price),
-                    'ConditionID': self.get_condition_id(book.condition),
-                    'Country': 'DE',
-                    'Currency': 'EUR',
-                    'DispatchTimeMax': '3',
-                    'ListingDuration': 'GTC',  # Good Till Cancelled
-                    'ListingType': 'FixedPriceItem',
-                    'Location': os.getenv('POSTAL_CODE', '10115'),
-                    'PostalCode': os.getenv('POSTAL_CODE', '10115'),
-                    'Quantity': '1',
-                    'Site': 'Germany',
-                    'AutoPay': True,
-                    'ItemSpecifics': {
-                        'NameValueList': item_specifics
-                    },
-                    'ShippingDetails': {
-                        'ShippingType': 'Flat',
-                        'ShippingServiceOptions': [{
-                            'ShippingServicePriority': '1',
-                            'ShippingService': 'DE_DHLPaket',
-                            'ShippingServiceCost': '4.99',
-                            'ShippingServiceAdditionalCost': '0.00'
-                        }]
-                    },
-                    'ReturnPolicy': {
-                        'ReturnsAcceptedOption': 'ReturnsAccepted',
-                        'ReturnsWithinOption': 'Days_30',
-                        'Description': 'Rückgabe innerhalb von 30 Tagen möglich. Das Buch muss im gleichen Zustand zurückgesendet werden.',
-                        'ShippingCostPaidByOption': 'Buyer'
-                    }
+        
+        # Finde beste passende Kategorie
+        category_id = self.find_best_category(book.category, book.description)
+        
+        # Standard Item-Spezifikationen für antiquarische Bücher
+        item_specifics = [
+            {'Name': 'Format', 'Value': 'Gebundene Ausgabe'},
+            {'Name': 'Erscheinungsjahr', 'Value': str(book.publication_year) if book.publication_year else 'Nicht angegeben'},
+            {'Name': 'Sprache', 'Value': 'Deutsch'},
+            {'Name': 'Autor', 'Value': book.author},
+            {'Name': 'Produktart', 'Value': 'Antiquarisches Buch'},
+            {'Name': 'Verlag', 'Value': 'J.F. Schreiber'},
+            {'Name': 'Original/Reproduktion', 'Value': 'Original'},
+            {'Name': 'Genre', 'Value': 'Antiquarische Bücher'},
+            {'Name': 'Besonderheiten', 'Value': 'Historische Ausgabe'},
+            {'Name': 'Marke', 'Value': 'J.F. Schreiber'},
+            {'Name': 'Herausgeber', 'Value': 'J.F. Schreiber'}
+        ]
+        
+        # Basis Item-Daten
+        item_data = {
+            'Item': {
+                'Title': title,
+                'Description': description,
+                'PrimaryCategory': {'CategoryID': category_id},
+                'StartPrice': str(book.price),
+                'ConditionID': self.get_condition_id(book.condition),
+                'Country': 'DE',
+                'Currency': 'EUR',
+                'DispatchTimeMax': '3',
+                'ListingDuration': 'GTC',  # Good Till Cancelled
+                'ListingType': 'FixedPriceItem',
+                'Location': os.getenv('POSTAL_CODE', '10115'),
+                'PostalCode': os.getenv('POSTAL_CODE', '10115'),
+                'Quantity': '1',
+                'Site': 'Germany',
+                'AutoPay': True,
+                'ItemSpecifics': {
+                    'NameValueList': item_specifics
+                },
+                'ShippingDetails': {
+                    'ShippingType': 'Flat',
+                    'ShippingServiceOptions': [{
+                        'ShippingServicePriority': '1',
+                        'ShippingService': 'DE_DHLPaket',
+                        'ShippingServiceCost': '4.99',
+                        'ShippingServiceAdditionalCost': '0.00'
+                    }]
+                },
+                'ReturnPolicy': {
+                    'ReturnsAcceptedOption': 'ReturnsAccepted',
+                    'ReturnsWithinOption': 'Days_30',
+                    'Description': 'Rückgabe innerhalb von 30 Tagen möglich. Das Buch muss im gleichen Zustand zurückgesendet werden.',
+                    'ShippingCostPaidByOption': 'Buyer'
                 }
             }
-            
-            # Füge Test-Bild für Sandbox hinzu
-            if os.getenv('EBAY_SANDBOX', 'True').lower() == 'true':
-                item_data['Item']['PictureDetails'] = {
-                    'PictureURL': ['https://ir.ebaystatic.com/pictures/aw/pics/stockphoto/Stock_Photo_1.jpg']
-                }
-            
-            # Validiere Request
-            required_fields = {
-                'Title': item_data['Item'].get('Title'),
-                'StartPrice': item_data['Item'].get('StartPrice'),
-                'ConditionID': item_data['Item'].get('ConditionID'),
-                'CategoryID': item_data['Item'].get('PrimaryCategory', {}).get('CategoryID'),
-                'Description': item_data['Item'].get('Description')
+        }
+        
+        # Bilder des Buches, ersatzweise Test-Bild für Sandbox
+        if picture_urls:
+            item_data['Item']['PictureDetails'] = {'PictureURL': list(picture_urls)[:MAX_PICTURES]}
+        elif os.getenv('EBAY_SANDBOX', 'True').lower() == 'true':
+            item_data['Item']['PictureDetails'] = {
+                'PictureURL': ['https://ir.ebaystatic.com/pictures/aw/pics/stockphoto/Stock_Photo_1.jpg']
             }
-            
-            for field, value in required_fields.items():
-                if not value:
-                    error_msg = f"Fehlendes Pflichtfeld: {field}"
-                    logging.error(error_msg)
-                    raise ValueError(error_msg)
-                logging.debug("%s: %s", field, value)
-            
-            # Füge Zahlungsinformationen hinzu
-            item_data['Item'].update(self.get_payment_info())
-            
+        
+        # Validiere Request
+        required_fields = {
+            'Title': item_data['Item'].get('Title'),
+            'StartPrice': item_data['Item'].get('StartPrice'),
+            'ConditionID': item_data['Item'].get('ConditionID'),
+            'CategoryID': item_data['Item'].get('PrimaryCategory', {}).get('CategoryID'),
+            'Description': item_data['Item'].get('Description')
+        }
+        
+        for field, value in required_fields.items():
+            if not value:
+                error_msg = f"Fehlendes Pflichtfeld: {field}"
+                logging.error(error_msg)
+                raise ValueError(error_msg)
+            logging.debug("%s: %s", field, value)
+        
+        # Füge Zahlungsinformationen hinzu
+        item_data['Item'].update(self.get_payment_info())
+
+        return item_data
+
+    def submit_listing(self, item_data):
+        """Sendet AddFixedPriceItem und wertet die Antwort bzw. den eBay-Fehler aus"""
+        try:
             # Sende Request
             logging.debug("Sende eBay API Request...")
             response = self.api.execute('AddFixedPriceItem', item_data)
@@ -285,11 +444,8 @@ Bitte beachten Sie: Dies ist ein historisches Buch aus dem Verlag J.F. Schreiber
                     'details': response_dict
                 }
             
-            # Update Zahlungsinformationen für Sandbox
-            item_data = self.update_sandbox_payment(item_data)
-
             # Prüfe auf Warnungen
-            warnings = response_dict.get('Warnings', [])
+            warnings = response_dict.get('Warnings') or self._warnings(response_dict)
             if warnings:
                 logging.warning("eBay API Warnungen: %s", warnings)
             
@@ -339,13 +495,17 @@ Bitte beachten Sie: Dies ist ein historisches Buch aus dem Verlag J.F. Schreiber
                 'message': error_message,
                 'details': error_dict
             }
-            
-        except Exception as e:
-            logging.error("Unexpected error: %s", str(e))
-            logging.error("Stack trace: %s", traceback.format_exc())
-            return {
-                'success': False,
-                'error': str(e),
-                'message': 'Unerwarteter Fehler beim Erstellen des eBay Listings',
-                'stack_trace': traceback.format_exc()
-            }
\ No newline at end of file
+
+    @staticmethod
+    def _warnings(response_dict):
+        """Warnungen aus dem Errors-Element einer erfolgreichen Antwort (SeverityCode Warning)"""
+        errors = response_dict.get('Errors') or []
+        if isinstance(errors, dict):
+            errors = [errors]
+        return [error for error in errors if error.get('SeverityCode') == 'Warning']
+
+    def listing_url(self, item_id):
+        """Link zum Angebot auf eBay.de bzw. in der Sandbox"""
+        is_sandbox = os.getenv('EBAY_SANDBOX', 'True').lower() == 'true'
+        host = 'www.sandbox.ebay.de' if is_sandbox else 'www.ebay.de'
+        return f"https://{host}/itm/{item_id}"
@@ -0,0 +1,10 @@
+from .base import AsyncRateLimiter, MarketSourceAdapter, PendingMarketSource
+from .fixtures import FIXTURE_DIR, FixtureMarketSource, RecordingMarketSource
+from .registry import (
+    DEFAULT_SOURCES,
+    get_adapter,
+    get_adapters,
+    load_default_adapters,
+    register_adapter,
+    unregister_adapter
+)
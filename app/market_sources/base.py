@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.utils.book_keys import MarketQuery
+
+
+class AsyncRateLimiter:
+    """
+    Einfacher Rate-Limiter nach dem Reservierungsprinzip.
+
+    Jeder Aufruf von acquire() reserviert den nächsten freien Zeitschlitz und wartet
+    bis dahin. Die Reservierung ist threadsicher und nicht an einen Event-Loop
+    gebunden, sodass eine Instanz von mehreren Loops gleichzeitig genutzt werden kann.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            # Bis zu `burst` Aufrufe dürfen ohne Wartezeit erfolgen
+            slot = max(self._next_slot, now - self.interval * (self.burst - 1))
+            self._next_slot = slot + self.interval
+            return max(0.0, slot - now)
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def wait(self):
+        """Blockierende Variante von acquire() für Worker-Threads."""
+        if not self.interval:
+            return
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class MarketSourceAdapter(ABC):
+    """
+    Basisklasse für Marktquellen (Booklooker, ZVAB, AbeBooks, Eurobuch, ...).
+
+    Adapter liefern für eine Menge von MarketQuery-Objekten die gefundenen Angebote,
+    jeweils unter dem Titelschlüssel (MarketQuery.item_key). Quellen, die mehrere
+    ISBNs in einer Anfrage unterstützen, setzen max_batch_size > 1.
+    """
+
+    #: Eindeutiger Name der Quelle, wird als Schlüssel in den Marktdaten verwendet
+    name: str = ''
+    #: Maximale Anzahl Anfragen pro Sekunde an die Quelle
+    rate_limit: float = 1.0
+    #: Anzahl erlaubter Anfragen ohne Wartezeit
+    rate_burst: int = 1
+    #: Anzahl Titel pro Upstream-Anfrage (1 = keine Batch-Unterstützung)
+    max_batch_size: int = 1
+
+    def __init__(self):
+        self.rate_limiter = AsyncRateLimiter(self.rate_limit, self.rate_burst)
+
+    @property
+    def supports_batch(self) -> bool:
+        return self.max_batch_size > 1
+
+    async def fetch_batch(self, queries: Sequence[MarketQuery], session,
+                          timeout: Optional[float] = None,
+                          concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fragt die Quelle für alle Titel ab, aufgeteilt in Pakete von max_batch_size.
+
+        Liefert pro Titelschlüssel ein Dict mit 'prices', 'offers' und 'status'.
+        Fehlgeschlagene Pakete werden mit Status 'timeout' bzw. 'error' vermerkt,
+        ohne die übrigen Pakete zu beeinträchtigen. `concurrency` begrenzt die Zahl
+        gleichzeitig laufender Upstream-Anfragen.
+        """
+        unique: Dict[str, MarketQuery] = {}
+        for query in queries:
+            unique.setdefault(query.item_key, query)
+        items = list(unique.values())
+        chunks = [items[i:i + self.max_batch_size] for i in range(0, len(items), self.max_batch_size)]
+
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def _run(chunk):
+            if semaphore is None:
+                return await self._fetch_rate_limited(chunk, session, timeout)
+            async with semaphore:
+                return await self._fetch_rate_limited(chunk, session, timeout)
+
+        results = await asyncio.gather(*(_run(chunk) for chunk in chunks))
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for chunk_result in results:
+            merged.update(chunk_result)
+        return merged
+
+    async def _fetch_rate_limited(self, chunk: List[MarketQuery], session,
+                                  timeout: Optional[float]) -> Dict[str, Dict[str, Any]]:
+        await self.rate_limiter.acquire()
+        try:
+            if timeout:
+                found = await asyncio.wait_for(self.fetch_chunk(chunk, session), timeout=timeout)
+            else:
+                found = await self.fetch_chunk(chunk, session)
+        except asyncio.TimeoutError:
+            return {query.item_key: self._empty_result('timeout') for query in chunk}
+        except Exception as e:
+            logging.error(f"Fehler bei der Abfrage von {self.name}: {str(e)}")
+            return {query.item_key: self._empty_result('error', str(e)) for query in chunk}
+
+        results = {}
+        for query in chunk:
+            offers = found.get(query.item_key, [])
+            results[query.item_key] = {
+                'prices': [offer['price'] for offer in offers],
+                'offers': offers,
+                'status': 'ok'
+            }
+        return results
+
+    @staticmethod
+    def _empty_result(status: str, error: Optional[str] = None) -> Dict[str, Any]:
+        result = {'prices': [], 'offers': [], 'status': status}
+        if error:
+            result['error'] = error
+        return result
+
+    @abstractmethod
+    async def fetch_chunk(self, queries: List[MarketQuery], session) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Führt eine Upstream-Anfrage für bis zu max_batch_size Titel aus.
+
+        Liefert pro Titelschlüssel eine Liste von Angeboten der Form
+        {'price': float, 'currency': str, 'condition': str, ...}.
+        """
+
+
+class PendingMarketSource(MarketSourceAdapter):
+    """
+    Quelle, deren API-Anbindung noch aussteht. Es werden keine Anfragen gestellt;
+    jeder Titel erhält den Status 'unavailable', der weder gecacht wird noch als
+    vollständiges Ergebnis zählt.
+    """
+
+    rate_limit = 0.0
+    UNAVAILABLE = 'unavailable'
+
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__()
+
+    async def fetch_batch(self, queries: Sequence[MarketQuery], session,
+                          timeout: Optional[float] = None,
+                          concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        return {query.item_key: self._empty_result(self.UNAVAILABLE) for query in queries}
+
+    async def fetch_chunk(self, queries: List[MarketQuery], session) -> Dict[str, List[Dict[str, Any]]]:
+        raise NotImplementedError(f"Keine API-Anbindung für {self.name}")
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.utils.book_keys import MarketQuery
+from .base import MarketSourceAdapter
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class FixtureMarketSource(MarketSourceAdapter):
+    """
+    Offline-Marktquelle, die aufgezeichnete Angebote aus einer JSON-Datei liefert.
+
+    Die Datei bildet Titelschlüssel (MarketQuery.item_key) auf Angebotslisten ab.
+    Über `latency` kann die Antwortzeit einer echten Quelle pro Anfrage simuliert
+    werden, um die Preis-Pipeline ohne Netzwerk zu benchmarken.
+    """
+
+    rate_limit = 0.0
+
+    def __init__(self, name: str, path: Optional[str] = None, latency: float = 0.0,
+                 max_batch_size: int = 50):
+        self.name = name
+        self.path = path or os.path.join(FIXTURE_DIR, f'{name}.json')
+        self.latency = latency
+        self.max_batch_size = max_batch_size
+        self.request_count = 0
+        self._offers = self._load(self.path)
+        super().__init__()
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, List[Dict[str, Any]]]:
+        if not os.path.exists(path):
+            logging.warning(f"Fixture-Datei nicht gefunden: {path}")
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    async def fetch_chunk(self, queries: List[MarketQuery], session) -> Dict[str, List[Dict[str, Any]]]:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {
+            query.item_key: self._offers[query.item_key]
+            for query in queries
+            if query.item_key in self._offers
+        }
+
+
+class RecordingMarketSource(MarketSourceAdapter):
+    """
+    Umhüllt eine echte Quelle und zeichnet deren Antworten als Fixture-Datei auf.
+    """
+
+    def __init__(self, adapter: MarketSourceAdapter, path: Optional[str] = None):
+        self.adapter = adapter
+        self.name = adapter.name
+        self.rate_limit = adapter.rate_limit
+        self.rate_burst = adapter.rate_burst
+        self.max_batch_size = adapter.max_batch_size
+        self.path = path or os.path.join(FIXTURE_DIR, f'{adapter.name}.json')
+        self._recorded: Dict[str, List[Dict[str, Any]]] = FixtureMarketSource._load(self.path)
+        self._lock = threading.Lock()
+        super().__init__()
+
+    async def fetch_chunk(self, queries: List[MarketQuery], session) -> Dict[str, List[Dict[str, Any]]]:
+        found = await self.adapter.fetch_chunk(queries, session)
+        with self._lock:
+            self._recorded.update(found)
+        return found
+
+    def save(self):
+        """Schreibt alle bisher aufgezeichneten Angebote in die Fixture-Datei."""
+        with self._lock:
+            data = dict(sorted(self._recorded.items()))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,58 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+from .base import MarketSourceAdapter, PendingMarketSource
+from .fixtures import FixtureMarketSource
+
+# Standardquellen in Abfragereihenfolge
+DEFAULT_SOURCES = ['booklooker', 'zvab', 'abebooks', 'eurobuch']
+
+_registry: Dict[str, MarketSourceAdapter] = {}
+_registry_lock = threading.Lock()
+
+
+def register_adapter(adapter: MarketSourceAdapter):
+    """Registriert eine Marktquelle; eine vorhandene Quelle gleichen Namens wird ersetzt."""
+    if not adapter.name:
+        raise ValueError("Marktquelle ohne Namen kann nicht registriert werden")
+    with _registry_lock:
+        _registry[adapter.name] = adapter
+
+
+def unregister_adapter(name: str):
+    with _registry_lock:
+        _registry.pop(name, None)
+
+
+def get_adapter(name: str) -> Optional[MarketSourceAdapter]:
+    with _registry_lock:
+        return _registry.get(name)
+
+
+def get_adapters() -> List[MarketSourceAdapter]:
+    """Liefert alle registrierten Marktquellen in Registrierungsreihenfolge."""
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def load_default_adapters(fixture_dir: Optional[str] = None):
+    """
+    Registriert die Standardquellen. Ist MARKET_SOURCE_FIXTURES gesetzt (oder
+    fixture_dir übergeben), werden stattdessen Fixture-Adapter aus diesem
+    Verzeichnis verwendet, sodass die Preis-Pipeline offline läuft.
+    """
+    fixture_dir = fixture_dir or os.getenv('MARKET_SOURCE_FIXTURES')
+    with _registry_lock:
+        _registry.clear()
+    for name in DEFAULT_SOURCES:
+        if fixture_dir:
+            register_adapter(FixtureMarketSource(name, os.path.join(fixture_dir, f'{name}.json')))
+        else:
+            register_adapter(PendingMarketSource(name))
+    if fixture_dir:
+        logging.info(f"Marktquellen aus Fixtures geladen: {fixture_dir}")
+
+
+load_default_adapters()
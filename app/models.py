@@ -1,8 +1,14 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import event, inspect
 import decimal
 
 class Book(db.Model):
+    __table_args__ = (
+        # Offene Booklooker-Uploads für den Statusabgleich, gruppiert nach Importdatei
+        db.Index('ix_book_booklooker_pending', 'booklooker_status', 'booklooker_upload_file'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     
     # Grundlegende Buchinformationen
@@ -16,6 +22,7 @@ class Book(db.Model):
     edition = db.Column(db.String(100), nullable=True)
     language = db.Column(db.String(50), nullable=True)
     genre = db.Column(db.String(100), nullable=True)
+    sparte = db.Column(db.String(10), nullable=True)  # Booklooker-Sparten-Nr.
     page_count = db.Column(db.Integer, nullable=True)
     format = db.Column(db.String(50), nullable=True)  # Hardcover/Paperback
     dimensions = db.Column(db.JSON, nullable=True)  # Format: {"length": x, "width": y, "height": z}
@@ -43,13 +50,15 @@ class Book(db.Model):
     summary = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), nullable=False, default='draft')
     price_details = db.Column(db.JSON, nullable=True)
+    market_snapshot_at = db.Column(db.DateTime, nullable=True, index=True)  # Zeitpunkt der letzten Marktpreisanalyse
     
     # eBay spezifische Felder
-    ebay_listing_id = db.Column(db.String(50), nullable=True)
+    ebay_listing_id = db.Column(db.String(50), nullable=True, index=True)  # Zuordnung beim Abgleich der eBay-Angebote
     ebay_listing_status = db.Column(db.String(20), nullable=True)
     ebay_listing_url = db.Column(db.String(255), nullable=True)
     ebay_listing_error = db.Column(db.Text, nullable=True)
     ebay_last_sync = db.Column(db.DateTime, nullable=True)
+    ebay_listed_price = db.Column(db.Numeric(10, 2), nullable=True)  # Zuletzt an eBay übertragener Preis
     
     # Booklooker spezifische Felder
     booklooker_listing_id = db.Column(db.String(255), nullable=True)
@@ -58,6 +67,7 @@ class Book(db.Model):
     booklooker_listing_error = db.Column(db.Text, nullable=True)
     booklooker_upload_file = db.Column(db.String(255), nullable=True)
     booklooker_import_status = db.Column(db.String(50), nullable=True, default='PENDING')
+    booklooker_dirty_at = db.Column(db.DateTime, nullable=True, index=True)  # Letzte für Booklooker relevante Änderung
     
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -241,6 +251,7 @@ class Book(db.Model):
             'weight': self.weight,
             'language': self.language,
             'genre': self.genre,
+            'sparte': self.sparte,
             'condition': self.condition,
             'price': float(self.price) if self.price else None,
             'shipping': {
@@ -266,6 +277,7 @@ class Book(db.Model):
             'ebay_listing_url': self.ebay_listing_url,
             'ebay_listing_error': self.ebay_listing_error,
             'ebay_last_sync': datetime.strftime(self.ebay_last_sync, '%Y-%m-%d %H:%M:%S') if self.ebay_last_sync else None,
+            'ebay_listed_price': float(self.ebay_listed_price) if self.ebay_listed_price is not None else None,
             'booklooker_listing_id': self.booklooker_listing_id,
             'booklooker_status': self.booklooker_status,
             'booklooker_listing_error': self.booklooker_listing_error,
@@ -282,3 +294,208 @@ class Book(db.Model):
         if 'updated_at' in data:
             del data['updated_at']
         return Book(**data)
+
+
+class JobCheckpoint(db.Model):
+    """Fortschritt und Statistiken von Hintergrundjobs, damit abgebrochene Läufe fortgesetzt werden können."""
+    name = db.Column(db.String(100), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.JSON, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def load(name):
+        """Lädt den Checkpoint eines Jobs oder legt ihn (ungespeichert) neu an."""
+        checkpoint = JobCheckpoint.query.get(name)
+        if checkpoint is None:
+            checkpoint = JobCheckpoint(name=name, last_id=0, state={})
+            db.session.add(checkpoint)
+        return checkpoint
+
+    def __repr__(self):
+        return f'<JobCheckpoint {self.name} at {self.last_id}>'
+
+
+class PriceObservation(db.Model):
+    """Einzelne beobachtete Marktpreise (nur anhängen, nie ändern)."""
+    __tablename__ = 'price_observation'
+    __table_args__ = (
+        db.Index('ix_price_observation_item_observed', 'item_key', 'observed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_key = db.Column(db.String(300), nullable=False)  # Normalisierte ISBN bzw. Werkschlüssel
+    source = db.Column(db.String(50), nullable=False)
+    condition = db.Column(db.String(50), nullable=True)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='EUR')
+    observed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PriceObservation {self.item_key} {self.price} {self.currency}>'
+
+
+class PriceRollup(db.Model):
+    """Tages- und Monatsaggregate der Preisbeobachtungen, inkrementell gepflegt."""
+    __tablename__ = 'price_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('item_key', 'period', 'period_start', name='uq_price_rollup_item_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_key = db.Column(db.String(300), nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # 'day' oder 'month'
+    period_start = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    price_min = db.Column(db.Numeric(10, 2), nullable=True)
+    price_max = db.Column(db.Numeric(10, 2), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def average(self):
+        return float(self.price_sum) / self.count if self.count else None
+
+    def __repr__(self):
+        return f'<PriceRollup {self.item_key} {self.period} {self.period_start}>'
+
+
+class MarketOffer(db.Model):
+    """Vergleichsangebot aus der Marktrecherche, beim Import einmal geparst."""
+    __tablename__ = 'market_offer'
+    __table_args__ = (
+        db.Index('ix_market_offer_item_observed', 'item_key', 'observed_at'),
+        db.Index('ix_market_offer_comparables', 'isbn', 'edition_key', 'observed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id', ondelete='SET NULL'), nullable=True, index=True)
+    item_key = db.Column(db.String(300), nullable=False)  # Normalisierte ISBN bzw. Werkschlüssel
+    isbn = db.Column(db.String(13), nullable=True, index=True)  # ISBN-13 ohne Trennzeichen
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='EUR')
+    condition = db.Column(db.String(100), nullable=True)
+    platform = db.Column(db.String(100), nullable=True)
+    seller = db.Column(db.String(255), nullable=True)
+    link = db.Column(db.String(1000), nullable=True)
+    # 'aktuelle_auflage', 'andere_auflagen' oder 'ohne_auflage'
+    edition_kind = db.Column(db.String(20), nullable=False)
+    same_edition = db.Column(db.Boolean, nullable=False, default=False)
+    edition = db.Column(db.String(100), nullable=True)
+    edition_key = db.Column(db.String(100), nullable=True)  # Normalisierte Auflage für den Vergleichsindex
+    publication_year = db.Column(db.Integer, nullable=True)
+    source = db.Column(db.String(50), nullable=False, default='gemini')
+    observed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'book_id': self.book_id,
+            'isbn': self.isbn,
+            'price': float(self.price),
+            'currency': self.currency,
+            'condition': self.condition,
+            'platform': self.platform,
+            'seller': self.seller,
+            'link': self.link,
+            'edition_kind': self.edition_kind,
+            'same_edition': self.same_edition,
+            'edition': self.edition,
+            'publication_year': self.publication_year,
+            'source': self.source,
+            'observed_at': self.observed_at.isoformat() if self.observed_at else None
+        }
+
+    def __repr__(self):
+        return f'<MarketOffer {self.item_key} {self.price} {self.currency}>'
+
+
+class BooklookerTombstone(db.Model):
+    """Gelöschte Bücher, die noch aus dem Booklooker-Bestand entfernt werden müssen."""
+    __tablename__ = 'booklooker_tombstone'
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=False)  # Bestell-Nr. bei Booklooker
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BooklookerTombstone {self.book_id}>'
+
+
+class EbayPicture(db.Model):
+    """Bei eBay gehostete Bilder, nach dem Inhalt (SHA-256) der Originaldatei."""
+    __tablename__ = 'ebay_picture'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+    source_url = db.Column(db.String(500), nullable=True, index=True)  # Erste bekannte GCS-URL des Bildes
+    ebay_url = db.Column(db.String(500), nullable=False)
+    use_by = db.Column(db.DateTime, nullable=True)  # Verfällt, solange es in keinem Angebot verwendet wird
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EbayPicture {self.content_hash[:12]}>'
+
+
+class StockSyncEvent(db.Model):
+    """Verkauf auf einem Marktplatz und das Beenden der Angebote auf den anderen."""
+    __tablename__ = 'stock_sync_event'
+    __table_args__ = (
+        db.UniqueConstraint('marketplace', 'sale_ref', name='uq_stock_sync_event_sale'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=True, index=True)
+    marketplace = db.Column(db.String(20), nullable=False)  # Marktplatz des Verkaufs
+    sale_ref = db.Column(db.String(100), nullable=False)  # Transaktions- bzw. Bestellnummer
+    sold_at = db.Column(db.DateTime, nullable=False)
+    detected_at = db.Column(db.DateTime, nullable=False)
+    propagated_at = db.Column(db.DateTime, nullable=True, index=True)
+    delay_seconds = db.Column(db.Float, nullable=True)  # Verkauf bis Beenden der übrigen Angebote
+    ended = db.Column(db.JSON, nullable=True)  # Ergebnis je Marktplatz
+    error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            'book_id': self.book_id,
+            'marketplace': self.marketplace,
+            'sale_ref': self.sale_ref,
+            'sold_at': self.sold_at.isoformat() if self.sold_at else None,
+            'detected_at': self.detected_at.isoformat() if self.detected_at else None,
+            'propagated_at': self.propagated_at.isoformat() if self.propagated_at else None,
+            'delay_seconds': self.delay_seconds,
+            'ended': self.ended,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return f'<StockSyncEvent {self.marketplace} {self.sale_ref}>'
+
+
+# Felder, die in der Booklooker-Importdatei landen (siehe BooklookerAPI._book_to_row)
+BOOKLOOKER_FIELDS = (
+    'title', 'author', 'publisher', 'edition', 'publication_year', 'condition',
+    'description', 'isbn', 'format', 'weight', 'price', 'sparte'
+)
+# Status, in denen ein Buch bei Booklooker gelistet ist oder importiert wird
+BOOKLOOKER_LISTED_STATUSES = ('active', 'pending')
+
+
+@event.listens_for(Book, 'before_update')
+def _track_booklooker_changes(mapper, connection, target):
+    """Markiert bereits hochgeladene Bücher für den Delta-Abgleich, wenn sich Exportfelder ändern."""
+    if target.booklooker_status not in BOOKLOOKER_LISTED_STATUSES:
+        return
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in BOOKLOOKER_FIELDS):
+        target.booklooker_dirty_at = datetime.utcnow()
+
+
+@event.listens_for(Book, 'after_delete')
+def _record_booklooker_tombstone(mapper, connection, target):
+    """Merkt gelöschte, bei Booklooker gelistete Bücher zum Entfernen vor."""
+    if target.booklooker_status in BOOKLOOKER_LISTED_STATUSES:
+        connection.execute(BooklookerTombstone.__table__.insert().values(
+            book_id=target.id, deleted_at=datetime.utcnow()
+        ))
+
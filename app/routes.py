@@ -1,17 +1,28 @@
 import os
-import re
+import hmac
 import json
 import traceback
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import render_template, request, jsonify, current_app, url_for
 from werkzeug.utils import secure_filename
 from google.cloud import storage  # GCS Import hinzugefügt
 from . import db
-from .models import Book
+from .models import Book, StockSyncEvent
 from .controllers.booklooker_controller import BooklookerController
 from .controllers.image_analysis_controller import ImageAnalysisController
 from .controllers.price_analysis_controller import PriceAnalysisController
+from .utils.repricing_service import repricing_runner
+from .utils.ebay_bulk_lister import ebay_bulk_runner
+from .utils.stock_sync import stock_sync_worker, propagation_stats
+from .utils.gcs import blob_name_from_url
+from .utils.image_deleter import image_deleter
+from .utils.booklooker_sync_service import FINAL_STATUSES
+from .utils.market_offers import estimate_from_comparables, ingest_gemini_offers, offers_for_book
+from .utils.book_keys import normalize_isbn
+from .utils.price_history import observations_from_offers, record_observations
+from .utils.price_parser import parse_price_range
+from .utils.sparten_index import get_sparten_index
 
 def init_routes(app):
     def allowed_file(filename):
@@ -39,8 +50,12 @@ def init_routes(app):
         return render_template('index.html', books=books)
 
     @app.route('/upload', methods=['POST'])
-    async def upload_book():
-        """Verarbeitet den Buchupload mit Bildern und führt Analyse durch"""
+    def upload_book():
+        """
+        Verarbeitet den Buchupload mit Bildern und führt Analyse durch.
+        Synchron, da GCS, Gemini und Datenbank blockierend arbeiten; asynchrone
+        Marktdatenabfragen laufen über den gemeinsamen Event-Loop (async_runtime).
+        """
         if 'images' not in request.files:
             return jsonify({'error': 'Keine Bilder hochgeladen'}), 400
         
@@ -94,6 +109,20 @@ def init_routes(app):
             if not weight or not weight.isdigit() or int(weight) <= 0:
                 return jsonify({'error': 'Bitte geben Sie ein gültiges Gewicht in Gramm ein'}), 400
 
+            # Optionale ISBN/Auflage aus dem Formular: Liegen genügend aktuelle
+            # Vergleichsangebote vor, entfällt die Marktrecherche im Gemini-Prompt
+            isbn_hint = (request.form.get('isbn') or '').strip()
+            edition_hint = (request.form.get('edition') or '').strip() or None
+            comparables = None
+            if isbn_hint:
+                try:
+                    comparables = estimate_from_comparables(isbn_hint, edition_hint)
+                except Exception as e:
+                    app.logger.error(f"Fehler bei der Abfrage des Vergleichsindex für ISBN {isbn_hint}: {str(e)}")
+                if comparables:
+                    app.logger.info(f"{comparables['count']} aktuelle Vergleichsangebote für ISBN {isbn_hint}, "
+                                    f"Marktrecherche wird übersprungen")
+
             # Erstelle temporären Bucheintrag für die Analyse
             book = Book(
                 title='Wird analysiert...',
@@ -120,7 +149,11 @@ def init_routes(app):
                 
                 # Führe Bildanalyse durch
                 app.logger.debug(f"Starte Analyse von {len(image_urls)} Bildern")
-                analysis_results = image_analyzer.analyze_book_images(book.id, image_urls)
+                analysis_results = image_analyzer.analyze_book_images(
+                    book.id,
+                    image_urls,
+                    include_market_research=comparables is None
+                )
                 app.logger.debug(f"Bildanalyse abgeschlossen: {analysis_results}")
                 
                 # Aktualisiere den Bucheintrag mit den Analyseergebnissen
@@ -131,8 +164,28 @@ def init_routes(app):
                 book.author = metadata.get('autor') or metadata.get('author') or metadata.get('verfasser') or 'Unbekannter Autor'
                 book.publication_year = metadata.get('erscheinungsjahr')
                 book.publisher = metadata.get('verlag')
-                book.isbn = metadata.get('isbn', metadata.get('isbn_ean'))
+                book.isbn = metadata.get('isbn', metadata.get('isbn_ean')) or isbn_hint or None
                 book.edition = metadata.get('auflage', metadata.get('auflage_edition'))
+                price_review = None
+                if comparables and normalize_isbn(book.isbn) != normalize_isbn(isbn_hint):
+                    # Vergleichspreise gehören zu einem anderen Buch: die der erkannten ISBN
+                    # verwenden oder die übersprungene Marktrecherche nachholen
+                    app.logger.warning(f"Erkannte ISBN {book.isbn} weicht von der angegebenen ISBN {isbn_hint} ab "
+                                       f"(Buch ID {book.id}), Vergleichspreise der angegebenen ISBN werden verworfen")
+                    isbn_hint, edition_hint = book.isbn, book.edition
+                    try:
+                        comparables = estimate_from_comparables(isbn_hint, edition_hint)
+                    except Exception as e:
+                        app.logger.error(f"Fehler bei der Abfrage des Vergleichsindex für ISBN {isbn_hint}: {str(e)}")
+                        comparables = None
+                    if comparables is None:
+                        market_results = image_analyzer.analyze_book_images(
+                            book.id, image_urls, include_market_research=True
+                        )
+                        analysis_results['market_data'] = market_results.get('market_data', {})
+                        if market_results.get('error') or not analysis_results['market_data']:
+                            price_review = (f"Erkannte ISBN {book.isbn} weicht von der angegebenen ISBN ab, "
+                                            f"Marktrecherche fehlgeschlagen")
                 book.language = metadata.get('sprache', 'de')
                 book.page_count = metadata.get('seitenanzahl')
                 book.format = metadata.get('format')
@@ -152,6 +205,7 @@ def init_routes(app):
                     book.dimensions = None
                 
                 book.genre = metadata.get('genre', metadata.get('genre_kategorie', 'Books'))
+                book.sparte = get_sparten_index().best_match(book.genre, book.title, book.language)
                 
                 # Zustand aus der Condition-Analyse
                 condition_analysis = analysis_results.get('condition_analysis', {})
@@ -191,27 +245,42 @@ def init_routes(app):
                 empfehlung = preisanalyse.get('empfehlung', {})
                 verkaufspreis_empfehlung = empfehlung.get('verkaufspreis', {})
 
+                if comparables:
+                    # Vergleichspreise auf den erkannten Zustand des Exemplars umrechnen
+                    try:
+                        comparables = estimate_from_comparables(
+                            isbn_hint, edition_hint, condition=book.condition
+                        ) or comparables
+                    except Exception as e:
+                        app.logger.error(f"Fehler bei der zustandsbezogenen Vergleichspreis-Berechnung: {str(e)}")
+
+                if comparables:
+                    # Preis aus dem Vergleichsindex statt aus der Marktrecherche
+                    price_results = {
+                        'value_estimation': {
+                            'price_range': {
+                                'recommended': comparables['recommended'],
+                                'min': comparables['min'],
+                                'max': comparables['max']
+                            },
+                            'confidence_score': comparables['confidence_score']
+                        },
+                        'market_data': {
+                            'vergleichsindex': comparables
+                        }
+                    }
                 # Extrahiere Preise aus der korrekten Struktur
-                if zustands_preise and verkaufspreis_empfehlung:
+                elif zustands_preise and verkaufspreis_empfehlung:
                     # Empfohlener Preis (optimal)
                     recommended_str = verkaufspreis_empfehlung.get('optimal', '0-0 EUR')
                     # Minimalpreis (aus Zustand "akzeptabel")
                     min_str = zustands_preise.get('akzeptabel', {}).get('preis', '0-0 EUR')
                     # Maximalpreis (aus Zustand "sehr_gut" oder "neuwertig")
                     max_str = zustands_preise.get('sehr_gut', {}).get('preis') or zustands_preise.get('neuwertig', {}).get('preis', '0-0 EUR')
-                    
-                    def extract_price_range(price_str):
-                        if not price_str:
-                            return 0.0, 0.0
-                        # Extrahiere nur die Zahlen
-                        numbers = [float(n) for n in re.findall(r'\d+(?:\.\d+)?', price_str)]
-                        if len(numbers) >= 2:
-                            return numbers[0], numbers[1]
-                        return numbers[0], numbers[0] if numbers else (0.0, 0.0)
-                    
-                    rec_min, rec_max = extract_price_range(recommended_str)
-                    min_price, _ = extract_price_range(min_str)
-                    _, max_price = extract_price_range(max_str)
+
+                    rec_min, rec_max = parse_price_range(recommended_str)
+                    min_price, _ = parse_price_range(min_str)
+                    _, max_price = parse_price_range(max_str)
                     
                     recommended_price = (rec_min + rec_max) / 2
 
@@ -255,7 +324,18 @@ def init_routes(app):
                     'market_data': market_data,
                     'last_updated': datetime.utcnow().isoformat()
                 }
+                if price_review:
+                    book.price_details['needs_review'] = True
+                    book.price_details['review_reason'] = price_review
                 
+                # Vergleichsangebote einmal parsen und als Zeilen speichern,
+                # die der gleichen Auflage zusätzlich in der Preishistorie
+                try:
+                    offers = ingest_gemini_offers(book, market_data)
+                    record_observations(observations_from_offers(offers))
+                except Exception as e:
+                    app.logger.error(f"Fehler beim Speichern der Preisbeobachtungen für Buch {book.id}: {str(e)}")
+
                 book.processing_status = 'COMPLETED'
                 # Zusätzliches Logging vor dem Commit
                 app.logger.info(f"COMMITTING results for book ID {book.id}. Title: {book.title}, ISBN: {book.isbn}, Price: {book.price}")
@@ -317,6 +397,11 @@ def init_routes(app):
                 if result['success']:
                     status = result.get('file_status', 'UNKNOWN')
                     status_message = booklooker.api.get_status_message(status)
+                    book.booklooker_import_status = status
+                    book.booklooker_last_sync = datetime.utcnow()
+                    if status in FINAL_STATUSES:
+                        book.booklooker_status = FINAL_STATUSES[status]
+                    db.session.commit()
                     return jsonify({
                         'success': True,
                         'status': status,
@@ -332,10 +417,6 @@ def init_routes(app):
                 }), 500
 
         # POST Methode (Upload)
-        """Lädt ein Buch zu Booklooker hoch"""
-        book = Book.query.get_or_404(book_id)
-        booklooker = BooklookerController()
-        
         # Validiere nur beim Upload
         if not book.price or float(book.price) <= 0:
             return jsonify({
@@ -381,6 +462,8 @@ def init_routes(app):
         
         if request.method == 'PUT':
             data = request.get_json()
+            if data.get('sparte') and not get_sparten_index().is_valid(data['sparte']):
+                return jsonify({'error': f"Ungültige Spartennummer: {data['sparte']}"}), 400
             for key, value in data.items():
                 if hasattr(book, key) and key not in ['created_at', 'updated_at']:
                     setattr(book, key, value)
@@ -391,34 +474,16 @@ def init_routes(app):
 
         if request.method == 'DELETE':
             try:
-                # Lösche die zugehörigen Bilder aus GCS
-                gcs_client = storage.Client()
                 bucket_name = current_app.config.get('GCS_BUCKET_NAME')
-                if bucket_name:
-                    bucket = gcs_client.bucket(bucket_name)
-                    for image_url in book.image_urls:
-                        try:
-                            # Extrahiere den Blob-Namen aus der URL
-                            # Annahme: URL ist https://storage.googleapis.com/BUCKET_NAME/BLOB_NAME
-                            if image_url.startswith(f"https://storage.googleapis.com/{bucket_name}/"):
-                                blob_name = image_url.split(f"https://storage.googleapis.com/{bucket_name}/", 1)[1]
-                                blob = bucket.blob(blob_name)
-                                if blob.exists():
-                                    blob.delete()
-                                    app.logger.debug(f"Bild aus GCS gelöscht: {blob_name}")
-                                else:
-                                     app.logger.warning(f"Bild nicht in GCS gefunden zum Löschen: {blob_name}")
-                            else:
-                                app.logger.warning(f"Konnte Blob-Namen nicht aus URL extrahieren: {image_url}")
-                        except Exception as gcs_del_error:
-                            app.logger.error(f"Fehler beim Löschen von Bild aus GCS ({image_url}): {gcs_del_error}")
-                else:
-                    app.logger.error("GCS_BUCKET_NAME nicht konfiguriert, Bilder können nicht gelöscht werden.")
+                blob_names = [blob_name_from_url(url, bucket_name) for url in book.image_urls or []]
 
                 # Lösche den Datenbankeintrag
                 db.session.delete(book)
                 db.session.commit()
                 app.logger.debug(f"Buch gelöscht: {book.title}")
+
+                # Die Bilder werden im Hintergrund gesammelt aus GCS gelöscht
+                image_deleter.enqueue(blob_names)
                 
                 return jsonify({'message': 'Buch erfolgreich gelöscht'}), 200
             except Exception as e:
@@ -436,4 +501,154 @@ def init_routes(app):
         return jsonify({
             'book_id': book.id,
             'status': book.processing_status or 'UNKNOWN' # Fallback, falls Status null ist
-        })
\ No newline at end of file
+        })
+
+    @app.route('/books/<int:book_id>/offers', methods=['GET'])
+    def get_book_offers(book_id):
+        """Gibt die Vergleichsangebote eines Buches zurück (sort=price, -price oder observed_at)."""
+        Book.query.get_or_404(book_id)
+        offers = offers_for_book(
+            book_id,
+            sort=request.args.get('sort', 'price'),
+            same_edition_only=request.args.get('same_edition') == '1'
+        ).all()
+        return jsonify({
+            'book_id': book_id,
+            'offers': [offer.to_dict() for offer in offers]
+        })
+
+    def admin_authorized():
+        """Prüft das Admin-Token; ohne konfiguriertes ADMIN_TOKEN sind Admin-Routen gesperrt."""
+        expected = current_app.config.get('ADMIN_TOKEN') or os.getenv('ADMIN_TOKEN')
+        if not expected:
+            app.logger.warning("ADMIN_TOKEN nicht konfiguriert, Admin-Anfrage abgelehnt")
+            return False
+        provided = request.headers.get('X-Admin-Token') or ''
+        return hmac.compare_digest(provided.encode('utf-8'), str(expected).encode('utf-8'))
+
+    @app.route('/admin/repricing', methods=['GET', 'POST'])
+    def admin_repricing():
+        """Startet die Neubepreisung des Bestands (POST) bzw. liefert deren Status (GET)."""
+        if not admin_authorized():
+            return jsonify({'error': 'Nicht autorisiert'}), 403
+
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            try:
+                options = {
+                    'max_age': timedelta(hours=float(data.get('max_age_hours', 24))),
+                    'chunk_size': int(data.get('chunk_size', 200)),
+                    'concurrency': int(data.get('concurrency', 8)),
+                    'force_refresh': bool(data.get('force_refresh', False)),
+                    'resume': not data.get('restart', False),
+                    'limit': int(data['limit']) if data.get('limit') else None
+                }
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Ungültige Parameter: {str(e)}'}), 400
+
+            if not repricing_runner.start(current_app._get_current_object(), **options):
+                return jsonify({'message': 'Neubepreisung läuft bereits', 'running': True}), 409
+            return jsonify({'message': 'Neubepreisung gestartet', 'running': True}), 202
+
+        return jsonify({
+            'running': repricing_runner.running,
+            'stats': repricing_runner.last_stats,
+            'error': repricing_runner.last_error
+        })
+
+    @app.route('/admin/ebay/bulk-listing', methods=['GET', 'POST'])
+    def admin_ebay_bulk_listing():
+        """Stellt eine Auswahl von Büchern gesammelt bei eBay ein (POST) bzw. liefert den Status (GET)."""
+        if not admin_authorized():
+            return jsonify({'error': 'Nicht autorisiert'}), 403
+
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            try:
+                options = {
+                    'book_ids': [int(book_id) for book_id in data.get('book_ids') or []] or None,
+                    'concurrency': int(data.get('concurrency', 4)),
+                    'batch_size': int(data.get('batch_size', 50)),
+                    'limit': int(data['limit']) if data.get('limit') else None
+                }
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Ungültige Parameter: {str(e)}'}), 400
+
+            if not ebay_bulk_runner.start(current_app._get_current_object(), **options):
+                return jsonify({'message': 'eBay-Sammel-Listing läuft bereits', 'running': True}), 409
+            return jsonify({'message': 'eBay-Sammel-Listing gestartet', 'running': True}), 202
+
+        return jsonify({
+            'running': ebay_bulk_runner.running,
+            'stats': ebay_bulk_runner.last_stats,
+            'error': ebay_bulk_runner.last_error
+        })
+
+    @app.route('/admin/stock-sync', methods=['GET'])
+    def admin_stock_sync():
+        """Status des Bestandsabgleichs und Verzögerung vom Verkauf bis zum Beenden der übrigen Angebote."""
+        if not admin_authorized():
+            return jsonify({'error': 'Nicht autorisiert'}), 403
+
+        recent = StockSyncEvent.query.order_by(StockSyncEvent.id.desc()).limit(20).all()
+        return jsonify({
+            'running': stock_sync_worker.running,
+            'interval': stock_sync_worker.interval,
+            'stats': stock_sync_worker.last_stats,
+            'error': stock_sync_worker.last_error,
+            'propagation': propagation_stats(),
+            'recent': [event.to_dict() for event in recent]
+        })
+
+    @app.route('/booklooker/sparten', methods=['GET'])
+    def booklooker_sparten():
+        """Schlägt Booklooker-Sparten zu Genre und Titel vor (genre, title, language als Query-Parameter)."""
+        index = get_sparten_index()
+        suggestions = index.suggest(
+            request.args.get('genre'),
+            request.args.get('title'),
+            request.args.get('language'),
+            limit=min(request.args.get('limit', 5, type=int), 20)
+        )
+        return jsonify({
+            'suggestions': [
+                {'id': sparte_id, 'name': index.get(sparte_id).name, 'path': index.get(sparte_id).path, 'score': score}
+                for sparte_id, score in suggestions
+            ]
+        })
+
+    @app.route('/booklooker/bulk-upload', methods=['POST'])
+    def booklooker_bulk_upload():
+        """
+        Lädt mehrere Bücher gebündelt zu Booklooker hoch. Ohne book_ids werden alle
+        Bücher mit Preis hochgeladen, die noch nicht erfolgreich hochgeladen wurden.
+        """
+        if not admin_authorized():
+            return jsonify({'error': 'Nicht autorisiert'}), 403
+
+        data = request.get_json(silent=True) or {}
+        try:
+            book_ids = [int(book_id) for book_id in data.get('book_ids') or []]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Ungültige Buch-IDs'}), 400
+
+        booklooker = BooklookerController()
+        books = booklooker.books_for_upload(book_ids).all()
+        if not books:
+            return jsonify({'success': False, 'message': 'Keine Bücher für den Upload gefunden'}), 400
+
+        try:
+            result = booklooker.upload_books(books)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Fehler beim Booklooker Sammel-Upload: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)}), 500
+
+        return jsonify({
+            'success': result['success'],
+            'message': result['message'],
+            'files': result['files'],
+            'results': {str(book_id): row for book_id, row in result['results'].items()}
+        }), 200 if result['success'] else 207
+
@@ -0,0 +1,134 @@
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from app.utils.http_session import close_client_session
+
+# Anzahl Threads für blockierende Aufrufe (Datenbank, requests, Gemini)
+BLOCKING_WORKERS = int(os.environ.get('ASYNC_BLOCKING_WORKERS', 16))
+
+
+class AsyncRuntime:
+    """
+    Langlebiger Event-Loop in einem eigenen Hintergrund-Thread pro Worker-Prozess.
+
+    Synchroner Code (Flask-Views, CLI, Hintergrundjobs) reicht Coroutinen per
+    submit() oder run() ein, statt für jeden Aufruf mit asyncio.run einen neuen
+    Loop samt neuer HTTP-Session aufzubauen. Blockierende Aufrufe innerhalb der
+    Coroutinen laufen über run_blocking() in einem eigenen Thread-Pool, wahlweise
+    mit App-Kontext, damit sie den Loop nicht anhalten.
+
+    Der Loop wird beim ersten Gebrauch gestartet und nach einem Fork (z.B.
+    gunicorn --preload) im Kindprozess neu aufgebaut.
+    """
+
+    def __init__(self, name: str = 'async-runtime', blocking_workers: int = BLOCKING_WORKERS):
+        self.name = name
+        self.blocking_workers = blocking_workers
+        self.app = None
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def init_app(self, app):
+        """Hinterlegt die App, deren Kontext blockierende Aufrufe erhalten."""
+        self.app = app
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Der laufende Hintergrund-Loop; wird bei Bedarf gestartet."""
+        if self._loop is None or self._pid != os.getpid():
+            self._start()
+        return self._loop
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.blocking_workers, thread_name_prefix=f'{self.name}-blocking'
+            )
+            loop.set_default_executor(executor)
+            ready = threading.Event()
+
+            def _serve():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_serve, name=self.name, daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread, self._executor = loop, thread, executor
+            self._pid = os.getpid()
+            logging.debug(f"Event-Loop '{self.name}' gestartet (PID {self._pid})")
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Reicht eine Coroutine ein, ohne auf das Ergebnis zu warten."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Führt eine Coroutine auf dem Hintergrund-Loop aus und wartet auf das Ergebnis.
+        Darf nicht aus dem Loop-Thread selbst aufgerufen werden.
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() blockiert den eigenen Event-Loop; stattdessen await verwenden")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _call_with_context(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.app is None:
+            return fn(*args, **kwargs)
+        with self.app.app_context():
+            return fn(*args, **kwargs)
+
+    async def run_blocking(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Führt einen blockierenden Aufruf im Thread-Pool aus, mit App-Kontext falls
+        eine App hinterlegt ist. Kann von jedem Event-Loop aus verwendet werden.
+        """
+        if self._executor is None or self._pid != os.getpid():
+            self._start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._call_with_context, fn, *args, **kwargs)
+        )
+
+    def shutdown(self, timeout: float = 5.0):
+        """Schließt die HTTP-Session des Loops und beendet Loop und Thread-Pool."""
+        with self._lock:
+            loop, thread, executor = self._loop, self._thread, self._executor
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = self._thread = self._executor = None
+        try:
+            asyncio.run_coroutine_threadsafe(close_client_session(), loop).result(timeout)
+        except Exception as e:
+            logging.warning(f"Fehler beim Schließen der HTTP-Session: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
+        executor.shutdown(wait=False)
+
+
+# Prozessweite Instanz
+async_runtime = AsyncRuntime()
+atexit.register(async_runtime.shutdown)
@@ -0,0 +1,127 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+_NON_ISBN_CHARS = re.compile(r'[^0-9X]')
+_NON_WORD_CHARS = re.compile(r'[^\w]+', re.UNICODE)
+# Länge der item_key-Spalten (PriceObservation, PriceRollup, MarketOffer)
+MAX_ITEM_KEY_LENGTH = 300
+# Lesbarer Anfang gekürzter Werkschlüssel, gefolgt von '#' und dem SHA-1 des vollen Schlüssels
+_ITEM_KEY_PREFIX_LENGTH = 200
+
+# Preisfaktoren je Zustand relativ zu einem neuen Exemplar
+CONDITION_FACTORS = {
+    'New': 1.0,
+    'Like New': 0.9,
+    'Very Good': 0.8,
+    'Good': 0.7,
+    'Fair': 0.6,
+    'Poor': 0.4
+}
+# Reihenfolge ist wichtig: 'wie neu' vor 'neu', 'sehr gut' vor 'gut'
+_CONDITION_PATTERNS = [
+    ('Like New', ('wie neu', 'neuwertig', 'like new', 'as new')),
+    ('New', ('neu', 'new')),
+    ('Very Good', ('sehr gut', 'very good')),
+    ('Good', ('gut', 'good')),
+    ('Fair', ('akzeptabel', 'befriedigend', 'ausreichend', 'gebraucht', 'acceptable', 'fair')),
+    ('Poor', ('schlecht', 'mangelhaft', 'poor')),
+]
+
+
+def normalize_isbn(isbn: Optional[str]) -> str:
+    """
+    Normalisiert eine ISBN auf ISBN-13 ohne Trennzeichen.
+    Ungültige oder leere Werte ergeben einen leeren String.
+    """
+    if not isbn:
+        return ''
+    value = _NON_ISBN_CHARS.sub('', str(isbn).upper())
+    if len(value) == 10:
+        # ISBN-10 nach ISBN-13 umrechnen, damit beide Schreibweisen denselben Schlüssel ergeben
+        core = '978' + value[:9]
+        if not core.isdigit():
+            return ''
+        checksum = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(core))
+        return core + str((10 - checksum % 10) % 10)
+    if len(value) == 13 and value.isdigit():
+        return value
+    return ''
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Kleinschreibung, ohne Satzzeichen und mit einfachen Leerzeichen."""
+    if not value:
+        return ''
+    return ' '.join(_NON_WORD_CHARS.sub(' ', str(value).lower()).split())
+
+
+def normalize_condition(value: Optional[str]) -> Optional[str]:
+    """
+    Ordnet eine Zustandsangabe (deutsch oder englisch, z.B. "Sehr gut" oder
+    "Like New") einem Schlüssel aus CONDITION_FACTORS zu; None, wenn nichts passt.
+    """
+    if value in CONDITION_FACTORS:
+        return value
+    text = normalize_text(value)
+    if not text:
+        return None
+    padded = f' {text} '
+    for condition, patterns in _CONDITION_PATTERNS:
+        if any(f' {pattern} ' in padded for pattern in patterns):
+            return condition
+    return None
+
+
+def work_key(title: Optional[str], author: Optional[str], edition: Optional[str] = None) -> str:
+    """Schlüssel für ein Werk ohne ISBN aus Titel, Autor und Auflage."""
+    return '|'.join([normalize_text(title), normalize_text(author), normalize_text(edition)])
+
+
+def bounded_item_key(key: str) -> str:
+    """
+    Kürzt Titelschlüssel, die nicht in die item_key-Spalten passen. Der Anfang bleibt
+    lesbar, der SHA-1 des vollen Schlüssels hält lange Titel unterscheidbar.
+    """
+    if len(key) <= MAX_ITEM_KEY_LENGTH:
+        return key
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return f"{key[:_ITEM_KEY_PREFIX_LENGTH]}#{digest}"
+
+
+@dataclass(frozen=True)
+class MarketQuery:
+    """
+    Unveränderliche Momentaufnahme der Buchdaten, die für die Marktpreisermittlung
+    benötigt werden. Kann ohne Datenbank-Session an andere Threads übergeben werden.
+    """
+    isbn: str = ''
+    title: str = ''
+    author: str = ''
+    edition: str = ''
+    condition: str = ''
+    publication_year: Optional[int] = None
+
+    @classmethod
+    def from_book(cls, book) -> 'MarketQuery':
+        return cls(
+            isbn=normalize_isbn(getattr(book, 'isbn', None)),
+            title=getattr(book, 'title', None) or '',
+            author=getattr(book, 'author', None) or '',
+            edition=getattr(book, 'edition', None) or '',
+            condition=getattr(book, 'condition', None) or '',
+            publication_year=getattr(book, 'publication_year', None)
+        )
+
+    @property
+    def item_key(self) -> str:
+        """Titelschlüssel ohne Zustand: ISBN oder Titel/Autor/Auflage."""
+        if self.isbn:
+            return f"isbn:{self.isbn}"
+        return bounded_item_key(f"work:{work_key(self.title, self.author, self.edition)}")
+
+    @property
+    def key(self) -> str:
+        """Cache-Schlüssel für Marktdaten: Titelschlüssel plus Zustand."""
+        return f"market:{self.item_key}:{normalize_text(self.condition)}"
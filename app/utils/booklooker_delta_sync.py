@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, or_
+
+from app import db
+from app.models import Book, BooklookerTombstone, JobCheckpoint, BOOKLOOKER_LISTED_STATUSES
+from app.controllers.booklooker_controller import BooklookerController
+
+
+class BooklookerDeltaSync:
+    """
+    Überträgt nur die seit dem letzten erfolgreichen Lauf geänderten oder gelöschten
+    Artikel zu Booklooker.
+
+    Geänderte Bücher werden über booklooker_dirty_at (indiziert, gesetzt vom
+    before_update-Listener in models) oberhalb des Wasserzeichens gefunden; gelöschte
+    Bücher über die Tombstone-Tabelle. Der Aufwand eines Laufs hängt damit nur von der
+    Zahl der Änderungen ab. Das Wasserzeichen (Änderungszeit und Buch-ID des zuletzt
+    übertragenen Buches) wird im JobCheckpoint gespeichert und nur weitergesetzt, wenn
+    alle Importdateien angenommen wurden.
+
+    booklooker_dirty_at wird beim Flush gesetzt, sichtbar wird die Änderung aber erst
+    beim Commit. Damit eine noch laufende Transaktion nicht unter ein bereits
+    weitergesetztes Wasserzeichen fällt, werden nur Änderungen übertragen, die älter
+    als safety_lag sind; jüngere folgen im nächsten Lauf.
+    """
+
+    CHECKPOINT_NAME = 'booklooker_delta'
+    SAFETY_LAG = timedelta(minutes=2)
+
+    def __init__(self, limit: int = 5000, controller: Optional[BooklookerController] = None,
+                 safety_lag: Optional[timedelta] = None):
+        self.limit = limit
+        self.controller = controller or BooklookerController()
+        self.safety_lag = self.SAFETY_LAG if safety_lag is None else safety_lag
+
+    def run(self) -> Dict[str, Any]:
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        state = dict(checkpoint.state or {})
+        watermark = datetime.fromisoformat(state['watermark']) if state.get('watermark') else None
+        started_at = datetime.utcnow()
+        stats = {
+            'started_at': started_at.isoformat(),
+            'watermark': state.get('watermark'),
+            'changed': 0,
+            'uploaded': 0,
+            'failed': 0,
+            'removed': 0,
+            'success': True
+        }
+
+        # Nach Änderungszeit sortiert, damit ein begrenzter Lauf ein gültiges Wasserzeichen hinterlässt
+        query = Book.query.filter(
+            Book.booklooker_dirty_at.isnot(None),
+            Book.booklooker_dirty_at < started_at - self.safety_lag,
+            Book.booklooker_status.in_(BOOKLOOKER_LISTED_STATUSES)
+        )
+        if watermark is not None:
+            query = query.filter(or_(
+                Book.booklooker_dirty_at > watermark,
+                and_(Book.booklooker_dirty_at == watermark, Book.id > checkpoint.last_id)
+            ))
+        books = query.order_by(Book.booklooker_dirty_at, Book.id).limit(self.limit).all()
+        last_book = (books[-1].booklooker_dirty_at, books[-1].id) if books else None
+
+        if books:
+            stats['changed'] = len(books)
+            result = self.controller.upload_books(books)
+            stats['uploaded'] = sum(1 for row in result['results'].values() if row['success'])
+            stats['failed'] = len(result['results']) - stats['uploaded']
+            # Abgelehnte Dateien (nicht einzelne ungültige Bücher) werden im nächsten Lauf wiederholt
+            if any(not import_file['success'] for import_file in result['files']):
+                stats['success'] = False
+
+        tombstones = BooklookerTombstone.query.order_by(BooklookerTombstone.id).limit(self.limit).all()
+        if tombstones:
+            result = self.controller.api.delete_articles(sorted({t.book_id for t in tombstones}))
+            if result['success']:
+                stats['removed'] = len(tombstones)
+                BooklookerTombstone.query.filter(
+                    BooklookerTombstone.id <= tombstones[-1].id
+                ).delete(synchronize_session=False)
+            else:
+                logging.error(f"Booklooker-Löschdatei abgelehnt: {result.get('message')}")
+                stats['success'] = False
+
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        state['last_run'] = stats
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        if stats['success'] and last_book is not None:
+            state['watermark'] = last_book[0].isoformat()
+            checkpoint.last_id = last_book[1]
+        checkpoint.state = state
+        db.session.commit()
+
+        logging.info(f"Booklooker-Delta: {stats['changed']} geändert, {stats['uploaded']} hochgeladen, "
+                     f"{stats['removed']} entfernt")
+        return stats
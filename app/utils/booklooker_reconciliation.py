@@ -0,0 +1,232 @@
+import csv
+import logging
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app import db
+from app.models import Book
+from app.utils.price_parser import parse_amount
+
+# Spalten der Booklooker-Importvorlage (ohne Kopfzeile), siehe BooklookerAPI._book_to_row
+ORDER_NR_COLUMN = 14
+PRICE_COLUMN = 16
+# Lokale Status, für die das Buch bei Booklooker gelistet sein sollte
+LISTED_STATUSES = ('active',)
+# Ab diesem Anteil fehlender Artikel wird nur mit force angewendet (vermutlich unvollständiger Export)
+MAX_MISSING_RATIO = 0.1
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BooklookerReconciliation:
+    """
+    Gleicht den Booklooker-Bestand mit der Book-Tabelle ab.
+
+    Der Artikel-Export (von Booklooker geladen oder als lokale Datei) wird zeilenweise
+    gelesen und blockweise über den Primärschlüssel (Bestell-Nr. = book.id) mit der
+    Datenbank verbunden, eine Abfrage pro Block. Fehlende Artikel ergeben sich aus
+    einem einzigen Durchlauf über die lokal als gelistet markierten Bücher.
+
+    Ergebnis ist ein Diff mit
+      missing          lokal gelistet, aber nicht bei Booklooker
+      extra            bei Booklooker, aber ohne passendes Buch
+      price_mismatch   Preis bei Booklooker weicht ab
+      status_mismatch  bei Booklooker gelistet, lokal aber nicht als aktiv geführt
+
+    Ein leerer Export oder einer, in dem mehr als max_missing_ratio der gelisteten
+    Bücher fehlen, wird nur mit force angewendet; sonst würde ein abgeschnittener
+    Download den halben Bestand als entfernt markieren.
+    """
+
+    def __init__(self, batch_size: int = 1000, price_tolerance: Decimal = Decimal('0.01'),
+                 encoding: str = 'utf-8-sig', max_missing_ratio: float = MAX_MISSING_RATIO):
+        self.batch_size = batch_size
+        self.max_missing_ratio = max_missing_ratio
+        self.price_tolerance = price_tolerance
+        self.encoding = encoding
+
+    def read_export(self, path: str) -> Iterator[Tuple[str, Optional[Decimal]]]:
+        """
+        Liest (Bestell-Nr., Preis) aus einer Exportdatei. Mit Kopfzeile werden die
+        Spalten über ihre Namen gefunden, sonst gilt die Spaltenfolge der Importvorlage.
+        """
+        with open(path, encoding=self.encoding, errors='replace', newline='') as handle:
+            reader = csv.reader(handle, delimiter='\t', quotechar='"')
+            order_column, price_column = ORDER_NR_COLUMN, PRICE_COLUMN
+            for line_number, row in enumerate(reader):
+                if line_number == 0:
+                    header = [cell.strip().lower() for cell in row]
+                    order_index = next((i for i, cell in enumerate(header) if cell.startswith('bestell')), None)
+                    if order_index is not None:
+                        order_column = order_index
+                        price_column = next((i for i, cell in enumerate(header) if 'preis' in cell), price_column)
+                        continue
+                if len(row) <= order_column or not row[order_column].strip():
+                    continue
+                price = parse_amount(row[price_column]) if len(row) > price_column else None
+                yield row[order_column].strip(), price
+
+    def reconcile(self, rows: Iterable[Tuple[str, Optional[Decimal]]], apply: bool = False,
+                  prices: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Erstellt den Diff für die Exportzeilen und übernimmt auf Wunsch die Korrekturen:
+        Status werden lokal angepasst, Preisabweichungen mit prices='remote' lokal
+        übernommen bzw. mit prices='local' erneut zu Booklooker hochgeladen.
+        Wirkt der Export unvollständig, wird ohne force nichts übernommen und der
+        Grund in diff['refused'] vermerkt.
+        """
+        diff: Dict[str, Any] = {
+            'missing': [],
+            'extra': [],
+            'price_mismatch': [],
+            'status_mismatch': [],
+            'duplicates': [],
+            'rows': 0,
+            'listed': 0,
+            'started_at': datetime.utcnow().isoformat()
+        }
+        seen: Set[int] = set()
+
+        for batch in _batches(rows, self.batch_size):
+            self._compare_batch(batch, diff, seen)
+
+        listed = (db.session.query(Book.id, Book.title)
+                  .filter(Book.booklooker_status.in_(LISTED_STATUSES))
+                  .order_by(Book.id)
+                  .yield_per(self.batch_size))
+        for book_id, title in listed:
+            diff['listed'] += 1
+            if book_id not in seen:
+                diff['missing'].append({'book_id': book_id, 'title': title})
+
+        diff['summary'] = {key: len(diff[key]) for key in
+                           ('missing', 'extra', 'price_mismatch', 'status_mismatch', 'duplicates')}
+        logging.info(f"Booklooker-Abgleich: {diff['rows']} Artikel, {diff['summary']}")
+
+        if apply:
+            refused = None if force else self._refuse_reason(diff)
+            if refused:
+                diff['refused'] = refused
+                logging.warning(f"Booklooker-Abgleich nicht angewendet: {refused}")
+            else:
+                diff['applied'] = self.apply(diff, prices=prices)
+        diff['finished_at'] = datetime.utcnow().isoformat()
+        return diff
+
+    def _refuse_reason(self, diff: Dict[str, Any]) -> Optional[str]:
+        """Grund, den Diff nicht anzuwenden, oder None."""
+        if diff['rows'] == 0:
+            return 'Der Export enthält keine Artikel'
+        missing = len(diff['missing'])
+        if diff['listed'] and missing > diff['listed'] * self.max_missing_ratio:
+            return (f"{missing} von {diff['listed']} gelisteten Büchern fehlen im Export "
+                    f"(mehr als {self.max_missing_ratio:.0%})")
+        return None
+
+    def _compare_batch(self, batch: List[Tuple[str, Optional[Decimal]]], diff: Dict[str, Any], seen: Set[int]):
+        remote = {}
+        for order_nr, price in batch:
+            diff['rows'] += 1
+            if not order_nr.isdigit():
+                diff['extra'].append({'order_nr': order_nr, 'price': float(price) if price is not None else None})
+                continue
+            book_id = int(order_nr)
+            if book_id in seen or book_id in remote:
+                diff['duplicates'].append({'book_id': book_id})
+                continue
+            remote[book_id] = price
+
+        books = (db.session.query(Book.id, Book.price, Book.booklooker_status)
+                 .filter(Book.id.in_(list(remote)))
+                 .all())
+        found = {book_id: (price, status) for book_id, price, status in books}
+
+        for book_id, remote_price in remote.items():
+            seen.add(book_id)
+            if book_id not in found:
+                diff['extra'].append({
+                    'order_nr': str(book_id),
+                    'price': float(remote_price) if remote_price is not None else None
+                })
+                continue
+            local_price, status = found[book_id]
+            if status not in LISTED_STATUSES:
+                diff['status_mismatch'].append({'book_id': book_id, 'local_status': status})
+            if remote_price is not None and (
+                    local_price is None
+                    or abs(Decimal(str(local_price)) - remote_price) >= self.price_tolerance):
+                diff['price_mismatch'].append({
+                    'book_id': book_id,
+                    'local_price': float(local_price) if local_price is not None else None,
+                    'remote_price': float(remote_price)
+                })
+
+    def apply(self, diff: Dict[str, Any], prices: Optional[str] = None) -> Dict[str, int]:
+        """Übernimmt die Korrekturen des Diffs blockweise per UPDATE und committet."""
+        now = datetime.utcnow()
+        applied = {'activated': 0, 'removed': 0, 'prices_updated': 0, 'prices_uploaded': 0}
+
+        for batch in _batches([entry['book_id'] for entry in diff['status_mismatch']], self.batch_size):
+            applied['activated'] += Book.query.filter(Book.id.in_(batch)).update({
+                Book.booklooker_status: 'active',
+                Book.booklooker_import_status: 'IMPORTED',
+                Book.booklooker_listing_error: None,
+                Book.booklooker_last_sync: now
+            }, synchronize_session=False)
+
+        for batch in _batches([entry['book_id'] for entry in diff['missing']], self.batch_size):
+            # Verkauft oder auf der Website entfernt; wird nicht automatisch erneut hochgeladen
+            applied['removed'] += Book.query.filter(Book.id.in_(batch)).update({
+                Book.booklooker_status: 'removed',
+                Book.booklooker_listing_error: 'Nicht mehr bei Booklooker gelistet',
+                Book.booklooker_last_sync: now
+            }, synchronize_session=False)
+
+        if prices == 'remote':
+            for batch in _batches(diff['price_mismatch'], self.batch_size):
+                db.session.bulk_update_mappings(Book, [
+                    {'id': entry['book_id'], 'price': entry['remote_price'], 'updated_at': now}
+                    for entry in batch
+                ])
+                applied['prices_updated'] += len(batch)
+        db.session.commit()
+
+        if prices == 'local' and diff['price_mismatch']:
+            from app.controllers.booklooker_controller import BooklookerController
+
+            booklooker = BooklookerController()
+            for batch in _batches([entry['book_id'] for entry in diff['price_mismatch']], self.batch_size):
+                result = booklooker.upload_books(Book.query.filter(Book.id.in_(batch)).order_by(Book.id).all())
+                applied['prices_uploaded'] += sum(1 for row in result['results'].values() if row['success'])
+                db.session.commit()
+
+        logging.info(f"Booklooker-Abgleich angewendet: {applied}")
+        return applied
+
+    def run(self, path: Optional[str] = None, apply: bool = False,
+            prices: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """Gleicht gegen eine lokale Exportdatei oder (ohne Pfad) den aktuellen Booklooker-Export ab."""
+        if path:
+            return self.reconcile(self.read_export(path), apply=apply, prices=prices, force=force)
+
+        from app.booklooker_api import get_booklooker_api
+
+        handle, download_path = tempfile.mkstemp(suffix='.txt', prefix='booklooker_export_')
+        try:
+            with os.fdopen(handle, 'wb') as target:
+                get_booklooker_api().download_article_export(target)
+            return self.reconcile(self.read_export(download_path), apply=apply, prices=prices, force=force)
+        finally:
+            os.unlink(download_path)
@@ -0,0 +1,229 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Book, JobCheckpoint
+from app.booklooker_api import get_booklooker_api
+from app.utils.single_flight import try_advisory_lock
+
+# Abschließende Importstatus und der daraus folgende booklooker_status
+FINAL_STATUSES = {
+    'IMPORTED': 'active',
+    'REJECTED': 'error',
+    'ERROR': 'error'
+}
+
+
+class BooklookerSyncService:
+    """
+    Gleicht den Importstatus aller offenen Booklooker-Uploads ab.
+
+    Offene Uploads werden über den Index ix_book_booklooker_pending gefunden und
+    nach Importdatei gruppiert: Bei Sammel-Uploads teilen sich viele Bücher eine
+    Datei, deren Status nur einmal abgefragt wird. Die Abfragen laufen in Blöcken
+    mit begrenzter Parallelität; bei Verbindungsfehlern wird mit exponentiellem
+    Backoff wiederholt. Die Ergebnisse werden je Status mit einem UPDATE übernommen.
+    """
+
+    CHECKPOINT_NAME = 'booklooker_sync'
+    # Advisory-Lock für Worker und CLI, damit keine Importdateien doppelt gesendet werden
+    LOCK_KEY = 'job:booklooker_sync'
+
+    def __init__(self, batch_size: int = 50, concurrency: int = 4, max_retries: int = 3,
+                 backoff: float = 2.0, api=None):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.api = api or get_booklooker_api()
+
+    @staticmethod
+    def pending_files(limit: Optional[int] = None) -> List[str]:
+        """Importdateien mit offenen Uploads, am längsten nicht geprüfte zuerst."""
+        query = (db.session.query(Book.booklooker_upload_file)
+                 .filter(Book.booklooker_status == 'pending',
+                         Book.booklooker_upload_file.isnot(None))
+                 .group_by(Book.booklooker_upload_file)
+                 .order_by(func.min(Book.booklooker_last_sync)))
+        if limit:
+            query = query.limit(limit)
+        return [filename for filename, in query]
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Prüft alle (bzw. höchstens `limit`) offenen Importdateien und liefert die Laufstatistik."""
+        stats = {
+            'started_at': datetime.utcnow().isoformat(),
+            'files_checked': 0,
+            'books_updated': 0,
+            'imported': 0,
+            'failed': 0,
+            'still_pending': 0,
+            'errors': 0
+        }
+        filenames = self.pending_files(limit)
+        if not filenames:
+            stats['finished_at'] = datetime.utcnow().isoformat()
+            return stats
+
+        if not self.api.check_token():
+            logging.error("Booklooker-Statusabgleich: Authentifizierung fehlgeschlagen")
+            stats['errors'] = len(filenames)
+            stats['finished_at'] = datetime.utcnow().isoformat()
+            return stats
+
+        with ThreadPoolExecutor(max_workers=self.concurrency,
+                                thread_name_prefix='booklooker-sync') as pool:
+            for start in range(0, len(filenames), self.batch_size):
+                batch = filenames[start:start + self.batch_size]
+                statuses = dict(zip(batch, pool.map(self._check_with_backoff, batch)))
+                self._apply_statuses(statuses, stats)
+                db.session.commit()
+                logging.info(f"Booklooker-Statusabgleich: {stats['files_checked']} von {len(filenames)} Dateien, "
+                             f"{stats['books_updated']} Bücher aktualisiert")
+
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        return stats
+
+    def _check_with_backoff(self, filename: str) -> Optional[str]:
+        """Fragt den Status einer Datei ab; None, wenn er nicht ermittelt werden konnte."""
+        for attempt in range(self.max_retries + 1):
+            result = self.api.check_file_status(filename)
+            if result['success']:
+                return result.get('file_status')
+            if result.get('error') != 'connection_error' or attempt == self.max_retries:
+                logging.warning(f"Status für {filename} nicht abrufbar: {result.get('message')}")
+                return None
+            time.sleep(self.backoff * 2 ** attempt)
+        return None
+
+    def _apply_statuses(self, statuses: Dict[str, Optional[str]], stats: Dict[str, Any]):
+        """Überträgt die Dateistatus mit einem UPDATE pro Status auf alle Bücher der Dateien."""
+        now = datetime.utcnow()
+        by_status: Dict[str, List[str]] = {}
+        for filename, status in statuses.items():
+            if status is None:
+                stats['errors'] += 1
+                continue
+            by_status.setdefault(status, []).append(filename)
+
+        for status, filenames in by_status.items():
+            values = {
+                Book.booklooker_import_status: status,
+                Book.booklooker_last_sync: now
+            }
+            final = FINAL_STATUSES.get(status)
+            if final:
+                values[Book.booklooker_status] = final
+                values[Book.booklooker_listing_error] = (
+                    None if final == 'active'
+                    else f"Booklooker-Import: {self.api.get_status_message(status)}"
+                )
+            updated = (Book.query
+                       .filter(Book.booklooker_status == 'pending',
+                               Book.booklooker_upload_file.in_(filenames))
+                       .update(values, synchronize_session=False))
+
+            stats['files_checked'] += len(filenames)
+            stats['books_updated'] += updated
+            if final == 'active':
+                stats['imported'] += updated
+            elif final == 'error':
+                stats['failed'] += updated
+            else:
+                stats['still_pending'] += updated
+
+
+class BooklookerSyncWorker:
+    """
+    Überträgt periodisch die geänderten Artikel (BooklookerDeltaSync) und gleicht
+    danach den Importstatus ab (Intervall BOOKLOOKER_SYNC_INTERVAL in Sekunden).
+    Laufen mehrere Prozesse, überspringt ein Prozess den Abgleich, wenn ein anderer
+    ihn innerhalb des Intervalls erledigt hat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.interval = 0
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def init_app(self, app):
+        """Startet den Worker, sofern ein Intervall und ein API-Key konfiguriert sind."""
+        self.interval = int(app.config.get('BOOKLOOKER_SYNC_INTERVAL')
+                            or os.getenv('BOOKLOOKER_SYNC_INTERVAL', 0))
+        if self.interval <= 0 or app.testing or not os.getenv('BOOKLOOKER_API_KEY'):
+            return
+        self.start(app)
+
+    def start(self, app) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, args=(app,), name='booklooker-sync', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logging.error(f"Booklooker-Statusabgleich fehlgeschlagen: {str(e)}")
+                    self.last_error = str(e)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Ein Abgleich, sofern nicht ein anderer Prozess ihn gerade ausführt oder erledigt hat."""
+        with try_advisory_lock(BooklookerSyncService.LOCK_KEY) as acquired:
+            if not acquired:
+                return None
+            return self._run_locked()
+
+    def _run_locked(self) -> Optional[Dict[str, Any]]:
+        checkpoint = JobCheckpoint.load(BooklookerSyncService.CHECKPOINT_NAME)
+        last_run = (checkpoint.state or {}).get('finished_at')
+        if last_run and datetime.fromisoformat(last_run) > datetime.utcnow() - timedelta(seconds=self.interval * 0.9):
+            db.session.rollback()
+            return None
+
+        from app.utils.booklooker_delta_sync import BooklookerDeltaSync
+
+        try:
+            delta = BooklookerDeltaSync().run()
+        except Exception as e:
+            logging.error(f"Booklooker-Delta fehlgeschlagen: {str(e)}")
+            db.session.rollback()
+            delta = {'success': False, 'error': str(e)}
+        stats = BooklookerSyncService().run()
+        checkpoint = JobCheckpoint.load(BooklookerSyncService.CHECKPOINT_NAME)
+        checkpoint.state = stats
+        db.session.commit()
+        stats['delta'] = delta
+        self.last_stats = stats
+        self.last_error = None
+        return stats
+
+
+booklooker_sync_worker = BooklookerSyncWorker()
@@ -1,7 +1,9 @@
 import json
 import os
+import hashlib
+import tempfile
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 class CacheManager:
     """
@@ -12,11 +14,15 @@ class CacheManager:
         self.cache_dir = cache_dir
         self.price_cache_duration = timedelta(hours=24)  # Preise 24 Stunden cachen
         self.metadata_cache_duration = timedelta(days=7)  # Metadaten 7 Tage cachen
+        # Veraltete Marktdaten werden bis zu diesem Alter noch ausgeliefert,
+        # während im Hintergrund aktualisiert wird
+        self.market_stale_duration = timedelta(days=7)
         
         # Erstelle Cache-Verzeichnis falls nicht vorhanden
         os.makedirs(cache_dir, exist_ok=True)
         os.makedirs(os.path.join(cache_dir, 'prices'), exist_ok=True)
         os.makedirs(os.path.join(cache_dir, 'metadata'), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, 'market'), exist_ok=True)
         
     def get_cached_price_data(self, book_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -59,6 +65,62 @@ class CacheManager:
             # Fehler beim Caching loggen aber nicht die Hauptfunktion beeinträchtigen
             pass
             
+    def _market_cache_file(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'market', f'{digest}.json')
+
+    def get_cached_market_data(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        Holt gecachte Marktdaten für einen normalisierten Titelschlüssel.
+        Liefert (Daten, ist_veraltet) oder None, wenn kein verwendbarer Eintrag existiert.
+        """
+        cache_file = self._market_cache_file(key)
+        
+        if not os.path.exists(cache_file):
+            return None
+            
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached_data = json.load(f)
+                
+            age = datetime.utcnow() - datetime.fromisoformat(cached_data['timestamp'])
+            if age > self.market_stale_duration:
+                return None
+                
+            return cached_data['data'], age > self.price_cache_duration
+            
+        except Exception:
+            return None
+
+    def cache_market_data(self, key: str, data: Dict[str, Any]):
+        """
+        Speichert Marktdaten unter einem normalisierten Titelschlüssel.
+        Die Datei wird atomar ersetzt, damit parallele Leser nie halbe Einträge sehen.
+        """
+        cache_file = self._market_cache_file(key)
+        
+        cache_data = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'key': key,
+            'data': data
+        }
+        
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+        except Exception:
+            # Fehler beim Caching loggen aber nicht die Hauptfunktion beeinträchtigen
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cache_data, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_file)
+        except Exception:
+            # Halbe Temp-Datei nicht liegen lassen
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
     def get_cached_metadata(self, book_id: int) -> Optional[Dict[str, Any]]:
         """
         Holt gecachte Metadaten für ein Buch, falls vorhanden und nicht veraltet.
@@ -116,6 +178,12 @@ class CacheManager:
             self.metadata_cache_duration
         )
         
+        # Bereinige Marktdaten-Cache (veraltete Einträge bleiben bis zum Stale-Limit erhalten)
+        self._clear_expired_directory(
+            os.path.join(self.cache_dir, 'market'),
+            self.market_stale_duration
+        )
+        
     def _clear_expired_directory(self, directory: str, max_age: timedelta):
         """
         Löscht abgelaufene Cache-Dateien in einem Verzeichnis.
@@ -1,22 +1,36 @@
 import os
-from datetime import datetime, timedelta
-from typing import List, Set
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+from flask import current_app
 from app import db
 from app.models import Book
 from app.utils.cache_manager import CacheManager
+from app.utils.gcs import (UPLOAD_PREFIX, MAX_BATCH_SIZE, blob_name_from_url, delete_blobs,
+                           get_storage_client)
 import logging
 
 class CleanupService:
     """
     Service zum Aufräumen alter Dateien und nicht mehr benötigter Ressourcen.
+
+    Verwaiste Bilder werden im GCS-Bucket gesucht: Die Blobs unter `uploads/` werden
+    seitenweise gelistet (nur Name, Größe und Erstellzeit) und mit den Blob-Namen aus
+    Book.image_urls verglichen. Aus der Datenbank wird dafür nur diese Spalte gestreamt.
+    Verwaiste Blobs, die älter als max_orphan_age sind, werden in Batch-Anfragen gelöscht.
     """
-    
-    def __init__(self, upload_dir: str = 'app/static/uploads',
-                 max_orphan_age: timedelta = timedelta(days=7)):
-        self.upload_dir = upload_dir
+
+    def __init__(self, bucket_name: Optional[str] = None, prefix: str = UPLOAD_PREFIX,
+                 max_orphan_age: timedelta = timedelta(days=7),
+                 page_size: int = 1000, batch_size: int = MAX_BATCH_SIZE, client=None):
+        self.bucket_name = bucket_name or current_app.config.get('GCS_BUCKET_NAME')
+        self.prefix = prefix
         self.max_orphan_age = max_orphan_age
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.client = client
         self.cache_manager = CacheManager()
-        
+
     def cleanup(self) -> dict:
         """
         Führt alle Cleanup-Operationen durch.
@@ -27,119 +41,137 @@ class CleanupService:
             'errors': [],
             'timestamp': datetime.utcnow().isoformat()
         }
-        
+
         try:
             # Bereinige verwaiste Bilder
-            results['images_cleaned'] = self._cleanup_orphaned_images()
-            
+            sweep = self.sweep_orphaned_images()
+            results['images_cleaned'] = sweep['deleted']
+            results['image_sweep'] = sweep
+
             # Bereinige abgelaufenen Cache
             self.cache_manager.clear_expired_cache()
             results['cache_cleaned'] = 1
-            
+
         except Exception as e:
             results['errors'].append(str(e))
             logging.error(f"Fehler beim Cleanup: {str(e)}")
-            
+
         return results
-        
-    def _cleanup_orphaned_images(self) -> int:
+
+    def _bucket(self):
+        if not self.bucket_name:
+            raise ValueError('GCS_BUCKET_NAME ist nicht konfiguriert')
+        return (self.client or get_storage_client()).bucket(self.bucket_name)
+
+    def _active_blob_names(self) -> Set[str]:
         """
-        Löscht Bilddateien, die nicht mehr mit Büchern verknüpft sind.
+        Blob-Namen aller Bilder, die noch mit Büchern verknüpft sind. Gelesen wird
+        nur die Spalte image_urls, in Blöcken statt mit vollständigen Book-Objekten.
         """
-        # Hole alle aktiven Bild-URLs aus der Datenbank
         active_images: Set[str] = set()
-        try:
-            books = Book.query.all()
-            for book in books:
-                if book.image_urls:
-                    active_images.update(
-                        os.path.basename(url) for url in book.image_urls
-                    )
-        except Exception as e:
-            logging.error(f"Fehler beim Laden der Buchbilder: {str(e)}")
-            return 0
-            
-        deleted_count = 0
-        now = datetime.utcnow()
-        
-        # Überprüfe alle Dateien im Upload-Verzeichnis
-        for filename in os.listdir(self.upload_dir):
-            file_path = os.path.join(self.upload_dir, filename)
-            
-            # Überspringe .gitkeep und andere spezielle Dateien
-            if filename.startswith('.'):
-                continue
-                
-            try:
-                # Wenn die Datei nicht in aktiven Bildern ist und alt genug
-                if (filename not in active_images and 
-                    self._is_file_old_enough(file_path)):
-                    os.remove(file_path)
-                    deleted_count += 1
-                    logging.info(f"Gelöschte verwaiste Bilddatei: {filename}")
-                    
-            except Exception as e:
-                logging.error(f"Fehler beim Löschen von {filename}: {str(e)}")
-                
-        return deleted_count
-        
-    def _is_file_old_enough(self, file_path: str) -> bool:
+        for image_urls, in db.session.query(Book.image_urls).execution_options(yield_per=1000):
+            for url in image_urls or []:
+                name = blob_name_from_url(url, self.bucket_name)
+                if name:
+                    active_images.add(name)
+        return active_images
+
+    def sweep_orphaned_images(self, dry_run: bool = False) -> Dict[str, Any]:
         """
-        Prüft, ob eine Datei alt genug ist, um gelöscht zu werden.
+        Löscht Bilder im Bucket, die nicht mehr mit Büchern verknüpft sind.
+        Mit dry_run werden verwaiste Bilder nur gezählt.
         """
-        try:
-            file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-            return datetime.utcnow() - file_time > self.max_orphan_age
-        except Exception:
-            # Im Zweifelsfall die Datei behalten
-            return False
-            
+        bucket = self._bucket()
+        start = time.perf_counter()
+        stats = {
+            'scanned': 0,
+            'total_size': 0,
+            'referenced': 0,
+            'orphaned': 0,
+            'orphaned_size': 0,
+            'too_young': 0,
+            'deleted': 0,
+            'missing': 0,
+            'failed': 0,
+            'delete_requests': 0,
+            'dry_run': dry_run
+        }
+
+        # Zuerst die Datenbank lesen: Bilder neuer Bücher sind jünger als max_orphan_age
+        active_images = self._active_blob_names()
+        stats['referenced'] = len(active_images)
+        cutoff = datetime.now(timezone.utc) - self.max_orphan_age
+
+        blobs = bucket.list_blobs(
+            prefix=self.prefix,
+            page_size=self.page_size,
+            fields='items(name,size,timeCreated),nextPageToken'
+        )
+        for page in blobs.pages:
+            orphans = []
+            for blob in page:
+                stats['scanned'] += 1
+                stats['total_size'] += blob.size or 0
+                if blob.name in active_images or blob.name.endswith('/'):
+                    continue
+                # Im Zweifelsfall (ohne Erstellzeit) das Bild behalten
+                if blob.time_created is None or blob.time_created > cutoff:
+                    stats['too_young'] += 1
+                    continue
+                stats['orphaned'] += 1
+                stats['orphaned_size'] += blob.size or 0
+                orphans.append(blob.name)
+
+            if orphans and not dry_run:
+                result = delete_blobs(bucket, orphans, batch_size=self.batch_size)
+                stats['deleted'] += result['deleted']
+                stats['missing'] += result['missing']
+                stats['failed'] += len(result['failed'])
+                stats['delete_requests'] += result['requests']
+
+        elapsed = time.perf_counter() - start
+        stats['duration_seconds'] = round(elapsed, 2)
+        stats['blobs_per_second'] = round(stats['scanned'] / elapsed, 1) if elapsed else 0.0
+        stats['deletes_per_second'] = round(stats['deleted'] / elapsed, 1) if elapsed else 0.0
+        logging.info(
+            f"Bilder-Bereinigung: {stats['scanned']} Blobs in {elapsed:.1f}s geprüft "
+            f"({stats['blobs_per_second']}/s), {stats['orphaned']} verwaist, {stats['deleted']} gelöscht "
+            f"({stats['delete_requests']} Batch-Anfragen), {stats['failed']} fehlgeschlagen"
+        )
+        return stats
+
     def get_storage_stats(self) -> dict:
         """
         Sammelt Statistiken über den Speicherverbrauch.
         """
         stats = {
-            'upload_dir_size': 0,
+            'upload_size': 0,
             'cache_dir_size': 0,
             'orphaned_images': 0,
+            'orphaned_size': 0,
             'total_images': 0,
             'timestamp': datetime.utcnow().isoformat()
         }
-        
-        # Berechne Upload-Verzeichnisgröße
-        for path, _, files in os.walk(self.upload_dir):
-            for file in files:
-                if not file.startswith('.'):
-                    file_path = os.path.join(path, file)
-                    stats['upload_dir_size'] += os.path.getsize(file_path)
-                    stats['total_images'] += 1
-                    
+
+        # Größe und verwaiste Bilder im Bucket (ohne zu löschen)
+        try:
+            sweep = self.sweep_orphaned_images(dry_run=True)
+            stats['upload_size'] = sweep['total_size']
+            stats['total_images'] = sweep['scanned']
+            stats['orphaned_images'] = sweep['orphaned']
+            stats['orphaned_size'] = sweep['orphaned_size']
+        except Exception as e:
+            logging.error(f"Fehler beim Sammeln der Statistiken: {str(e)}")
+
         # Berechne Cache-Verzeichnisgröße
         for path, _, files in os.walk(self.cache_manager.cache_dir):
             for file in files:
                 if file.endswith('.json'):
                     file_path = os.path.join(path, file)
                     stats['cache_dir_size'] += os.path.getsize(file_path)
-                    
-        # Zähle verwaiste Bilder
-        active_images = set()
-        try:
-            books = Book.query.all()
-            for book in books:
-                if book.image_urls:
-                    active_images.update(
-                        os.path.basename(url) for url in book.image_urls
-                    )
-                    
-            for filename in os.listdir(self.upload_dir):
-                if not filename.startswith('.') and filename not in active_images:
-                    stats['orphaned_images'] += 1
-                    
-        except Exception as e:
-            logging.error(f"Fehler beim Sammeln der Statistiken: {str(e)}")
-            
+
         # Konvertiere Bytes in MB
-        stats['upload_dir_size'] = round(stats['upload_dir_size'] / (1024 * 1024), 2)
-        stats['cache_dir_size'] = round(stats['cache_dir_size'] / (1024 * 1024), 2)
-        
-        return stats
\ No newline at end of file
+        for key in ('upload_size', 'orphaned_size', 'cache_dir_size'):
+            stats[key] = round(stats[key] / (1024 * 1024), 2)
+
+        return stats
@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app import db
+from app.models import Book, JobCheckpoint
+from app.ebay_api import EbayAPI
+from app.market_sources.base import AsyncRateLimiter
+from app.utils.ebay_pictures import EbayPicturePublisher
+
+# eBay-Fehlercodes für erschöpfte Aufrufkontingente (Call Usage Limit)
+CALL_LIMIT_ERROR_CODES = {'518', '21919144'}
+
+
+def _error_codes(result: Dict[str, Any]) -> List[str]:
+    errors = (result.get('details') or {}).get('Errors') or []
+    if isinstance(errors, dict):
+        errors = [errors]
+    return [str(error.get('ErrorCode')) for error in errors]
+
+
+def _messages(entries) -> str:
+    if isinstance(entries, dict):
+        entries = [entries]
+    return '; '.join(
+        entry.get('LongMessage') or entry.get('ShortMessage') or str(entry) if isinstance(entry, dict) else str(entry)
+        for entry in entries or []
+    )
+
+
+class EbayBulkLister:
+    """
+    Stellt eine Auswahl von Büchern gesammelt bei eBay ein.
+
+    Die Bilder eines Blocks werden gemeinsam bei eBay bereitgestellt
+    (EbayPicturePublisher), die AddFixedPriceItem-Daten im aufrufenden Thread erzeugt
+    (Datenbankzugriff, Kategorie-Index); die Aufrufe selbst laufen parallel in einem
+    Thread-Pool. ebaysdk-Verbindungen sind nicht thread-sicher; jeder Worker verwendet
+    deshalb seine eigene Trading-Verbindung über alle Aufrufe hinweg. Ein gemeinsamer
+    Rate-Limiter hält die Aufrufrate (EBAY_CALLS_PER_SECOND) ein; meldet eBay ein
+    erschöpftes Kontingent, werden keine weiteren Aufrufe gestartet.
+
+    Die Ergebnisse (ItemID, Warnungen, Fehler) werden auf die ebay_*-Spalten
+    übertragen und je Block gemeinsam mit dem Checkpoint committet.
+    """
+
+    CHECKPOINT_NAME = 'ebay_bulk_listing'
+
+    def __init__(self, concurrency: int = 4, batch_size: int = 50,
+                 calls_per_second: Optional[float] = None,
+                 connection_factory: Optional[Callable[[], Any]] = None):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        rate = calls_per_second if calls_per_second is not None else float(os.getenv('EBAY_CALLS_PER_SECOND', 5))
+        self.rate_limiter = AsyncRateLimiter(rate, burst=concurrency)
+        self.connection_factory = connection_factory or EbayAPI.create_connection
+        self._local = threading.local()
+        self._limit_reached = threading.Event()
+        self.pictures = EbayPicturePublisher(concurrency=concurrency, rate_limiter=self.rate_limiter,
+                                             connection_factory=self.connection_factory)
+
+    def _api(self) -> EbayAPI:
+        """EbayAPI mit der Trading-Verbindung des aktuellen Threads."""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = EbayAPI(connection=self.connection_factory())
+            self._local.api = api
+        return api
+
+    @staticmethod
+    def select_book_ids(book_ids: Optional[List[int]] = None, limit: Optional[int] = None) -> List[int]:
+        """Ausgewählte bzw. alle noch nie bei eBay eingestellten Bücher, ohne bereits aktive Angebote."""
+        query = db.session.query(Book.id).filter(Book.ebay_listing_id.is_(None))
+        if book_ids:
+            query = query.filter(Book.id.in_(book_ids))
+        else:
+            query = query.filter(Book.ebay_listing_status.is_(None))
+        query = query.order_by(Book.id)
+        if limit:
+            query = query.limit(limit)
+        return [book_id for book_id, in query]
+
+    def submit(self, payloads: Dict[int, Dict[str, Any]], pool: Optional[ThreadPoolExecutor] = None) -> Dict[int, Dict[str, Any]]:
+        """Sendet die AddFixedPriceItem-Daten parallel; liefert das Ergebnis je Buch-ID."""
+        if pool is None:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ebay-listing') as pool:
+                return self.submit(payloads, pool)
+        return dict(zip(payloads, pool.map(self._submit_one, payloads.values())))
+
+    def _submit_one(self, item_data: Dict[str, Any]) -> Dict[str, Any]:
+        if self._limit_reached.is_set():
+            return {'success': False, 'skipped': True, 'message': 'eBay-Aufrufkontingent erschöpft'}
+        self.rate_limiter.wait()
+        try:
+            result = self._api().submit_listing(item_data)
+        except Exception as e:
+            logging.error(f"eBay-Listing fehlgeschlagen: {str(e)}")
+            return {'success': False, 'error': str(e), 'message': 'Unerwarteter Fehler beim Erstellen des eBay Listings'}
+        if not result['success'] and CALL_LIMIT_ERROR_CODES.intersection(_error_codes(result)):
+            logging.error("eBay-Aufrufkontingent erschöpft, Sammel-Listing wird angehalten")
+            self._limit_reached.set()
+            result['skipped'] = True
+        return result
+
+    def run(self, book_ids: Optional[List[int]] = None, limit: Optional[int] = None,
+            progress: Optional[callable] = None) -> Dict[str, Any]:
+        """Stellt die Bücher ein und liefert die Laufstatistik."""
+        ids = self.select_book_ids(book_ids, limit)
+        stats = {
+            'started_at': datetime.utcnow().isoformat(),
+            'total': len(ids),
+            'processed': 0,
+            'listed': 0,
+            'failed': 0,
+            'warnings': 0,
+            'skipped': 0,
+            'items_per_minute': 0.0,
+            'completed': False
+        }
+        self._limit_reached.clear()
+        builder = self._api()
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ebay-listing') as pool:
+            for offset in range(0, len(ids), self.batch_size):
+                if self._limit_reached.is_set():
+                    stats['skipped'] += len(ids) - offset
+                    break
+                books = Book.query.filter(Book.id.in_(ids[offset:offset + self.batch_size])).order_by(Book.id).all()
+                outcomes: Dict[int, Dict[str, Any]] = {}
+                payloads: Dict[int, Dict[str, Any]] = {}
+                for book in books:
+                    if not book.price or float(book.price) <= 0:
+                        outcomes[book.id] = {'success': False, 'message': 'Kein gültiger Preis für das Buch festgelegt'}
+                # Bilder aller Bücher des Blocks gemeinsam bereitstellen
+                pictures = self.pictures.publish_many(
+                    {book.id: book.image_urls for book in books if book.id not in outcomes}
+                )
+                for book in books:
+                    if book.id in outcomes:
+                        continue
+                    try:
+                        payloads[book.id] = builder.build_item_data(book, picture_urls=pictures.get(book.id))
+                    except ValueError as e:
+                        outcomes[book.id] = {'success': False, 'message': str(e)}
+                outcomes.update(self.submit(payloads, pool))
+
+                self._apply(books, outcomes, builder, stats)
+                elapsed = time.perf_counter() - start
+                stats['items_per_minute'] = round(stats['processed'] / elapsed * 60, 1) if elapsed else 0.0
+                checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+                checkpoint.last_id = books[-1].id if books else checkpoint.last_id
+                checkpoint.state = dict(stats)
+                db.session.commit()
+
+                logging.info(f"eBay-Sammel-Listing: {stats['processed']} von {stats['total']} Büchern, "
+                             f"{stats['listed']} eingestellt, {stats['failed']} fehlgeschlagen")
+                if progress:
+                    progress(dict(stats))
+
+        stats['completed'] = not self._limit_reached.is_set()
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        checkpoint.state = dict(stats)
+        db.session.commit()
+        return stats
+
+    @staticmethod
+    def _apply(books: List[Book], outcomes: Dict[int, Dict[str, Any]], api: EbayAPI, stats: Dict[str, Any]):
+        """Überträgt die Ergebnisse auf die ebay_*-Spalten der Bücher."""
+        now = datetime.utcnow()
+        for book in books:
+            result = outcomes.get(book.id)
+            if result is None or result.get('skipped'):
+                stats['skipped'] += 1
+                continue
+            stats['processed'] += 1
+            book.ebay_last_sync = now
+            if result['success']:
+                listing_id = str(result['listing_id'])
+                book.ebay_listing_id = listing_id
+                book.ebay_listing_status = 'active'
+                book.ebay_listing_url = api.listing_url(listing_id)
+                book.ebay_listed_price = book.price
+                book.ebay_listing_error = (
+                    f"Warnungen: {_messages(result['warnings'])}" if result.get('warnings') else None
+                )
+                stats['listed'] += 1
+                if result.get('warnings'):
+                    stats['warnings'] += 1
+            else:
+                book.ebay_listing_status = 'error'
+                book.ebay_listing_error = (result.get('message') or result.get('error') or 'Unbekannter Fehler').strip()
+                stats['failed'] += 1
+
+
+class EbayBulkListingRunner:
+    """
+    Führt Sammel-Listings im Hintergrund aus (für den Admin-Endpunkt).
+    Es läuft höchstens ein Lauf gleichzeitig pro Prozess.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, **options) -> bool:
+        """Startet einen Lauf; liefert False, wenn bereits einer läuft."""
+        with self._lock:
+            if self.running:
+                return False
+            self.last_error = None
+            self._thread = threading.Thread(
+                target=self._run, args=(app, options), name='ebay-bulk-listing', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, app, options):
+        book_ids = options.pop('book_ids', None)
+        limit = options.pop('limit', None)
+        with app.app_context():
+            try:
+                lister = EbayBulkLister(**options)
+                self.last_stats = lister.run(book_ids=book_ids, limit=limit, progress=self._progress)
+            except Exception as e:
+                logging.error(f"eBay-Sammel-Listing fehlgeschlagen: {str(e)}")
+                self.last_error = str(e)
+            finally:
+                db.session.remove()
+
+    def _progress(self, stats):
+        self.last_stats = stats
+
+
+ebay_bulk_runner = EbayBulkListingRunner()
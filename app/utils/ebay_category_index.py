@@ -0,0 +1,290 @@
+"""
+Lokale Kopie des eBay-Kategoriebaums mit Schlagwort-Index.
+
+Der Baum (GetCategories, DetailLevel ReturnAll) wird als JSON im Cache-Verzeichnis
+abgelegt und nur neu geladen, wenn eBay eine andere CategoryVersion meldet. Die
+Versionsprüfung (GetCategories ohne DetailLevel, wenige hundert Bytes) läuft höchstens
+einmal pro Prüfintervall; der Zeitpunkt der letzten Prüfung ist die Änderungszeit der
+Cache-Datei und gilt damit für alle Prozesse.
+
+Im Speicher liegt ein invertierter Index Wort -> Kategorien sowie die Menge der
+Blattkategorien. Die Kategorieauswahl ist damit eine Wörterbuch-Abfrage pro Schlagwort.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'ebay'
+)
+LEVEL_LIMIT = 4
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall((text or '').lower())
+
+
+@dataclass(frozen=True)
+class EbayCategory:
+    id: str
+    name: str
+    parent_id: Optional[str]
+    level: int
+    leaf: bool
+
+
+class EbayCategoryIndex:
+    """
+    Invertierter Index über die Namen der eBay-Kategorien.
+
+    Schlagwörter werden wie bisher als Teilzeichenkette gesucht ("jugend" trifft
+    "Jugendbücher"). Die Zuordnung Schlagwort -> Kategorien wird dazu einmal über die
+    (wenigen tausend) verschiedenen Wörter ermittelt und danach gemerkt.
+    """
+
+    def __init__(self, categories: Iterable[EbayCategory], version: Optional[str] = None):
+        self.version = version
+        self.categories: Dict[str, EbayCategory] = {}
+        self.order: Dict[str, int] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        for position, category in enumerate(categories):
+            self.categories[category.id] = category
+            self.order[category.id] = position
+            for token in set(tokenize(category.name)):
+                self.postings.setdefault(token, set()).add(category.id)
+        self.leaves: FrozenSet[str] = frozenset(
+            category.id for category in self.categories.values() if category.leaf
+        )
+        self._keyword_cache: Dict[str, FrozenSet[str]] = {}
+        self._subtrees: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    @classmethod
+    def from_ebay(cls, categories: Any, version: Optional[str] = None) -> 'EbayCategoryIndex':
+        """Baut den Index aus dem CategoryArray einer GetCategories-Antwort."""
+        if isinstance(categories, dict):
+            categories = [categories]
+        parsed = []
+        for raw in categories or []:
+            category_id = str(raw.get('CategoryID', ''))
+            if not category_id:
+                continue
+            parent_id = raw.get('CategoryParentID')
+            if isinstance(parent_id, list):
+                parent_id = parent_id[0] if parent_id else None
+            parent_id = str(parent_id) if parent_id and str(parent_id) != category_id else None
+            parsed.append(EbayCategory(
+                id=category_id,
+                name=raw.get('CategoryName', ''),
+                parent_id=parent_id,
+                level=int(raw.get('CategoryLevel') or 1),
+                leaf=str(raw.get('LeafCategory', 'false')).lower() == 'true'
+            ))
+        return cls(parsed, version)
+
+    @classmethod
+    def load(cls, path: str) -> 'EbayCategoryIndex':
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+        return cls(
+            (EbayCategory(id=row[0], name=row[1], parent_id=row[2], level=row[3], leaf=bool(row[4]))
+             for row in data.get('categories', [])),
+            data.get('version')
+        )
+
+    def save(self, path: str):
+        """Schreibt den Baum atomar, damit parallele Prozesse nie eine halbe Datei lesen."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            'version': self.version,
+            'categories': [
+                [c.id, c.name, c.parent_id, c.level, int(c.leaf)]
+                for c in sorted(self.categories.values(), key=lambda c: self.order[c.id])
+            ]
+        }
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as target:
+                json.dump(data, target, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, category_id: str) -> Optional[EbayCategory]:
+        return self.categories.get(str(category_id))
+
+    def is_leaf(self, category_id: str) -> bool:
+        return str(category_id) in self.leaves
+
+    def path(self, category_id: str) -> List[str]:
+        """Namen von der Wurzel bis zur Kategorie."""
+        names = []
+        category = self.get(category_id)
+        while category is not None:
+            names.append(category.name)
+            category = self.categories.get(category.parent_id) if category.parent_id else None
+        return names[::-1]
+
+    def subtree(self, root_id: str) -> FrozenSet[str]:
+        """Die Kategorie und alle Kategorien darunter (gemerkt je Wurzel)."""
+        root_id = str(root_id)
+        ids = self._subtrees.get(root_id)
+        if ids is None:
+            members = {root_id}
+            for category in sorted(self.categories.values(), key=lambda c: c.level):
+                if category.parent_id in members:
+                    members.add(category.id)
+            ids = frozenset(members & self.categories.keys())
+            self._subtrees[root_id] = ids
+        return ids
+
+    def keyword_categories(self, keyword: str) -> FrozenSet[str]:
+        """Alle Kategorien, deren Name das Schlagwort enthält."""
+        keyword = keyword.lower().strip()
+        ids = self._keyword_cache.get(keyword)
+        if ids is None:
+            matches: Set[str] = set()
+            for token, token_ids in self.postings.items():
+                if keyword in token:
+                    matches |= token_ids
+            ids = frozenset(matches)
+            self._keyword_cache[keyword] = ids
+        return ids
+
+    def best_category(self, keywords: Iterable[str], root_id: Optional[str] = None) -> Optional[str]:
+        """
+        Kategorie mit den meisten Schlagwort-Treffern, Blattkategorien erhalten wie
+        bisher zwei Zusatzpunkte. Mit root_id werden nur Kategorien unterhalb dieser
+        Kategorie berücksichtigt, sofern sie im Baum vorhanden ist.
+        """
+        hits: Dict[str, int] = {}
+        for keyword in set(keywords):
+            for category_id in self.keyword_categories(keyword):
+                hits[category_id] = hits.get(category_id, 0) + 1
+        if root_id is not None and str(root_id) in self.categories:
+            subtree = self.subtree(root_id)
+            hits = {category_id: count for category_id, count in hits.items() if category_id in subtree}
+        if not hits:
+            return None
+        return min(hits, key=lambda category_id: (
+            -(hits[category_id] + (2 if category_id in self.leaves else 0)),
+            self.order[category_id]
+        ))
+
+
+class EbayCategoryStore:
+    """
+    Hält den Kategorie-Index eines eBay-Marktplatzes aktuell. Der Index wird einmal pro
+    Prozess aus dem Cache geladen; eBay wird nur für die Versionsprüfung und bei neuer
+    Version für den vollständigen Baum angefragt.
+    """
+
+    def __init__(self, site_id: str = '77', cache_dir: Optional[str] = None,
+                 check_interval: Optional[timedelta] = None):
+        self.site_id = str(site_id)
+        self.cache_dir = cache_dir or os.getenv('EBAY_CATEGORY_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.check_interval = check_interval or timedelta(
+            hours=float(os.getenv('EBAY_CATEGORY_CHECK_HOURS', 24))
+        )
+        self.path = os.path.join(self.cache_dir, f'categories_{self.site_id}.json')
+        self._lock = threading.Lock()
+        self._index: Optional[EbayCategoryIndex] = None
+        self._checked_at = 0.0
+
+    def _check_due(self) -> bool:
+        checked_at = self._checked_at
+        if os.path.exists(self.path):
+            checked_at = max(checked_at, os.path.getmtime(self.path))
+        return time.time() - checked_at >= self.check_interval.total_seconds()
+
+    def get_index(self, api=None) -> EbayCategoryIndex:
+        """
+        Liefert den Index. Mit `api` (ebaysdk Trading-Verbindung) wird nach Ablauf des
+        Prüfintervalls die Version geprüft; ohne wird nur der Cache verwendet.
+        """
+        index = self._index
+        if index is not None and (api is None or not self._check_due()):
+            return index
+        with self._lock:
+            if self._index is None and os.path.exists(self.path):
+                try:
+                    self._index = EbayCategoryIndex.load(self.path)
+                    logging.info(f"eBay-Kategorien geladen: {len(self._index)} Kategorien, "
+                                 f"Version {self._index.version}")
+                except (OSError, ValueError) as e:
+                    logging.error(f"eBay-Kategorie-Cache unlesbar: {str(e)}")
+            if api is not None and self._check_due():
+                try:
+                    self._refresh(api)
+                except Exception as e:
+                    # Bis zum nächsten Intervall mit dem vorhandenen Stand weiterarbeiten
+                    logging.error(f"eBay-Kategorien konnten nicht aktualisiert werden: {str(e)}")
+                    self._checked_at = time.time()
+            if self._index is None:
+                return EbayCategoryIndex([])
+            return self._index
+
+    def refresh(self, api, force: bool = False) -> Dict[str, Any]:
+        """Prüft sofort die Version und lädt den Baum bei Bedarf (oder mit force) neu."""
+        with self._lock:
+            if self._index is None and os.path.exists(self.path) and not force:
+                try:
+                    self._index = EbayCategoryIndex.load(self.path)
+                except (OSError, ValueError) as e:
+                    logging.error(f"eBay-Kategorie-Cache unlesbar: {str(e)}")
+            return self._refresh(api, force=force)
+
+    def _refresh(self, api, force: bool = False) -> Dict[str, Any]:
+        response = api.execute('GetCategories', {'CategorySiteID': self.site_id})
+        version = str(response.dict().get('CategoryVersion') or '')
+        current = self._index.version if self._index is not None else None
+        self._checked_at = time.time()
+
+        if not force and self._index is not None and version and version == current:
+            if os.path.exists(self.path):
+                os.utime(self.path)
+            return {'success': True, 'updated': False, 'version': version, 'categories': len(self._index)}
+
+        logging.info(f"Lade eBay-Kategoriebaum (Version {current} -> {version})")
+        response = api.execute('GetCategories', {
+            'DetailLevel': 'ReturnAll',
+            'CategorySiteID': self.site_id,
+            'LevelLimit': LEVEL_LIMIT,
+        })
+        data = response.dict()
+        index = EbayCategoryIndex.from_ebay(
+            (data.get('CategoryArray') or {}).get('Category', []),
+            str(data.get('CategoryVersion') or version)
+        )
+        if not len(index):
+            raise ValueError('GetCategories lieferte keine Kategorien')
+        index.save(self.path)
+        self._index = index
+        logging.info(f"eBay-Kategorien gespeichert: {len(index)} Kategorien, Version {index.version}")
+        return {'success': True, 'updated': True, 'version': index.version, 'categories': len(index)}
+
+
+_stores: Dict[str, EbayCategoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_category_store(site_id: str = '77') -> EbayCategoryStore:
+    """Prozessweiter Kategorie-Speicher je eBay-Marktplatz."""
+    site_id = str(site_id)
+    store = _stores.get(site_id)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(site_id, EbayCategoryStore(site_id))
+    return store
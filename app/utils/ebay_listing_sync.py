@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app import db
+from app.models import Book, JobCheckpoint
+from app.ebay_api import MAX_SELLER_EVENTS, EbayAPI
+
+# GetSellerList erlaubt Zeitfenster von höchstens 120 Tagen
+MAX_WINDOW = timedelta(days=119)
+# Zeitfenster je GetSellerEvents-Aufruf (von eBay empfohlen: höchstens 48 Stunden)
+EVENTS_WINDOW = timedelta(hours=48)
+# Festpreisangebote (auch "Gültig bis auf Widerruf") enden höchstens 30 Tage nach der letzten Verlängerung
+MAX_LISTING_DURATION = timedelta(days=31)
+
+
+def listing_status(item: Dict[str, Any]) -> Optional[str]:
+    """Lokaler ebay_listing_status für ein Angebot aus GetSellerList oder GetSellerEvents."""
+    selling = item.get('SellingStatus') or {}
+    status = selling.get('ListingStatus')
+    if status == 'Active':
+        return 'active'
+    if status in ('Completed', 'Ended'):
+        return 'sold' if int(selling.get('QuantitySold') or 0) > 0 else 'ended'
+    return None
+
+
+def _items(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    items = (data.get('ItemArray') or {}).get('Item') or []
+    return [items] if isinstance(items, dict) else items
+
+
+class _EventsTruncated(Exception):
+    """GetSellerEvents liefert selbst für das kleinste Fenster die Obergrenze."""
+
+
+class EbayListingSync:
+    """
+    Gleicht ebay_listing_status aller eigenen eBay-Angebote ab.
+
+    Inkrementell werden über GetSellerEvents nur Angebote abgefragt, die seit dem
+    letzten Lauf geändert wurden (ModTimeFrom/ModTimeTo, mit etwas Überlappung, in
+    Fenstern von höchstens 48 Stunden). Liefert ein Fenster die Obergrenze von
+    MAX_SELLER_EVENTS Angeboten, wird es halbiert und erneut abgefragt; ist es schon
+    höchstens eine Minute lang, bleibt das Wasserzeichen davor und der Lauf wechselt
+    auf den vollständigen Abgleich. Der erste bzw.
+    ein vollständiger Lauf liest mit GetSellerList seitenweise alle Angebote, die seit
+    initial_window geendet haben oder noch laufen (EndTimeFrom/EndTimeTo). Jede Antwort
+    wird über den Index auf ebay_listing_id den Büchern zugeordnet und mit einem UPDATE
+    je Status in einer Transaktion übernommen. Das Ende des Änderungsfensters wird im
+    JobCheckpoint gespeichert, sobald ein Fenster vollständig verarbeitet ist.
+    """
+
+    CHECKPOINT_NAME = 'ebay_listing_sync'
+
+    def __init__(self, entries_per_page: int = 200, overlap: timedelta = timedelta(minutes=10),
+                 initial_window: timedelta = MAX_WINDOW, api: Optional[EbayAPI] = None):
+        self.entries_per_page = entries_per_page
+        self.overlap = overlap
+        self.initial_window = min(initial_window, MAX_WINDOW)
+        self.api = api or EbayAPI()
+
+    def run(self, full: bool = False) -> Dict[str, Any]:
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        state = dict(checkpoint.state or {})
+        now = datetime.utcnow()
+        incremental = bool(state.get('mod_time_to')) and not full
+        if incremental:
+            window_start = datetime.fromisoformat(state['mod_time_to']) - self.overlap
+        else:
+            window_start = now - self.initial_window
+
+        stats = {
+            'started_at': now.isoformat(),
+            'mode': 'events' if incremental else 'full',
+            'mod_time_from': window_start.isoformat(),
+            'pages': 0,
+            'items': 0,
+            'updated': 0,
+            'unmatched': 0,
+            'statuses': {}
+        }
+        if incremental:
+            try:
+                # Längere Pausen werden in mehrere Fenster aufgeteilt
+                while window_start < now:
+                    window_end = min(window_start + EVENTS_WINDOW, now)
+                    self._sync_events(window_start, window_end, stats)
+                    self._save_watermark(state, window_end)
+                    window_start = window_end
+            except _EventsTruncated as e:
+                logging.warning(f"eBay-Abgleich: {str(e)}, wechsle auf den vollständigen Abgleich")
+                stats['fallback'] = str(e)
+                stats['mode'] = 'full'
+                incremental = False
+                window_start = now - self.initial_window
+        if not incremental:
+            # Laufende Angebote enden in der Zukunft, daher reicht das Fenster über now hinaus
+            end_limit = now + MAX_LISTING_DURATION
+            while window_start < end_limit:
+                window_end = min(window_start + MAX_WINDOW, end_limit)
+                self._sync_end_time_window(window_start, window_end, stats)
+                window_start = window_end
+            self._save_watermark(state, now)
+
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        state['last_run'] = stats
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        checkpoint.state = state
+        db.session.commit()
+        logging.info(f"eBay-Abgleich ({stats['mode']}): {stats['items']} Angebote in {stats['pages']} Antworten, "
+                     f"{stats['updated']} Bücher aktualisiert")
+        return stats
+
+    def _save_watermark(self, state: Dict[str, Any], mod_time_to: datetime):
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        state['mod_time_to'] = mod_time_to.isoformat()
+        checkpoint.state = dict(state)
+        db.session.commit()
+
+    def _sync_events(self, window_start: datetime, window_end: datetime, stats: Dict[str, Any]):
+        """Geänderte Angebote eines Fensters; volle Antworten werden halbiert und neu abgefragt."""
+        data = self.api.get_seller_events(window_start, window_end)
+        items = _items(data)
+        if len(items) >= MAX_SELLER_EVENTS:
+            if window_end - window_start <= timedelta(minutes=1):
+                # Nicht anwenden: das Wasserzeichen darf nicht hinter fehlende Änderungen rücken
+                raise _EventsTruncated(f"{len(items)} Änderungen zwischen {window_start.isoformat()} und "
+                                       f"{window_end.isoformat()}, Antwort unvollständig")
+            middle = window_start + (window_end - window_start) / 2
+            self._sync_events(window_start, middle, stats)
+            self._sync_events(middle, window_end, stats)
+            return
+        self._apply_page(items, stats)
+        db.session.commit()
+        stats['pages'] += 1
+        stats['items'] += len(items)
+
+    def _sync_end_time_window(self, window_start: datetime, window_end: datetime, stats: Dict[str, Any]):
+        page = 1
+        while True:
+            data = self.api.get_seller_list(window_start, window_end, page=page,
+                                            entries_per_page=self.entries_per_page)
+            items = _items(data)
+            self._apply_page(items, stats)
+            db.session.commit()
+            stats['pages'] += 1
+            stats['items'] += len(items)
+
+            total_pages = int((data.get('PaginationResult') or {}).get('TotalNumberOfPages') or 0)
+            if page >= total_pages and str(data.get('HasMoreItems', 'false')).lower() != 'true':
+                break
+            page += 1
+
+    @staticmethod
+    def _apply_page(items: List[Dict[str, Any]], stats: Dict[str, Any]):
+        """Überträgt die Status einer Seite mit einem UPDATE je Status."""
+        by_status: Dict[str, List[str]] = {}
+        for item in items:
+            status = listing_status(item)
+            if status and item.get('ItemID'):
+                by_status.setdefault(status, []).append(str(item['ItemID']))
+
+        now = datetime.utcnow()
+        matched = 0
+        for status, item_ids in by_status.items():
+            values = {Book.ebay_listing_status: status, Book.ebay_last_sync: now}
+            if status == 'active':
+                values[Book.ebay_listing_error] = None
+            updated = (Book.query
+                       .filter(Book.ebay_listing_id.in_(item_ids))
+                       .update(values, synchronize_session=False))
+            matched += updated
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + updated
+        stats['updated'] += matched
+        stats['unmatched'] += sum(len(item_ids) for item_ids in by_status.values()) - matched
+
+
+class EbayListingSyncWorker:
+    """
+    Gleicht periodisch die eBay-Angebotsstatus ab (Intervall EBAY_SYNC_INTERVAL in
+    Sekunden). Laufen mehrere Prozesse, überspringt ein Prozess den Abgleich, wenn ein
+    anderer ihn innerhalb des Intervalls erledigt hat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.interval = 0
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def init_app(self, app):
+        """Startet den Worker, sofern ein Intervall und ein eBay-Token konfiguriert sind."""
+        self.interval = int(app.config.get('EBAY_SYNC_INTERVAL') or os.getenv('EBAY_SYNC_INTERVAL', 0))
+        if self.interval <= 0 or app.testing or not os.getenv('EBAY_TOKEN'):
+            return
+        self.start(app)
+
+    def start(self, app) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, args=(app,), name='ebay-listing-sync', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logging.error(f"eBay-Abgleich fehlgeschlagen: {str(e)}")
+                    self.last_error = str(e)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Ein Abgleich, sofern nicht ein anderer Prozess ihn gerade erledigt hat."""
+        checkpoint = JobCheckpoint.load(EbayListingSync.CHECKPOINT_NAME)
+        last_run = ((checkpoint.state or {}).get('last_run') or {}).get('finished_at')
+        if last_run and datetime.fromisoformat(last_run) > datetime.utcnow() - timedelta(seconds=self.interval * 0.9):
+            db.session.rollback()
+            return None
+        stats = EbayListingSync().run()
+        self.last_stats = stats
+        self.last_error = None
+        return stats
+
+
+ebay_listing_sync_worker = EbayListingSyncWorker()
@@ -0,0 +1,189 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from PIL import Image, ImageOps
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import EbayPicture
+from app.ebay_api import EbayAPI, MAX_PICTURES
+from app.market_sources.base import AsyncRateLimiter
+
+# Mindestrestlaufzeit, damit ein gecachtes Bild nicht während des Einstellens verfällt
+USE_BY_MARGIN = timedelta(days=1)
+DOWNLOAD_TIMEOUT = (5, 30)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def listing_derivative(data: bytes, max_size: int = 1600, quality: int = 85) -> bytes:
+    """JPEG in Angebotsgröße (längste Seite max_size), Ausrichtung laut EXIF übernommen."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def _parse_use_by(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return None
+
+
+class EbayPicturePublisher:
+    """
+    Stellt die GCS-Bilder von Büchern bei eBay Picture Services bereit.
+
+    Bereits bekannte GCS-URLs werden ohne Download aufgelöst. Alle anderen Bilder
+    werden einmal heruntergeladen, über den SHA-256 ihres Inhalts im Cache (Tabelle
+    ebay_picture) nachgeschlagen und nur bei einem Fehltreffer als verkleinerte
+    JPEG-Ableitung hochgeladen; im Speicher bleibt nur die Ableitung. Downloads,
+    Verkleinerung und Uploads laufen parallel in einem Thread-Pool (eine
+    Trading-Verbindung pro Worker), Datenbankzugriffe im aufrufenden Thread.
+    """
+
+    def __init__(self, concurrency: int = 4, max_size: Optional[int] = None, quality: int = 85,
+                 calls_per_second: Optional[float] = None,
+                 connection_factory: Optional[Callable[[], Any]] = None,
+                 rate_limiter: Optional[AsyncRateLimiter] = None):
+        self.concurrency = concurrency
+        self.max_size = max_size or int(os.getenv('EBAY_PICTURE_MAX_SIZE', 1600))
+        self.quality = quality
+        rate = calls_per_second if calls_per_second is not None else float(os.getenv('EBAY_CALLS_PER_SECOND', 5))
+        # Mit dem Limiter des Sammel-Listings teilen sich Bilder und Angebote das Aufrufkontingent
+        self.rate_limiter = rate_limiter or AsyncRateLimiter(rate, burst=concurrency)
+        self.connection_factory = connection_factory or EbayAPI.create_connection
+        self._local = threading.local()
+
+    def _api(self) -> EbayAPI:
+        """EbayAPI mit der Trading-Verbindung des aktuellen Threads."""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = EbayAPI(connection=self.connection_factory())
+            self._local.api = api
+        return api
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _prepare(self, url: str) -> Tuple[str, Optional[str], Optional[bytes]]:
+        """Lädt ein Bild, bildet den Inhalts-Hash und die Ableitung; das Original wird verworfen."""
+        try:
+            response = self._session().get(url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            return url, content_hash(response.content), listing_derivative(response.content, self.max_size, self.quality)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Bild {url} konnte nicht geladen werden: {str(e)}")
+        except (OSError, ValueError) as e:
+            logging.error(f"Bild {url} konnte nicht verarbeitet werden: {str(e)}")
+        return url, None, None
+
+    def _upload(self, job: Tuple[str, str, bytes]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        digest, url, derivative = job
+        self.rate_limiter.wait()
+        try:
+            result = self._api().upload_picture(derivative, os.path.basename(url.split('?', 1)[0]) or digest)
+            return digest, result
+        except Exception as e:
+            logging.error(f"Bild {url} konnte nicht zu eBay hochgeladen werden: {str(e)}")
+            return digest, None
+
+    @staticmethod
+    def _store(digest: str, source_url: str, result: Dict[str, Any], picture: Optional[EbayPicture]):
+        """
+        Speichert ein hochgeladenes Bild in einem Savepoint. Hat ein anderer Prozess
+        denselben Inhalt gleichzeitig gespeichert, wird dessen Zeile aktualisiert.
+        """
+        use_by = _parse_use_by(result.get('use_by'))
+        try:
+            with db.session.begin_nested():
+                if picture is None:
+                    picture = EbayPicture(content_hash=digest, source_url=source_url)
+                    db.session.add(picture)
+                picture.ebay_url = result['url']
+                picture.use_by = use_by
+        except IntegrityError:
+            with db.session.begin_nested():
+                picture = EbayPicture.query.filter_by(content_hash=digest).one()
+                picture.ebay_url = result['url']
+                picture.use_by = use_by
+
+    def publish_many(self, image_lists: Dict[Any, Iterable[str]]) -> Dict[Any, List[str]]:
+        """
+        Liefert je Schlüssel (z.B. Buch-ID) die eBay-URLs der Bilder in der ursprünglichen
+        Reihenfolge. Nicht ladbare Bilder werden ausgelassen. Neue EbayPicture-Zeilen
+        werden nur geflusht; committen muss der Aufrufer.
+        """
+        image_lists = {key: list(urls or [])[:MAX_PICTURES] for key, urls in image_lists.items()}
+        urls = {url for url_list in image_lists.values() for url in url_list}
+        if not urls:
+            return {key: [] for key in image_lists}
+
+        valid_after = datetime.utcnow() + USE_BY_MARGIN
+        resolved: Dict[str, str] = {}
+        for picture in EbayPicture.query.filter(EbayPicture.source_url.in_(list(urls))):
+            if picture.use_by is None or picture.use_by > valid_after:
+                resolved[picture.source_url] = picture.ebay_url
+
+        pending = sorted(urls - resolved.keys())
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ebay-pictures') as pool:
+                prepared = {url: (digest, derivative) for url, digest, derivative in pool.map(self._prepare, pending)
+                            if digest is not None}
+                hashes = {url: digest for url, (digest, _) in prepared.items()}
+
+                cached = {
+                    picture.content_hash: picture
+                    for picture in EbayPicture.query.filter(EbayPicture.content_hash.in_(list(set(hashes.values()))))
+                }
+                uploads: Dict[str, Tuple[str, str, bytes]] = {}
+                for url, digest in hashes.items():
+                    picture = cached.get(digest)
+                    if picture is not None and (picture.use_by is None or picture.use_by > valid_after):
+                        resolved[url] = picture.ebay_url
+                    else:
+                        # Gleicher Inhalt unter mehreren URLs wird nur einmal hochgeladen
+                        uploads.setdefault(digest, (digest, url, prepared[url][1]))
+
+                uploaded = dict(pool.map(self._upload, uploads.values()))
+
+            for digest, result in uploaded.items():
+                if result is not None:
+                    self._store(digest, uploads[digest][1], result, cached.get(digest))
+            for url, digest in hashes.items():
+                if url not in resolved and uploaded.get(digest):
+                    resolved[url] = uploaded[digest]['url']
+            logging.info(f"eBay-Bilder: {len(urls)} Bilder, {len(urls) - len(pending)} über URL bekannt, "
+                         f"{len(uploads)} hochgeladen")
+
+        # Inhaltsgleiche Bilder erscheinen pro Angebot nur einmal
+        return {
+            key: list(dict.fromkeys(resolved[url] for url in url_list if url in resolved))
+            for key, url_list in image_lists.items()
+        }
+
+    def publish(self, image_urls: Iterable[str]) -> List[str]:
+        """eBay-URLs für die Bilder eines Angebots."""
+        return self.publish_many({None: image_urls})[None]
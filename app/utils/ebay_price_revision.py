@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from app import db
+from app.models import Book, JobCheckpoint
+from app.ebay_api import EbayAPI, MAX_INVENTORY_STATUS_ITEMS
+from app.market_sources.base import AsyncRateLimiter
+from app.utils.ebay_bulk_lister import CALL_LIMIT_ERROR_CODES
+
+
+class EbayPriceRevision:
+    """
+    Überträgt geänderte Preise aktiver eBay-Angebote mit ReviseInventoryStatus.
+
+    Berücksichtigt werden nur Bücher, deren price vom zuletzt an eBay übertragenen
+    Preis (ebay_listed_price) abweicht. Je Aufruf werden bis zu vier Angebote
+    geändert; die Aufrufe eines Blocks laufen parallel mit einer Trading-Verbindung
+    pro Worker und gemeinsamem Rate-Limiter. Ergebnisse werden je Angebot auf die
+    ebay_*-Spalten übertragen und pro Block committet. Fehlgeschlagene Angebote
+    behalten ihren alten ebay_listed_price und werden beim nächsten Lauf erneut versucht.
+    """
+
+    CHECKPOINT_NAME = 'ebay_price_revision'
+
+    def __init__(self, concurrency: int = 4, batch_size: int = 200,
+                 calls_per_second: Optional[float] = None,
+                 connection_factory: Optional[Callable[[], Any]] = None):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        rate = calls_per_second if calls_per_second is not None else float(os.getenv('EBAY_CALLS_PER_SECOND', 5))
+        self.rate_limiter = AsyncRateLimiter(rate, burst=concurrency)
+        self.connection_factory = connection_factory or EbayAPI.create_connection
+        self._local = threading.local()
+        self._limit_reached = threading.Event()
+
+    def _api(self) -> EbayAPI:
+        """EbayAPI mit der Trading-Verbindung des aktuellen Threads."""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = EbayAPI(connection=self.connection_factory())
+            self._local.api = api
+        return api
+
+    @staticmethod
+    def changed_books(book_ids: Optional[List[int]] = None):
+        """Aktive eBay-Angebote, deren Preis seit der letzten Übertragung geändert wurde."""
+        query = Book.query.filter(
+            Book.ebay_listing_id.isnot(None),
+            Book.ebay_listing_status == 'active',
+            Book.price > 0,
+            or_(Book.ebay_listed_price.is_(None), Book.ebay_listed_price != Book.price)
+        )
+        if book_ids:
+            query = query.filter(Book.id.in_(book_ids))
+        return query
+
+    def _revise(self, entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        if self._limit_reached.is_set():
+            return {entry['ItemID']: {'success': False, 'skipped': True} for entry in entries}
+        self.rate_limiter.wait()
+        try:
+            results = self._api().revise_inventory_status(entries)
+        except Exception as e:
+            logging.error(f"eBay-Preisänderung fehlgeschlagen: {str(e)}")
+            return {entry['ItemID']: {'success': False, 'message': str(e)} for entry in entries}
+        if any(CALL_LIMIT_ERROR_CODES.intersection(result.get('error_codes') or []) for result in results.values()):
+            logging.error("eBay-Aufrufkontingent erschöpft, Preisänderungen werden angehalten")
+            self._limit_reached.set()
+            for result in results.values():
+                result['skipped'] = not result['success']
+        return results
+
+    def run(self, book_ids: Optional[List[int]] = None, limit: Optional[int] = None,
+            progress: Optional[callable] = None) -> Dict[str, Any]:
+        """Überträgt alle (bzw. höchstens `limit`) Preisänderungen und liefert die Laufstatistik."""
+        stats = {
+            'started_at': datetime.utcnow().isoformat(),
+            'processed': 0,
+            'revised': 0,
+            'failed': 0,
+            'skipped': 0,
+            'calls': 0,
+            'items_per_minute': 0.0,
+            'completed': False
+        }
+        self._limit_reached.clear()
+        last_id = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ebay-revision') as pool:
+            while not self._limit_reached.is_set() and (limit is None or stats['processed'] < limit):
+                size = self.batch_size if limit is None else min(self.batch_size, limit - stats['processed'])
+                # Keyset-Paginierung: fehlgeschlagene Bücher erfüllen den Filter weiterhin
+                books = (self.changed_books(book_ids)
+                         .filter(Book.id > last_id)
+                         .order_by(Book.id)
+                         .limit(size)
+                         .all())
+                if not books:
+                    stats['completed'] = True
+                    break
+                last_id = books[-1].id
+
+                prices = {book.id: Decimal(str(book.price)).quantize(Decimal('0.01')) for book in books}
+                batches = [
+                    [{'ItemID': book.ebay_listing_id, 'StartPrice': str(prices[book.id])}
+                     for book in books[i:i + MAX_INVENTORY_STATUS_ITEMS]]
+                    for i in range(0, len(books), MAX_INVENTORY_STATUS_ITEMS)
+                ]
+                results: Dict[str, Dict[str, Any]] = {}
+                for request_results in pool.map(self._revise, batches):
+                    results.update(request_results)
+                stats['calls'] += len(batches)
+
+                self._apply(books, prices, results, stats)
+                elapsed = time.perf_counter() - start
+                stats['items_per_minute'] = round(stats['processed'] / elapsed * 60, 1) if elapsed else 0.0
+                checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+                checkpoint.last_id = last_id
+                checkpoint.state = dict(stats)
+                db.session.commit()
+
+                logging.info(f"eBay-Preisänderungen: {stats['revised']} übertragen, {stats['failed']} fehlgeschlagen "
+                             f"({stats['calls']} Aufrufe)")
+                if progress:
+                    progress(dict(stats))
+
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        checkpoint.state = dict(stats)
+        db.session.commit()
+        return stats
+
+    @staticmethod
+    def _apply(books: List[Book], prices: Dict[int, Decimal], results: Dict[str, Dict[str, Any]],
+               stats: Dict[str, Any]):
+        """Überträgt die Ergebnisse je Angebot auf die ebay_*-Spalten."""
+        now = datetime.utcnow()
+        for book in books:
+            result = results.get(str(book.ebay_listing_id)) or {'success': False, 'message': 'Kein Ergebnis'}
+            if result.get('skipped'):
+                stats['skipped'] += 1
+                continue
+            stats['processed'] += 1
+            book.ebay_last_sync = now
+            if result['success']:
+                book.ebay_listed_price = prices[book.id]
+                book.ebay_listing_error = None
+                stats['revised'] += 1
+            else:
+                book.ebay_listing_error = f"Preisänderung fehlgeschlagen: {result.get('message')}"
+                stats['failed'] += 1
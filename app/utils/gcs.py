@@ -0,0 +1,96 @@
+"""
+Hilfsfunktionen für den GCS-Bucket mit den Buchbildern.
+
+Bilder liegen unter `uploads/` und werden in Book.image_urls als öffentliche URL
+(https://storage.googleapis.com/<bucket>/<blob>) gespeichert.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+from google.cloud import storage
+
+UPLOAD_PREFIX = 'uploads/'
+PUBLIC_HOST = 'https://storage.googleapis.com/'
+# GCS empfiehlt höchstens 100 Aufrufe pro Batch-Anfrage
+MAX_BATCH_SIZE = 100
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_client: Optional[storage.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_storage_client() -> storage.Client:
+    """Gemeinsamer Storage-Client des Prozesses (Authentifizierung und Verbindungen werden wiederverwendet)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = storage.Client()
+        return _client
+
+
+def blob_name_from_url(url: str, bucket_name: str) -> Optional[str]:
+    """Blob-Name zu einer Bild-URL im Bucket; None für fremde URLs."""
+    if not url:
+        return None
+    for prefix in (f"{PUBLIC_HOST}{bucket_name}/", f"gs://{bucket_name}/"):
+        if url.startswith(prefix):
+            # blob.public_url kodiert den Blob-Namen
+            return unquote(url[len(prefix):].split('?', 1)[0]) or None
+    return None
+
+
+def _delete_batch(bucket: storage.Bucket, names: List[str]) -> Dict[str, Tuple[Optional[int], str]]:
+    """Löscht bis zu MAX_BATCH_SIZE Blobs in einer Batch-Anfrage; liefert Status und Text je Blob."""
+    batch = bucket.client.batch(raise_exception=False)
+    try:
+        with batch:
+            for name in names:
+                bucket.delete_blob(name)
+    except Exception as e:
+        return {name: (None, str(e)) for name in names}
+    responses = getattr(batch, '_responses', None) or []
+    if len(responses) != len(names):
+        return {name: (None, 'Unvollständige Batch-Antwort') for name in names}
+    return {name: (response.status_code, response.text[:200]) for name, response in zip(names, responses)}
+
+
+def delete_blobs(bucket: storage.Bucket, names: Iterable[str], batch_size: int = MAX_BATCH_SIZE,
+                 retries: int = 3, backoff: float = 1.0) -> Dict[str, Any]:
+    """
+    Löscht Blobs in Batch-Anfragen. Bereits gelöschte Blobs (404) zählen als Erfolg;
+    vorübergehende Fehler (Zeitüberschreitung, 429, 5xx) werden mit exponentiellem
+    Backoff wiederholt. Liefert die Anzahl gelöschter und fehlender Blobs sowie die
+    Fehlermeldung je endgültig fehlgeschlagenem Blob.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    pending = list(dict.fromkeys(names))
+    result = {'deleted': 0, 'missing': 0, 'requests': 0, 'failed': {}}
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        transient = []
+        for offset in range(0, len(pending), batch_size):
+            chunk = pending[offset:offset + batch_size]
+            result['requests'] += 1
+            for name, (status, message) in _delete_batch(bucket, chunk).items():
+                if status is not None and 200 <= status < 300:
+                    result['deleted'] += 1
+                    result['failed'].pop(name, None)
+                elif status == 404:
+                    result['missing'] += 1
+                    result['failed'].pop(name, None)
+                else:
+                    result['failed'][name] = f"{status or 'Fehler'}: {message}"
+                    if status is None or status in TRANSIENT_STATUS_CODES:
+                        transient.append(name)
+        pending = transient
+
+    if result['failed']:
+        logging.error(f"{len(result['failed'])} Blobs in {bucket.name} konnten nicht gelöscht werden")
+    return result
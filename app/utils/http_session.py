@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import weakref
+import aiohttp
+
+# Verbindungslimits für den gemeinsamen Pool
+POOL_LIMIT = 50
+POOL_LIMIT_PER_HOST = 8
+
+# Eine ClientSession pro Event-Loop, da aiohttp-Sessions an ihren Loop gebunden sind
+_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = weakref.WeakKeyDictionary()
+
+
+def get_client_session() -> aiohttp.ClientSession:
+    """
+    Liefert die gemeinsame, gepoolte aiohttp-Session für den laufenden Event-Loop.
+    Muss innerhalb einer Coroutine aufgerufen werden.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=300
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'User-Agent': 'buchanalyse/1.0'}
+        )
+        _sessions[loop] = session
+        logging.debug("Neue aiohttp ClientSession für Event-Loop erstellt")
+    return session
+
+
+async def close_client_session():
+    """Schließt die Session des laufenden Event-Loops, falls vorhanden."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
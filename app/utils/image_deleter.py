@@ -0,0 +1,120 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils.gcs import MAX_BATCH_SIZE, delete_blobs, get_storage_client
+
+
+class ImageDeletionWorker:
+    """
+    Löscht Bilder gelöschter Bücher im Hintergrund aus dem GCS-Bucket.
+
+    Die Blob-Namen werden in eine Warteschlange gestellt; ein Thread sammelt sie kurz
+    (max_wait Sekunden bzw. bis MAX_BATCH_SIZE Namen) und löscht sie mit einer
+    Batch-Anfrage. So werden auch viele kurz nacheinander gelöschte Bücher in wenigen
+    Anfragen erledigt. Bereits gelöschte Blobs zählen als Erfolg, vorübergehende Fehler
+    wiederholt delete_blobs. Was beim Beenden des Prozesses noch in der Warteschlange
+    liegt oder endgültig fehlschlägt, entfernt später die Bilder-Bereinigung
+    (CleanupService.sweep_orphaned_images).
+    """
+
+    def __init__(self, max_wait: float = 0.5, batch_size: int = MAX_BATCH_SIZE):
+        self.max_wait = max_wait
+        self.batch_size = batch_size
+        self.bucket_name: Optional[str] = None
+        self.client = None
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'deleted': 0, 'missing': 0, 'failed': 0, 'requests': 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def init_app(self, app):
+        self.bucket_name = app.config.get('GCS_BUCKET_NAME')
+        # Beim regulären Beenden noch wartende Blobs kurz abarbeiten
+        atexit.register(self.flush, timeout=5)
+
+    def enqueue(self, blob_names: Iterable[str]) -> int:
+        """Stellt Blobs zum Löschen ein; liefert die Anzahl eingestellter Namen."""
+        names = [name for name in blob_names if name]
+        if not names:
+            return 0
+        if not self.bucket_name:
+            logging.error("GCS_BUCKET_NAME nicht konfiguriert, Bilder können nicht gelöscht werden.")
+            return 0
+        for name in names:
+            self._queue.put(name)
+        self._ensure_started()
+        return len(names)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._loop, name='gcs-image-deletion', daemon=True)
+            self._thread.start()
+
+    def _collect(self) -> List[str]:
+        """Wartet auf den ersten Namen und sammelt dann bis zu max_wait Sekunden weitere."""
+        names = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(names) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                names.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return names
+
+    def _loop(self):
+        while True:
+            names = self._collect()
+            try:
+                bucket = (self.client or get_storage_client()).bucket(self.bucket_name)
+                result = delete_blobs(bucket, names, batch_size=self.batch_size)
+                self._record(result)
+            except Exception as e:
+                logging.error(f"Fehler beim Löschen von {len(names)} Bildern aus GCS: {str(e)}")
+                self.last_error = str(e)
+                self.stats['failed'] += len(names)
+            finally:
+                with self._lock:
+                    for _ in names:
+                        self._queue.task_done()
+                    self._idle.notify_all()
+
+    def _record(self, result: Dict[str, Any]):
+        for key in ('deleted', 'missing', 'requests'):
+            self.stats[key] += result[key]
+        self.stats['failed'] += len(result['failed'])
+        if result['failed']:
+            self.last_error = next(iter(result['failed'].values()))
+        logging.debug(f"{result['deleted']} Bilder aus GCS gelöscht, {result['missing']} bereits entfernt")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wartet, bis alle eingestellten Blobs verarbeitet sind; False bei Zeitüberschreitung."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+
+image_deleter = ImageDeletionWorker()
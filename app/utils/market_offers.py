@@ -0,0 +1,164 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app import db
+from app.models import MarketOffer
+from app.utils.book_keys import (CONDITION_FACTORS, MarketQuery, normalize_condition, normalize_isbn,
+                                 normalize_text)
+from app.utils.price_parser import parse_price
+from app.utils.price_stats import price_confidence, summarize
+
+# Gruppen der Gemini-Vergleichsangebote
+EDITION_KINDS = ('aktuelle_auflage', 'andere_auflagen', 'ohne_auflage')
+# Mindestanzahl aktueller Vergleichsangebote, ab der ohne Marktrecherche bepreist wird
+MIN_COMPARABLES = int(os.environ.get('MIN_COMPARABLE_OFFERS', 5))
+# Maximales Alter der Vergleichsangebote
+COMPARABLE_MAX_AGE = timedelta(days=int(os.environ.get('COMPARABLE_MAX_AGE_DAYS', 30)))
+
+
+def _text(value: Any, length: int) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    return str(value).strip()[:length] or None
+
+
+def offers_from_gemini(book, vergleichsangebote: Dict[str, Any],
+                       observed_at: Optional[datetime] = None) -> List[MarketOffer]:
+    """
+    Wandelt die Gemini-Vergleichsangebote eines Buches in MarketOffer-Zeilen um.
+    Angebote ohne erkennbaren Preis werden verworfen, Preisspannen mit ihrer Mitte
+    übernommen.
+    """
+    observed_at = observed_at or datetime.utcnow()
+    item_key = MarketQuery.from_book(book).item_key
+    isbn = normalize_isbn(book.isbn) or None
+    offers = []
+    for kind in EDITION_KINDS:
+        for entry in (vergleichsangebote or {}).get(kind) or []:
+            if not isinstance(entry, dict):
+                continue
+            parsed = parse_price(entry.get('preis'))
+            if parsed is None or parsed.mid <= 0:
+                continue
+            same_edition = kind == 'aktuelle_auflage'
+            edition = _text(book.edition, 100) if same_edition else _text(entry.get('auflage'), 100)
+            year = entry.get('erscheinungsjahr')
+            offers.append(MarketOffer(
+                book_id=book.id,
+                item_key=item_key,
+                isbn=isbn,
+                price=parsed.mid,
+                currency=parsed.currency,
+                condition=_text(entry.get('zustand'), 100),
+                platform=_text(entry.get('plattform'), 100),
+                seller=_text(entry.get('anbieter'), 255),
+                link=_text(entry.get('link'), 1000),
+                edition_kind=kind,
+                same_edition=same_edition,
+                edition=edition,
+                edition_key=normalize_text(edition)[:100] or None,
+                publication_year=year if isinstance(year, int) else (book.publication_year if same_edition else None),
+                source='gemini',
+                observed_at=observed_at
+            ))
+    return offers
+
+
+def ingest_gemini_offers(book, market_data: Dict[str, Any]) -> List[MarketOffer]:
+    """
+    Speichert die Vergleichsangebote einer Gemini-Marktrecherche als MarketOffer-Zeilen.
+    Committet nicht; das übernimmt der Aufrufer zusammen mit dem Buch.
+    """
+    try:
+        offers = offers_from_gemini(book, market_data.get('vergleichsangebote', {}))
+    except Exception as e:
+        logging.error(f"Fehler beim Parsen der Vergleichsangebote für Buch {book.id}: {str(e)}")
+        return []
+    db.session.add_all(offers)
+    logging.debug(f"{len(offers)} Vergleichsangebote für Buch {book.id} übernommen")
+    return offers
+
+
+def offers_for_book(book_id: int, sort: str = 'price', same_edition_only: bool = False):
+    """Query der Vergleichsangebote eines Buches, sortiert in SQL."""
+    query = MarketOffer.query.filter(MarketOffer.book_id == book_id)
+    if same_edition_only:
+        query = query.filter(MarketOffer.same_edition.is_(True))
+    order = {
+        'price': MarketOffer.price.asc(),
+        '-price': MarketOffer.price.desc(),
+        'observed_at': MarketOffer.observed_at.desc()
+    }.get(sort, MarketOffer.price.asc())
+    return query.order_by(order, MarketOffer.id)
+
+
+def find_comparables(isbn: str, edition: Optional[str] = None,
+                     max_age: timedelta = COMPARABLE_MAX_AGE,
+                     now: Optional[datetime] = None) -> List[MarketOffer]:
+    """
+    Aktuelle Vergleichsangebote der gleichen Auflage zu einer ISBN (Index
+    ix_market_offer_comparables). Ohne Auflagenangabe zählen alle Auflagen der ISBN.
+    Angebote, die bei mehreren Exemplaren desselben Titels erneut gemeldet wurden,
+    zählen nur einmal (neueste Meldung).
+    """
+    isbn = normalize_isbn(isbn)
+    if not isbn:
+        return []
+    cutoff = (now or datetime.utcnow()) - max_age
+    query = MarketOffer.query.filter(
+        MarketOffer.isbn == isbn,
+        MarketOffer.observed_at >= cutoff,
+        MarketOffer.same_edition.is_(True),
+        MarketOffer.currency == 'EUR'
+    )
+    edition_key = normalize_text(edition)[:100]
+    if edition_key:
+        query = query.filter(MarketOffer.edition_key == edition_key)
+
+    unique = {}
+    for offer in query.order_by(MarketOffer.observed_at.desc()):
+        key = offer.link or (offer.platform, offer.seller, offer.price, offer.condition)
+        unique.setdefault(key, offer)
+    return list(unique.values())
+
+
+def _condition_factor(condition: Optional[str]) -> float:
+    """Preisfaktor eines Zustands; unbekannte Angaben zählen wie 'Good'."""
+    return CONDITION_FACTORS[normalize_condition(condition) or 'Good']
+
+
+def estimate_from_comparables(isbn: str, edition: Optional[str] = None,
+                              condition: Optional[str] = None,
+                              min_count: int = MIN_COMPARABLES) -> Optional[Dict[str, Any]]:
+    """
+    Preisempfehlung aus dem Vergleichsindex oder None, wenn zu wenige aktuelle
+    Angebote vorliegen. Mit condition werden die Angebotspreise über die
+    Zustandsfaktoren auf den Zustand des eigenen Exemplars umgerechnet, sodass
+    z.B. neue Vergleichsexemplare ein gutes Exemplar nicht überbewerten.
+    """
+    offers = find_comparables(isbn, edition)
+    if len(offers) < min_count:
+        return None
+    if condition:
+        target_factor = _condition_factor(condition)
+        prices = [float(offer.price) / _condition_factor(offer.condition) * target_factor for offer in offers]
+    else:
+        prices = [offer.price for offer in offers]
+    stats = summarize(prices)
+    if not stats or not stats.get('robust_median'):
+        return None
+    recommended = stats['robust_median']
+    # Spanne wie bei der Marktanalyse, damit Ausreißer die Grenzen nicht verschieben
+    return {
+        'recommended': round(recommended, 2),
+        'min': round(max(1.0, recommended * 0.8), 2),
+        'max': round(recommended * 1.2, 2),
+        'count': stats['count'],
+        'condition': normalize_condition(condition) if condition else None,
+        'confidence_score': round(price_confidence(stats), 2),
+        'newest_offer_at': max(offer.observed_at for offer in offers).isoformat(),
+        'oldest_offer_at': min(offer.observed_at for offer in offers).isoformat(),
+        'statistics': stats
+    }
@@ -0,0 +1,257 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import PriceObservation, PriceRollup
+from app.utils.book_keys import bounded_item_key
+from app.utils.price_parser import parse_amount
+
+# Zeitfenster für die Trendberechnung in Tagen
+TREND_WINDOW_DAYS = 30
+# Grenzen des Trendfaktors, damit einzelne Ausreißer den Preis nicht kippen
+TREND_FACTOR_BOUNDS = (0.8, 1.25)
+# Mindestanzahl Beobachtungen je Fenster für einen belastbaren Trend
+MIN_TREND_OBSERVATIONS = 3
+# Anzahl Monate für saisonale Muster
+SEASONALITY_MONTHS = 24
+
+
+def observations_from_market_data(item_key: str, market_data: Dict[str, Dict[str, Any]],
+                                  observed_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Erzeugt Beobachtungen aus den Angeboten aller erfolgreich abgefragten Quellen."""
+    observed_at = observed_at or datetime.utcnow()
+    rows = []
+    for source, data in market_data.items():
+        if data.get('status', 'ok') != 'ok':
+            continue
+        offers = data.get('offers') or [{'price': price} for price in data.get('prices', [])]
+        for offer in offers:
+            price = parse_amount(offer.get('price'))
+            if price is None or price <= 0:
+                continue
+            rows.append({
+                'item_key': bounded_item_key(item_key),
+                'source': source[:50],
+                'condition': str(offer['condition'])[:50] if offer.get('condition') else None,
+                'price': price,
+                'currency': offer.get('currency') or 'EUR',
+                'observed_at': observed_at
+            })
+    return rows
+
+
+def observations_from_offers(offers) -> List[Dict[str, Any]]:
+    """
+    Erzeugt Beobachtungen aus importierten Vergleichsangeboten (MarketOffer) der
+    gleichen Auflage. Angebote anderer oder unbekannter Auflagen werden nicht
+    übernommen, da sie nicht zum Titelschlüssel passen.
+    """
+    return [
+        {
+            'item_key': offer.item_key,
+            'source': (offer.platform or offer.source).strip().lower()[:50],
+            'condition': offer.condition[:50] if offer.condition else None,
+            'price': offer.price,
+            'currency': offer.currency,
+            'observed_at': offer.observed_at
+        }
+        for offer in offers
+        if offer.same_edition
+    ]
+
+
+def record_observations(rows: List[Dict[str, Any]]):
+    """
+    Speichert Beobachtungen und aktualisiert die Tages- und Monatsaggregate.
+    Committet nicht; das übernimmt der Aufrufer zusammen mit seinen Änderungen.
+    """
+    if not rows:
+        return
+    # Beobachtungen und Aggregate gemeinsam in einem Savepoint: Scheitert einer der
+    # Schritte, bleiben beide konsistent und die Transaktion des Aufrufers intakt
+    try:
+        with db.session.begin_nested():
+            db.session.bulk_insert_mappings(PriceObservation, rows)
+            _update_rollups(row for row in rows if row['currency'] == 'EUR')
+    except SQLAlchemyError as e:
+        logging.error(f"Preisbeobachtungen konnten nicht gespeichert werden: {str(e)}")
+
+
+def _period_starts(observed_at: datetime):
+    day = observed_at.date()
+    return (('day', day), ('month', day.replace(day=1)))
+
+
+def _update_rollups(rows: Iterable[Dict[str, Any]]):
+    """Addiert die Beobachtungen per Upsert auf bestehende Aggregate bzw. legt neue an."""
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        price = Decimal(row['price'])
+        for period, start in _period_starts(row['observed_at']):
+            key = (row['item_key'], period, start)
+            delta = deltas.get(key)
+            if delta is None:
+                deltas[key] = {'count': 1, 'sum': price, 'min': price, 'max': price}
+            else:
+                delta['count'] += 1
+                delta['sum'] += price
+                delta['min'] = min(delta['min'], price)
+                delta['max'] = max(delta['max'], price)
+    if not deltas:
+        return
+
+    # Upsert statt Lesen und Schreiben: gleichzeitige Aufnahmen desselben Titels
+    # addieren atomar auf dieselbe Zeile, ohne Konflikt auf uq_price_rollup_item_period
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        least, greatest = func.least, func.greatest
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        # SQLite: min()/max() mit mehreren Argumenten sind skalare Funktionen
+        least, greatest = func.min, func.max
+    else:
+        raise NotImplementedError(f"Preisaggregate werden für {dialect} nicht unterstützt")
+
+    table = PriceRollup.__table__
+    now = datetime.utcnow()
+    statement = insert(table).values([
+        {
+            'item_key': key[0],
+            'period': key[1],
+            'period_start': key[2],
+            'count': delta['count'],
+            'price_sum': delta['sum'],
+            'price_min': delta['min'],
+            'price_max': delta['max'],
+            'updated_at': now
+        }
+        # Feste Reihenfolge, damit parallele Transaktionen Zeilen gleich sperren
+        for key, delta in sorted(deltas.items())
+    ])
+    excluded = statement.excluded
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.item_key, table.c.period, table.c.period_start],
+        set_={
+            'count': table.c.count + excluded.count,
+            'price_sum': table.c.price_sum + excluded.price_sum,
+            'price_min': least(func.coalesce(table.c.price_min, excluded.price_min), excluded.price_min),
+            'price_max': greatest(func.coalesce(table.c.price_max, excluded.price_max), excluded.price_max),
+            'updated_at': excluded.updated_at
+        }
+    ))
+
+
+def _empty_history() -> Dict[str, Any]:
+    return {
+        'price_trends': {},
+        'seasonal_patterns': {},
+        'long_term_trend': {}
+    }
+
+
+def load_history(item_keys: Iterable[str], today: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Liefert Trend und Saisonalität für mehrere Titel mit je einer indizierten
+    Abfrage auf Tages- und Monatsaggregate.
+    """
+    item_keys = list(set(item_keys))
+    histories = {key: _empty_history() for key in item_keys}
+    if not item_keys:
+        return histories
+
+    today = today or datetime.utcnow().date()
+    daily_since = today - timedelta(days=2 * TREND_WINDOW_DAYS)
+    monthly_since = (today.replace(day=1) - timedelta(days=31 * SEASONALITY_MONTHS)).replace(day=1)
+
+    daily = defaultdict(list)
+    for rollup in PriceRollup.query.filter(
+        PriceRollup.item_key.in_(item_keys),
+        PriceRollup.period == 'day',
+        PriceRollup.period_start >= daily_since
+    ):
+        daily[rollup.item_key].append(rollup)
+
+    monthly = defaultdict(list)
+    for rollup in PriceRollup.query.filter(
+        PriceRollup.item_key.in_(item_keys),
+        PriceRollup.period == 'month',
+        PriceRollup.period_start >= monthly_since
+    ):
+        monthly[rollup.item_key].append(rollup)
+
+    for key in item_keys:
+        histories[key]['price_trends'] = _trend(daily.get(key, []), today)
+        histories[key]['seasonal_patterns'] = _seasonality(monthly.get(key, []))
+        histories[key]['long_term_trend'] = _long_term(monthly.get(key, []))
+    return histories
+
+
+def get_history(item_key: str) -> Dict[str, Any]:
+    """Trend und Saisonalität für einen einzelnen Titel."""
+    try:
+        return load_history([item_key])[item_key]
+    except Exception as e:
+        logging.error(f"Fehler beim Laden der Preishistorie für {item_key}: {str(e)}")
+        return _empty_history()
+
+
+def _window_average(rollups) -> tuple:
+    count = sum(r.count for r in rollups)
+    total = sum(float(r.price_sum) for r in rollups)
+    return count, (total / count if count else None)
+
+
+def _trend(rollups, today: date) -> Dict[str, Any]:
+    """Vergleicht den Durchschnitt der letzten 30 Tage mit den 30 Tagen davor."""
+    boundary = today - timedelta(days=TREND_WINDOW_DAYS)
+    recent_count, recent_avg = _window_average([r for r in rollups if r.period_start > boundary])
+    previous_count, previous_avg = _window_average([r for r in rollups if r.period_start <= boundary])
+
+    result = {
+        'window_days': TREND_WINDOW_DAYS,
+        'recent_average': recent_avg,
+        'recent_count': recent_count,
+        'previous_average': previous_avg,
+        'previous_count': previous_count,
+        'factor': 1.0
+    }
+    if (recent_count >= MIN_TREND_OBSERVATIONS and previous_count >= MIN_TREND_OBSERVATIONS
+            and previous_avg):
+        low, high = TREND_FACTOR_BOUNDS
+        result['factor'] = round(min(high, max(low, recent_avg / previous_avg)), 3)
+    return result
+
+
+def _seasonality(rollups) -> Dict[str, Any]:
+    """Durchschnittspreis je Kalendermonat relativ zum Gesamtdurchschnitt."""
+    by_month = defaultdict(lambda: [0, 0.0])
+    for rollup in rollups:
+        entry = by_month[rollup.period_start.month]
+        entry[0] += rollup.count
+        entry[1] += float(rollup.price_sum)
+    total_count = sum(entry[0] for entry in by_month.values())
+    if not total_count:
+        return {}
+    overall = sum(entry[1] for entry in by_month.values()) / total_count
+    return {
+        str(month): round((total / count) / overall, 3)
+        for month, (count, total) in sorted(by_month.items())
+        if count and overall
+    }
+
+
+def _long_term(rollups) -> Dict[str, Any]:
+    """Durchschnittspreise der Monatsaggregate in zeitlicher Reihenfolge."""
+    ordered = sorted(rollups, key=lambda r: r.period_start)
+    return {
+        rollup.period_start.strftime('%Y-%m'): round(rollup.average, 2)
+        for rollup in ordered
+        if rollup.count
+    }
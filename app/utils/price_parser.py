@@ -0,0 +1,157 @@
+"""
+Gemeinsamer Parser für Preisangaben aus Gemini-Antworten und Marktquellen.
+
+Versteht deutsche und englische Schreibweisen ('12,50 EUR', '12.50 €',
+'1.234,56 €', '1,234.56 USD'), Spannen ('8-12 EUR', '8 – 12 €', '8 bis 12 EUR') und
+Einzelwerte. Steht eine Spanne ohne Währung neben einem Betrag mit Währung
+('2-3 Tage, 15 EUR'), gilt der Betrag. Die regulären Ausdrücke werden einmal beim
+Import kompiliert.
+"""
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional, Tuple
+
+# Dreiergruppen hinter Kommas oder Punkten ('1,234.56', '1.234', '12.345') werden als
+# ganze Zahl erfasst; welches Zeichen Tausender trennt, entscheidet _to_decimal
+_NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?'
+_NUMBER_PATTERN = re.compile(_NUMBER)
+# Währungsangabe direkt vor oder hinter einer Zahl ('€15', '15 EUR')
+_CURRENCY_TOKEN = r'(?:€|\$|£|\bEUR\b|\bEuro\b|\bUSD\b|\bGBP\b|\bCHF\b)'
+_CURRENCY_AFTER = re.compile(rf'\s*{_CURRENCY_TOKEN}', re.IGNORECASE)
+_CURRENCY_BEFORE = re.compile(rf'{_CURRENCY_TOKEN}\s*$', re.IGNORECASE)
+_CURRENCY_INSIDE = re.compile(_CURRENCY_TOKEN, re.IGNORECASE)
+_RANGE_PATTERN = re.compile(
+    rf'({_NUMBER})\s*{_CURRENCY_TOKEN}?\s*(?:-|–|—|bis)\s*{_CURRENCY_TOKEN}?\s*({_NUMBER})',
+    re.IGNORECASE
+)
+_CURRENCY_PATTERNS = (
+    (re.compile(r'€|\bEUR\b|\bEuro\b', re.IGNORECASE), 'EUR'),
+    (re.compile(r'\$|\bUSD\b', re.IGNORECASE), 'USD'),
+    (re.compile(r'£|\bGBP\b', re.IGNORECASE), 'GBP'),
+    (re.compile(r'\bCHF\b|\bFr\.', re.IGNORECASE), 'CHF'),
+)
+DEFAULT_CURRENCY = 'EUR'
+_CENT = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class ParsedPrice:
+    """Geparste Preisangabe; bei Einzelwerten sind low und high gleich."""
+    low: Decimal
+    high: Decimal
+    currency: str = DEFAULT_CURRENCY
+
+    @property
+    def mid(self) -> Decimal:
+        return ((self.low + self.high) / 2).quantize(_CENT)
+
+    @property
+    def is_range(self) -> bool:
+        return self.low != self.high
+
+
+def _to_decimal(token: str, currency_follows: bool = False) -> Optional[Decimal]:
+    """
+    Wandelt eine Zahl um. Folgt ein Punkt auf Kommas ('1,234.56'), trennen die Kommas
+    Tausender (englisch). Ein Komma vor Dreiergruppen ('1,234') trennt ebenfalls
+    Tausender, da Preise keine drei Nachkommastellen haben. Ein einzelner Punkt vor
+    einer Dreiergruppe ('12.345') trennt nur dann Tausender, wenn eine Währungsangabe
+    folgt ('12.345 €'); sonst ist er ein Dezimalpunkt.
+    """
+    if ',' in token and (token.rfind('.') > token.rfind(',') or re.fullmatch(r'\d{1,3}(?:,\d{3})+', token)):
+        # Englische Schreibweise: Kommas trennen Tausender
+        token = token.replace(',', '')
+    elif ',' in token:
+        # Deutsche Schreibweise: Punkte trennen Tausender, Komma trennt Dezimalstellen
+        token = token.replace('.', '').replace(',', '.')
+    elif token.count('.') > 1 or (currency_follows and re.fullmatch(r'\d{1,3}(?:\.\d{3})+', token)):
+        token = token.replace('.', '')
+    try:
+        return Decimal(token).quantize(_CENT)
+    except InvalidOperation:
+        return None
+
+
+def _currency_after(text: str, end: int) -> bool:
+    return bool(_CURRENCY_AFTER.match(text, end))
+
+
+def _currency_before(text: str, start: int) -> bool:
+    return bool(_CURRENCY_BEFORE.search(text, 0, start))
+
+
+def _range_has_currency(text: str, match: re.Match) -> bool:
+    """Ob vor, innerhalb oder hinter der Spanne eine Währungsangabe steht."""
+    return (_currency_before(text, match.start(1)) or _currency_after(text, match.end(2))
+            or bool(_CURRENCY_INSIDE.search(text, match.end(1), match.start(2))))
+
+
+def _amount_with_currency(text: str) -> Optional[re.Match]:
+    """Erste Zahl mit Währungsangabe davor oder dahinter."""
+    for match in _NUMBER_PATTERN.finditer(text):
+        if _currency_before(text, match.start()) or _currency_after(text, match.end()):
+            return match
+    return None
+
+
+def parse_currency(value: Any, default: str = DEFAULT_CURRENCY) -> str:
+    """Erkennt die Währung einer Preisangabe, ohne Angabe gilt `default`."""
+    if isinstance(value, str):
+        for pattern, code in _CURRENCY_PATTERNS:
+            if pattern.search(value):
+                return code
+    return default
+
+
+def parse_price(value: Any) -> Optional[ParsedPrice]:
+    """
+    Parst eine Preisangabe in eine Spanne mit Währung.
+    Liefert None, wenn keine Zahl gefunden wird.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        try:
+            amount = Decimal(str(value)).quantize(_CENT)
+        except InvalidOperation:
+            return None
+        return ParsedPrice(amount, amount)
+
+    text = str(value)
+    currency = parse_currency(text)
+    ranges = list(_RANGE_PATTERN.finditer(text))
+    amount_match = _amount_with_currency(text)
+    # Spannen ohne Währung ('2-3 Tage') nur, wenn kein Betrag eine Währung trägt
+    match = next((m for m in ranges if _range_has_currency(text, m)), None)
+    if match is None and amount_match is None and ranges:
+        match = ranges[0]
+    if match:
+        # Eine Währung hinter dem oberen Wert gilt auch für den unteren ('1.500 - 2.000 €')
+        high_currency = _currency_after(text, match.end(2))
+        low_currency = high_currency or _currency_after(text, match.end(1))
+        low, high = _to_decimal(match.group(1), low_currency), _to_decimal(match.group(2), high_currency)
+        if low is not None and high is not None:
+            return ParsedPrice(min(low, high), max(low, high), currency)
+
+    match = amount_match or _NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    amount = _to_decimal(match.group(0), _currency_after(text, match.end()))
+    if amount is None:
+        return None
+    return ParsedPrice(amount, amount, currency)
+
+
+def parse_amount(value: Any) -> Optional[Decimal]:
+    """Einzelbetrag einer Preisangabe; bei Spannen die Mitte."""
+    parsed = parse_price(value)
+    return parsed.mid if parsed else None
+
+
+def parse_price_range(value: Any) -> Tuple[float, float]:
+    """(min, max) als float, (0.0, 0.0) wenn nichts erkannt wird."""
+    parsed = parse_price(value)
+    if parsed is None:
+        return 0.0, 0.0
+    return float(parsed.low), float(parsed.high)
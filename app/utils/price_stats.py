@@ -0,0 +1,196 @@
+"""
+NumPy-basierte Preisstatistiken für einzelne Bücher und ganze Bestände.
+
+Alle Funktionen arbeiten auf "ragged arrays": einem flachen Preis-Array plus
+Offsets, die die Segmente (Quellen bzw. Bücher) begrenzen. Segment i umfasst
+values[offsets[i]:offsets[i + 1]]. So werden Statistiken für viele Segmente mit
+wenigen vektorisierten Operationen statt mit Python-Schleifen berechnet.
+"""
+from typing import Any, Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+
+# Standardanteil, der beim getrimmten Mittel an jedem Ende verworfen wird
+TRIM_PROPORTION = 0.1
+# Schwelle für den modifizierten z-Score bei der MAD-Ausreißererkennung
+MAD_THRESHOLD = 3.5
+
+
+def to_ragged(groups: Iterable[Sequence[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wandelt eine Liste von Preislisten in (values, offsets) um.
+    Werte, die sich nicht als Zahl interpretieren lassen, werden verworfen.
+    """
+    lengths = []
+    flat = []
+    for group in groups:
+        count = 0
+        for value in group or ():
+            try:
+                flat.append(float(value))
+                count += 1
+            except (TypeError, ValueError):
+                continue
+        lengths.append(count)
+    values = np.asarray(flat, dtype=np.float64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return values, offsets
+
+
+def _sort_segments(values: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """Sortiert die Werte innerhalb jedes Segments aufsteigend."""
+    order = np.lexsort((values, segments))
+    return values[order]
+
+
+def _segment_medians(sorted_values: np.ndarray, offsets: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Median je Segment aus bereits segmentweise sortierten Werten."""
+    medians = np.full(len(counts), np.nan)
+    filled = counts > 0
+    starts = offsets[:-1][filled]
+    n = counts[filled]
+    lower = sorted_values[starts + (n - 1) // 2]
+    upper = sorted_values[starts + n // 2]
+    medians[filled] = (lower + upper) / 2
+    return medians
+
+
+def segment_stats(values: np.ndarray, offsets: np.ndarray,
+                  trim: float = TRIM_PROPORTION,
+                  mad_threshold: float = MAD_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    Berechnet Statistiken für alle Segmente eines Ragged-Arrays auf einmal.
+
+    Liefert Arrays der Länge len(offsets) - 1 mit count, min, max, mean, median,
+    variance (Stichprobenvarianz, NaN bei weniger als zwei Werten), trimmed_mean,
+    mad, robust_median (Median nach MAD-Ausreißerfilter) und outliers.
+    Leere Segmente erhalten NaN bzw. 0.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_segments = len(offsets) - 1
+    counts = np.diff(offsets)
+    segments = np.repeat(np.arange(n_segments), counts)
+    filled = counts > 0
+
+    sorted_values = _sort_segments(values, segments)
+    starts = offsets[:-1]
+
+    stats: Dict[str, np.ndarray] = {'count': counts}
+    for name in ('min', 'max', 'mean', 'median', 'variance', 'trimmed_mean', 'mad', 'robust_median'):
+        stats[name] = np.full(n_segments, np.nan)
+    stats['outliers'] = np.zeros(n_segments, dtype=np.int64)
+    if not filled.any():
+        return stats
+
+    sums = np.bincount(segments, weights=sorted_values, minlength=n_segments)
+    stats['min'][filled] = sorted_values[starts[filled]]
+    stats['max'][filled] = sorted_values[offsets[1:][filled] - 1]
+    stats['mean'][filled] = sums[filled] / counts[filled]
+
+    medians = _segment_medians(sorted_values, offsets, counts)
+    stats['median'] = medians
+
+    # Stichprobenvarianz (ddof=1) wie statistics.variance
+    deviations = sorted_values - stats['mean'][segments]
+    squares = np.bincount(segments, weights=deviations ** 2, minlength=n_segments)
+    multi = counts > 1
+    stats['variance'][multi] = squares[multi] / (counts[multi] - 1)
+
+    # Getrimmtes Mittel: Rang innerhalb des Segments bestimmt, ob ein Wert zählt
+    ranks = np.arange(len(sorted_values)) - starts[segments]
+    cut = np.floor(counts * trim).astype(np.int64)
+    keep = (ranks >= cut[segments]) & (ranks < (counts - cut)[segments])
+    kept_counts = np.bincount(segments[keep], minlength=n_segments)
+    kept_sums = np.bincount(segments[keep], weights=sorted_values[keep], minlength=n_segments)
+    trimmed = kept_counts > 0
+    stats['trimmed_mean'][trimmed] = kept_sums[trimmed] / kept_counts[trimmed]
+
+    # MAD: Median der absoluten Abweichungen vom Segment-Median
+    abs_dev = np.abs(sorted_values - medians[segments])
+    mad = _segment_medians(_sort_segments(abs_dev, segments), offsets, counts)
+    stats['mad'] = mad
+
+    # Modifizierter z-Score nach Iglewicz/Hoaglin; bei MAD = 0 gilt jede Abweichung vom Median als Ausreißer
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = 0.6745 * abs_dev / mad[segments]
+    inliers = ~(z > mad_threshold)
+    stats['outliers'] = counts - np.bincount(segments[inliers], minlength=n_segments)
+
+    # sorted_values bleibt nach dem Filtern segmentweise sortiert
+    inlier_counts = np.bincount(segments[inliers], minlength=n_segments)
+    inlier_offsets = np.zeros(n_segments + 1, dtype=np.int64)
+    np.cumsum(inlier_counts, out=inlier_offsets[1:])
+    stats['robust_median'] = _segment_medians(sorted_values[inliers], inlier_offsets, inlier_counts)
+
+    return stats
+
+
+def _row(stats: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    """Wandelt Zeile i der Segment-Statistiken in ein JSON-taugliches Dict um."""
+    count = int(stats['count'][i])
+    if not count:
+        return {}
+    row = {'count': count, 'outliers': int(stats['outliers'][i])}
+    for name, key in (('min', 'min'), ('max', 'max'), ('mean', 'avg'), ('median', 'median'),
+                      ('variance', 'variance'), ('trimmed_mean', 'trimmed_mean'),
+                      ('mad', 'mad'), ('robust_median', 'robust_median')):
+        value = stats[name][i]
+        row[key] = None if np.isnan(value) else float(value)
+    return row
+
+
+def summarize(prices: Sequence[Any]) -> Dict[str, Any]:
+    """Statistiken für eine einzelne Preisliste."""
+    values, offsets = to_ragged([prices])
+    return _row(segment_stats(values, offsets), 0)
+
+
+def summarize_market_data(market_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Berechnet die Statistiken aller Quellen und die Gesamtstatistik in einem Durchlauf.
+
+    Schreibt 'stats' in jede Quelle und liefert die Gesamtstatistik über alle Preise.
+    Die Gesamtstatistik ist das letzte Segment des gemeinsamen Ragged-Arrays.
+    """
+    sources = list(market_data.keys())
+    groups = [market_data[source].get('prices', []) for source in sources]
+    values, offsets = to_ragged(groups)
+    # Zusätzliches Segment mit allen Preisen für die Gesamtstatistik
+    all_offsets = np.append(offsets, offsets[-1] + len(values))
+    stats = segment_stats(np.concatenate([values, values]), all_offsets)
+
+    for i, source in enumerate(sources):
+        market_data[source]['stats'] = _row(stats, i)
+    return _row(stats, len(sources))
+
+
+def price_confidence(stats: Dict[str, Any]) -> float:
+    """Konfidenz aus der Streuung: 1 - Varianz / Maximum², 0.5 bei zu wenigen Werten."""
+    variance = stats.get('variance')
+    maximum = stats.get('max')
+    if variance is None or not maximum:
+        return 0.5
+    return 1.0 - min(1.0, variance / (maximum ** 2))
+
+
+def batch_estimate(offers: Iterable[Sequence[Any]],
+                   trim: float = TRIM_PROPORTION,
+                   mad_threshold: float = MAD_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    Berechnet Preisschätzungen für viele Bücher auf einmal.
+
+    `offers` enthält pro Buch eine Liste von Angebotspreisen. Liefert Arrays in
+    Eingabereihenfolge mit allen Segment-Statistiken sowie 'estimate' (robuster
+    Median) und 'price_confidence'. Bücher ohne Angebote erhalten NaN bzw. 0.5.
+    """
+    values, offsets = to_ragged(offers)
+    stats = segment_stats(values, offsets, trim=trim, mad_threshold=mad_threshold)
+    stats['estimate'] = stats['robust_median']
+
+    confidence = np.full(len(stats['count']), 0.5)
+    valid = ~np.isnan(stats['variance']) & (stats['max'] > 0)
+    confidence[valid] = 1.0 - np.minimum(1.0, stats['variance'][valid] / stats['max'][valid] ** 2)
+    stats['price_confidence'] = confidence
+    return stats
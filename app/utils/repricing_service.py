@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_
+
+from app import db
+from app.models import Book, JobCheckpoint
+from app.controllers.price_analysis_controller import PriceAnalysisController
+from app.utils.book_keys import MarketQuery
+from app.utils.async_runtime import async_runtime
+from app.utils.price_history import load_history, record_observations
+
+
+class RepricingService:
+    """
+    Bepreist den gesamten Bestand inkrementell neu.
+
+    Bücher werden in ID-sortierten Blöcken gelesen (Keyset-Paginierung), Bücher mit
+    einer Marktanalyse jünger als `max_age` werden übersprungen. Jeder Block wird
+    gemeinsam mit dem Checkpoint committet, sodass ein abgebrochener Lauf beim
+    nächsten Start nach dem zuletzt verarbeiteten Buch fortsetzt. Nach einem
+    fehlgeschlagenen Block bleibt der Checkpoint davor stehen, damit der nächste Lauf
+    die Bücher erneut versucht; der Lauf selbst setzt mit dem folgenden Block fort.
+    """
+
+    CHECKPOINT_NAME = 'repricing'
+
+    def __init__(self, max_age: timedelta = timedelta(hours=24), chunk_size: int = 200,
+                 concurrency: int = 8, force_refresh: bool = False,
+                 controller: Optional[PriceAnalysisController] = None):
+        self.max_age = max_age
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.force_refresh = force_refresh
+        self.controller = controller or PriceAnalysisController()
+
+    def run(self, resume: bool = True, limit: Optional[int] = None,
+            progress: Optional[callable] = None) -> Dict[str, Any]:
+        """
+        Führt einen Neubepreisungslauf durch und liefert die Laufstatistik.
+        """
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        if not resume:
+            checkpoint.last_id = 0
+        cutoff = datetime.utcnow() - self.max_age
+
+        stats = {
+            'started_at': datetime.utcnow().isoformat(),
+            'resumed_from_id': checkpoint.last_id,
+            'processed': 0,
+            'price_changes': 0,
+            'no_market_data': 0,
+            'errors': 0,
+            'chunks': 0,
+            'failed_ranges': [],
+            'books_per_minute': 0.0,
+            'completed': False
+        }
+        start = time.perf_counter()
+        cursor = checkpoint.last_id
+
+        while limit is None or stats['processed'] < limit:
+            size = self.chunk_size if limit is None else min(self.chunk_size, limit - stats['processed'])
+            books = (Book.query
+                     .filter(Book.id > cursor)
+                     .filter(or_(Book.market_snapshot_at.is_(None), Book.market_snapshot_at < cutoff))
+                     .order_by(Book.id)
+                     .limit(size)
+                     .all())
+            if not books:
+                stats['completed'] = True
+                break
+            chunk_last_id = books[-1].id
+
+            try:
+                self._process_chunk(books, stats)
+            except Exception as e:
+                logging.error(f"Fehler bei der Neubepreisung ab Buch {books[0].id}: {str(e)}")
+                db.session.rollback()
+                stats['errors'] += len(books)
+                stats['failed_ranges'].append([books[0].id, chunk_last_id])
+                checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+
+            cursor = chunk_last_id
+            if not stats['failed_ranges']:
+                checkpoint.last_id = cursor
+            stats['chunks'] += 1
+            elapsed = time.perf_counter() - start
+            stats['books_per_minute'] = round(stats['processed'] / elapsed * 60, 1) if elapsed else 0.0
+            checkpoint.state = dict(stats)
+            db.session.commit()
+
+            logging.info(f"Neubepreisung: {stats['processed']} Bücher bis ID {cursor}, "
+                         f"{stats['price_changes']} Preisänderungen, {stats['books_per_minute']} Bücher/min")
+            if progress:
+                progress(dict(stats))
+
+        if stats['completed']:
+            # Vollständiger Durchlauf: nächster Lauf beginnt wieder von vorn
+            checkpoint.last_id = 0
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        elapsed = time.perf_counter() - start
+        stats['books_per_minute'] = round(stats['processed'] / elapsed * 60, 1) if elapsed else 0.0
+        checkpoint.state = dict(stats)
+        db.session.commit()
+        return stats
+
+    def _process_chunk(self, books, stats: Dict[str, Any]):
+        """Erhebt Marktdaten für einen Block und überträgt die Ergebnisse auf die Bücher."""
+        queries = [MarketQuery.from_book(book) for book in books]
+        # Beobachtungen werden mit dem Block committet statt in einer eigenen Transaktion
+        observations = []
+        market_data = async_runtime.run(self.controller.collect_market_data_batch(
+            queries,
+            force_refresh=self.force_refresh,
+            concurrency=self.concurrency,
+            observations=observations
+        ))
+        record_observations(observations)
+        # Preishistorie für den ganzen Block mit einer Abfrage je Aggregationsstufe
+        histories = load_history(query.item_key for query in queries)
+
+        for book, query in zip(books, queries):
+            analysis = self.controller.build_analysis(
+                book,
+                market_data.get(query.key, {}),
+                query,
+                historical_data=histories.get(query.item_key)
+            )
+            recommended = analysis['value_estimation']['price_range']['recommended']
+            # Ohne Marktdaten den bisherigen Preis nicht mit 0 überschreiben
+            has_data = recommended and recommended > 0
+            old_price = book.price
+            self.controller.apply_analysis(book, analysis, update_price=has_data)
+            stats['processed'] += 1
+            if not has_data:
+                stats['no_market_data'] += 1
+            elif old_price is None or Decimal(str(old_price)).quantize(Decimal('0.01')) != \
+                    Decimal(str(recommended)).quantize(Decimal('0.01')):
+                stats['price_changes'] += 1
+
+
+class RepricingJobRunner:
+    """
+    Führt Neubepreisungsläufe im Hintergrund aus (für den Admin-Endpunkt).
+    Es läuft höchstens ein Lauf gleichzeitig pro Prozess.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, **options) -> bool:
+        """Startet einen Lauf; liefert False, wenn bereits einer läuft."""
+        with self._lock:
+            if self.running:
+                return False
+            self.last_error = None
+            self._thread = threading.Thread(
+                target=self._run, args=(app, options), name='repricing', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, app, options):
+        resume = options.pop('resume', True)
+        limit = options.pop('limit', None)
+        with app.app_context():
+            try:
+                service = RepricingService(**options)
+                self.last_stats = service.run(resume=resume, limit=limit, progress=self._progress)
+            except Exception as e:
+                logging.error(f"Neubepreisung fehlgeschlagen: {str(e)}")
+                self.last_error = str(e)
+            finally:
+                db.session.remove()
+
+    def _progress(self, stats):
+        self.last_stats = stats
+
+
+repricing_runner = RepricingJobRunner()
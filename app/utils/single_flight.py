@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Bündelt gleichzeitige Aufrufe mit demselben Schlüssel zu einer einzigen Berechnung.
+
+    Der erste Aufrufer (Leader) führt die Funktion aus, alle weiteren Aufrufer mit
+    demselben Schlüssel warten auf dessen Ergebnis. Funktioniert threadübergreifend
+    und auch zwischen unterschiedlichen Event-Loops, da intern ein
+    concurrent.futures.Future geteilt wird.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Liefert das Future für den Schlüssel und ob der Aufrufer der Leader ist."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def in_flight(self, key: str) -> bool:
+        """Prüft, ob für den Schlüssel gerade eine Berechnung läuft."""
+        with self._lock:
+            return key in self._in_flight
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Führt fn(*args, **kwargs) höchstens einmal gleichzeitig pro Schlüssel aus.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            logging.debug(f"SingleFlight: warte auf laufende Berechnung für {key}")
+            return future.result()
+
+        try:
+            result = self._execute(key, fn, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key, future)
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Async-Variante von do(): fn muss eine Coroutine-Funktion sein.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            logging.debug(f"SingleFlight: warte auf laufende Berechnung für {key}")
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await self._execute_async(key, fn, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key, future)
+
+    def _execute(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return fn(*args, **kwargs)
+
+    async def _execute_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        return await fn(*args, **kwargs)
+
+
+class AdvisoryLockSingleFlight(SingleFlight):
+    """
+    SingleFlight mit zusätzlicher PostgreSQL Advisory-Lock für prozessübergreifende Bündelung.
+
+    Innerhalb eines Prozesses wird wie bei SingleFlight gebündelt. Der Leader holt
+    zusätzlich eine Advisory-Lock auf den Schlüssel, sodass andere Worker-Prozesse
+    warten. Nach Erhalt der Lock wird optional `lookup` aufgerufen, um ein
+    zwischenzeitlich von einem anderen Prozess abgelegtes Ergebnis (z.B. im Cache)
+    zu übernehmen, statt erneut zu rechnen.
+
+    Auf Datenbanken ohne Advisory-Locks (z.B. SQLite) verhält sich die Klasse wie SingleFlight.
+    """
+
+    def __init__(self, engine_getter: Optional[Callable[[], Any]] = None,
+                 lookup: Optional[Callable[[str], Any]] = None):
+        super().__init__()
+        self._engine_getter = engine_getter or self._default_engine
+        self.lookup = lookup
+
+    @staticmethod
+    def _default_engine():
+        from app import db
+        return db.engine
+
+    @staticmethod
+    def lock_id(key: str) -> int:
+        """Bildet den Schlüssel stabil auf eine signierte 64-Bit-Lock-ID ab."""
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big', signed=True)
+
+    def _connect(self):
+        """Öffnet eine eigene Verbindung für die Lock oder None, falls nicht unterstützt."""
+        try:
+            engine = self._engine_getter()
+        except Exception as e:
+            logging.debug(f"SingleFlight: keine Datenbank-Engine verfügbar ({e})")
+            return None
+        if engine.dialect.name != 'postgresql':
+            return None
+        return engine.connect()
+
+    def _lookup(self, key: str) -> Any:
+        if not self.lookup:
+            return None
+        try:
+            return self.lookup(key)
+        except Exception as e:
+            logging.warning(f"SingleFlight: Lookup für {key} fehlgeschlagen: {e}")
+            return None
+
+    def _execute(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        from sqlalchemy import text
+
+        conn = self._connect()
+        if conn is None:
+            return fn(*args, **kwargs)
+
+        lock_id = self.lock_id(key)
+        try:
+            conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': lock_id})
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            return fn(*args, **kwargs)
+        finally:
+            try:
+                conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': lock_id})
+            finally:
+                conn.close()
+
+    async def _execute_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        from sqlalchemy import text
+
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, self._connect)
+        if conn is None:
+            return await fn(*args, **kwargs)
+
+        lock_id = self.lock_id(key)
+        try:
+            # Das Warten auf die Lock blockiert, daher im Executor ausführen
+            await loop.run_in_executor(
+                None, lambda: conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': lock_id})
+            )
+            cached = await loop.run_in_executor(None, self._lookup, key)
+            if cached is not None:
+                return cached
+            return await fn(*args, **kwargs)
+        finally:
+            def _release():
+                try:
+                    conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': lock_id})
+                finally:
+                    conn.close()
+            await loop.run_in_executor(None, _release)
+
+
+@contextmanager
+def try_advisory_lock(key: str, engine_getter: Optional[Callable[[], Any]] = None) -> Iterator[bool]:
+    """
+    Prozessübergreifende, nicht blockierende Sperre für Hintergrundläufe
+    (pg_try_advisory_lock auf einer eigenen Verbindung). Liefert True, wenn die Sperre
+    gehalten wird, False, wenn ein anderer Prozess sie hält. Auf Datenbanken ohne
+    Advisory-Locks (z.B. SQLite) immer True.
+    """
+    from sqlalchemy import text
+
+    engine = (engine_getter or AdvisoryLockSingleFlight._default_engine)()
+    if engine.dialect.name != 'postgresql':
+        yield True
+        return
+
+    lock_id = AdvisoryLockSingleFlight.lock_id(key)
+    conn = engine.connect()
+    try:
+        acquired = bool(conn.execute(text('SELECT pg_try_advisory_lock(:id)'), {'id': lock_id}).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': lock_id})
+    finally:
+        conn.close()
+
+
+# Prozessweite Instanzen für die teuren Lookups
+open_library_flight = SingleFlight()
+market_data_flight = SingleFlight()
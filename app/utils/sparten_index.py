@@ -0,0 +1,313 @@
+"""
+Index der Booklooker-Sparten (Kategorien) aus der Vorlage
+'booklooker_vorlage_neu - Bücher_Sparten.tsv'.
+
+Die Taxonomie wird einmal pro Prozess geladen. Gültige Sparten-Nummern liegen in
+einer Menge (Prüfung in O(1)), die Namen in einem Baum Obersparte -> Untersparte.
+Für die Zuordnung aus Genre und Titel werden die Namensbestandteile als sortierte
+Wortliste mit invertiertem Index gehalten; Präfixsuchen laufen per Binärsuche wie
+in einem Trie.
+"""
+import bisect
+import csv
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'booklooker_vorlage_neu - Bücher_Sparten.tsv'
+)
+# Wörter ohne Aussagekraft für die Zuordnung
+STOPWORDS = frozenset({
+    'und', 'oder', 'der', 'die', 'das', 'des', 'den', 'dem', 'ein', 'eine', 'fur', 'von',
+    'mit', 'im', 'in', 'zu', 'zum', 'zur', 'am', 'an', 'auf', 'aus', 'bei', 'nach', 'uber',
+    'the', 'of', 'and', 'a', 'sonstiges', 'allgemein', 'buch', 'bucher', 'books', 'book'
+})
+# Häufige Genre-Angaben, die in den Spartennamen nicht vorkommen
+SYNONYMS = {
+    'belletristik': 'romane erzahlungen',
+    'kriminalroman': 'krimi',
+    'fiction': 'romane',
+    'novel': 'romane',
+    'crime': 'krimi',
+    'mystery': 'mystery krimi',
+    'biography': 'biografie',
+    'history': 'geschichte',
+    'cookbook': 'kochbucher',
+    'cooking': 'kochbucher',
+    'poetry': 'lyrik',
+    'travel': 'reisen',
+    'children': 'kinderbucher',
+    'kinder': 'kinderbucher',
+    'jugendbuch': 'jugendbucher',
+}
+# Obersparten für fremdsprachige Bücher; deutsche Bücher werden dort nie eingeordnet
+ENGLISH_OBERSPARTE = 'englischsprachige bucher'
+FOREIGN_OBERSPARTE = 'fremdsprachige bucher'
+GERMAN_LANGUAGES = ('', 'de', 'deutsch', 'german', 'ger')
+ENGLISH_LANGUAGES = ('en', 'englisch', 'english', 'eng')
+# Endungen, die für die Zuordnung abgeschnitten werden (Plural/Flexion)
+SUFFIXES = ('en', 'er', 'es', 'e', 'n', 's')
+MIN_STEM = 4
+MIN_PREFIX = 4
+_TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def fold(value: Optional[str]) -> str:
+    """Kleinschreibung ohne Akzente/Umlaute (ü -> u, ß -> ss) und mit 'f' statt 'ph'."""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value).lower().replace('ß', 'ss'))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return value.replace('ph', 'f')
+
+
+def stem(token: str) -> str:
+    """Einfache Grundform: höchstens zwei Flexionsendungen abschneiden ('romane' -> 'roma')."""
+    for _ in range(2):
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Grundformen der aussagekräftigen Wörter, ohne Wiederholungen."""
+    tokens = []
+    for token in _TOKEN_SPLIT.split(fold(value)):
+        if len(token) > 1 and token not in STOPWORDS:
+            token = stem(token)
+            if token not in tokens and token not in STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+
+def _language_group(language: Optional[str]) -> str:
+    language = fold(language).strip()
+    if language in GERMAN_LANGUAGES:
+        return ''
+    return ENGLISH_OBERSPARTE if language in ENGLISH_LANGUAGES else FOREIGN_OBERSPARTE
+
+
+@dataclass(frozen=True)
+class Sparte:
+    """Eine Booklooker-Sparte; dieselbe Nummer kann unter mehreren Obersparten stehen."""
+    id: str
+    name: str
+    obersparten: Tuple[str, ...]
+
+    @property
+    def path(self) -> str:
+        return f"{self.obersparten[0]} > {self.name}" if self.obersparten else self.name
+
+
+class SpartenIndex:
+    """Kompakter, unveränderlicher Index über alle Sparten."""
+
+    def __init__(self, rows):
+        """`rows`: Iterable aus (Obersparte, Untersparte, Sparten-Nr.) wie in der Vorlage."""
+        names: Dict[str, str] = {}
+        parents: Dict[str, List[str]] = {}
+        self.tree: Dict[str, Dict[str, str]] = {}
+        self._obersparte_names: Dict[str, str] = {}
+        obersparte = None
+
+        for row in rows:
+            top, name, sparte_id = (list(row) + ['', '', ''])[:3]
+            top, name, sparte_id = (top or '').strip(), (name or '').strip(), (sparte_id or '').strip()
+            if top:
+                obersparte = top
+                self._obersparte_names[fold(top)] = top
+                self.tree.setdefault(fold(top), {})
+            if not name or not sparte_id:
+                continue
+            names.setdefault(sparte_id, name)
+            parents.setdefault(sparte_id, [])
+            if obersparte and obersparte not in parents[sparte_id]:
+                parents[sparte_id].append(obersparte)
+            if obersparte:
+                self.tree[fold(obersparte)][fold(name)] = sparte_id
+
+        self.sparten: Dict[str, Sparte] = {
+            sparte_id: Sparte(sparte_id, name, tuple(parents[sparte_id]))
+            for sparte_id, name in names.items()
+        }
+        self.ids: FrozenSet[str] = frozenset(self.sparten)
+
+        # Invertierter Index Wort -> Sparten; Wörter der Obersparte zählen für deren
+        # Auffang-Sparte ('Sonstiges - ...') bzw. schwächer für alle Untersparten
+        postings: Dict[str, Dict[str, float]] = {}
+        self._name_tokens: Dict[str, int] = {}
+        for sparte in self.sparten.values():
+            tokens = tokenize(sparte.name)
+            self._name_tokens[sparte.id] = len(tokens)
+            for token in tokens:
+                postings.setdefault(token, {})[sparte.id] = 1.0
+        direct = {token: len(ids) for token, ids in postings.items()}
+        # Allgemeine Sparten werden bei gleicher Bewertung bevorzugt
+        self._generic: Set[str] = {
+            sparte.id for sparte in self.sparten.values() if 'allgemein' in fold(sparte.name)
+        }
+        for top_key, children in self.tree.items():
+            fallbacks = self._fallbacks(top_key)
+            self._generic.update(fallbacks.values())
+            for token in tokenize(self._obersparte_names[top_key]):
+                bucket = postings.setdefault(token, {})
+                for sparte_id in children.values():
+                    weight = 1.0 if fallbacks.get(token) == sparte_id else 0.3
+                    bucket[sparte_id] = max(bucket.get(sparte_id, 0.0), weight)
+        self._postings = postings
+        self._tokens = sorted(postings)
+        total = max(len(self.sparten), 1)
+        # Seltenheit nur nach Spartennamen, damit große Obersparten ihre Wörter nicht entwerten
+        self._idf = {token: math.log(1 + total / direct.get(token, len(ids))) for token, ids in postings.items()}
+        self._groups = {
+            sparte.id: {fold(top) for top in sparte.obersparten} & {ENGLISH_OBERSPARTE, FOREIGN_OBERSPARTE}
+            for sparte in self.sparten.values()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SpartenIndex':
+        with open(path, encoding='utf-8', newline='') as handle:
+            reader = csv.reader(handle, delimiter='\t')
+            next(reader, None)  # Kopfzeile
+            return cls(reader)
+
+    def __len__(self):
+        return len(self.sparten)
+
+    def is_valid(self, sparte_id) -> bool:
+        return sparte_id is not None and str(sparte_id).strip() in self.ids
+
+    def get(self, sparte_id) -> Optional[Sparte]:
+        return self.sparten.get(str(sparte_id).strip()) if sparte_id is not None else None
+
+    def lookup(self, path: str) -> Optional[str]:
+        """Sparten-Nr. zu 'Obersparte > Untersparte' (Schreibweise egal) oder None."""
+        parts = [fold(part.strip()) for part in re.split(r'\s*>\s*', path or '')]
+        if len(parts) != 2:
+            return None
+        return self.tree.get(parts[0], {}).get(parts[1])
+
+    def _fallbacks(self, top_key: str) -> Dict[str, str]:
+        """
+        Auffang-Sparte ('Sonstiges - ...') je Wort der Obersparte: die Sonstiges-Sparte,
+        die das Wort enthält, sonst die einzige bzw. allgemeine Sonstiges-Sparte.
+        """
+        others = {name: sparte_id for name, sparte_id in (self.tree.get(top_key) or {}).items()
+                  if name.startswith('sonstiges')}
+        if not others:
+            return {}
+        default = next(iter(others.values())) if len(others) == 1 else others.get('sonstiges')
+        fallbacks = {}
+        for token in tokenize(self._obersparte_names[top_key]):
+            fallbacks[token] = next(
+                (sparte_id for name, sparte_id in others.items() if token in tokenize(name)),
+                default
+            )
+        return {token: sparte_id for token, sparte_id in fallbacks.items() if sparte_id}
+
+    def _matches(self, token: str) -> List[Tuple[str, float]]:
+        """
+        Indexwörter zu einem Suchwort mit Güte: exakt (1.0), sonst Komposita, die mit
+        dem Suchwort beginnen ('kind' -> 'kinderbuch'), bzw. das längste Indexwort, mit
+        dem das Suchwort beginnt ('kriminalroma' -> 'krimi').
+        """
+        if token in self._postings:
+            return [(token, 1.0)]
+        matches = []
+        if len(token) >= MIN_PREFIX:
+            start = bisect.bisect_left(self._tokens, token)
+            for candidate in self._tokens[start:]:
+                if not candidate.startswith(token):
+                    break
+                matches.append((candidate, 0.8 * len(token) / len(candidate)))
+            for length in range(len(token) - 1, MIN_PREFIX - 1, -1):
+                prefix = token[:length]
+                if prefix in self._postings:
+                    matches.append((prefix, 0.8 * length / len(token)))
+                    break
+        return matches
+
+    @staticmethod
+    def _query_tokens(text: Optional[str]) -> List[str]:
+        tokens = []
+        for token in _TOKEN_SPLIT.split(fold(text)):
+            for expanded in tokenize(SYNONYMS.get(token, token)):
+                if expanded not in tokens:
+                    tokens.append(expanded)
+        return tokens
+
+    def suggest(self, genre: Optional[str], title: Optional[str] = None,
+                language: Optional[str] = None, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Bewertete Sparten-Vorschläge [(Sparten-Nr., Punkte)] aus Genre und Titel,
+        beste zuerst. Titelwörter zählen schwächer als das Genre.
+        """
+        scores: Dict[str, float] = {}
+        matched: Dict[str, Set[str]] = {}
+        seen: Set[str] = set()
+        for weight, text in ((1.0, genre), (0.3, title)):
+            for token in self._query_tokens(text):
+                for index_token, quality in self._matches(token):
+                    if index_token in seen:
+                        continue
+                    seen.add(index_token)
+                    idf = self._idf[index_token]
+                    for sparte_id, posting_weight in self._postings[index_token].items():
+                        scores[sparte_id] = scores.get(sparte_id, 0.0) + weight * quality * posting_weight * idf
+                        if posting_weight == 1.0:
+                            matched.setdefault(sparte_id, set()).add(index_token)
+
+        group = _language_group(language)
+        results = []
+        for sparte_id, score in scores.items():
+            groups = self._groups[sparte_id]
+            if groups and group not in groups:
+                continue  # Fremdsprachige Sparte für ein Buch in anderer Sprache
+            if group and group not in groups:
+                score *= 0.5
+            # Spezielle Sparten mit nicht passenden Namensbestandteilen abwerten
+            unmatched = max(self._name_tokens[sparte_id] - len(matched.get(sparte_id, ())), 0)
+            results.append((sparte_id, round(score / (1 + 0.3 * unmatched), 3)))
+        # Bei Gleichstand allgemeine Sparten und kürzere Bezeichnungen bevorzugen
+        results.sort(key=lambda item: (-item[1], item[0] not in self._generic,
+                                       len(self.sparten[item[0]].name), item[0]))
+        return results[:limit]
+
+    def best_match(self, genre: Optional[str], title: Optional[str] = None,
+                   language: Optional[str] = None) -> Optional[str]:
+        suggestions = self.suggest(genre, title, language, limit=1)
+        return suggestions[0][0] if suggestions else None
+
+
+_index: Optional[SpartenIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_sparten_index() -> SpartenIndex:
+    """
+    Prozessweiter Sparten-Index (Pfad über BOOKLOOKER_SPARTEN_FILE änderbar).
+    Fehlt die Vorlage, ist der Index leer und jede Sparte ungültig.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = os.getenv('BOOKLOOKER_SPARTEN_FILE', DEFAULT_PATH)
+                try:
+                    _index = SpartenIndex.from_file(path)
+                    logging.info(f"Booklooker-Sparten geladen: {len(_index)} Sparten aus {path}")
+                except OSError as e:
+                    logging.error(f"Booklooker-Sparten konnten nicht geladen werden: {str(e)}")
+                    _index = SpartenIndex([])
+    return _index
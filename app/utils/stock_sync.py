@@ -0,0 +1,431 @@
+"""
+Marktplatzübergreifender Bestandsabgleich für Einzelexemplare.
+
+Verkäufe werden je Marktplatz inkrementell abgefragt (Cursor im JobCheckpoint
+'stock_sync') und als SaleEvent an den Handler übergeben. Dieser markiert das Buch
+als verkauft und beendet sofort die Angebote auf allen anderen Marktplätzen. Jeder
+Verkauf wird als StockSyncEvent mit der Verzögerung vom Verkauf bis zum Beenden
+gespeichert; fehlgeschlagene Beendigungen werden beim nächsten Lauf wiederholt.
+
+Lokale Stellvertreter beider Clients für Prüfläufe: benchmarks/bench_stock_sync.py.
+"""
+import logging
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Book, JobCheckpoint, StockSyncEvent, BOOKLOOKER_LISTED_STATUSES
+from app.utils.single_flight import try_advisory_lock
+
+
+@dataclass
+class SaleEvent:
+    marketplace: str
+    sale_ref: str
+    book_id: Optional[int]
+    sold_at: datetime
+    detected_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def _parse_ebay_time(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+class Marketplace(ABC):
+    """Basisklasse: Verkäufe abfragen, Angebote beenden und den lokalen Status pflegen."""
+
+    name = ''
+
+    @abstractmethod
+    def poll_sales(self, cursor: Optional[str]) -> Tuple[List[SaleEvent], str]:
+        """Verkäufe seit dem Cursor und der neue Cursor."""
+
+    @abstractmethod
+    def is_listed(self, book: Book) -> bool:
+        """Ob das Buch auf diesem Marktplatz noch angeboten wird."""
+
+    @abstractmethod
+    def end_listing(self, book: Book) -> Dict[str, Any]:
+        """Beendet das Angebot; Ergebnis mit 'success' und 'message'."""
+
+    @abstractmethod
+    def mark_sold(self, book: Book):
+        """Vermerkt den Verkauf auf diesem Marktplatz am Buch."""
+
+    @abstractmethod
+    def mark_ended(self, book: Book):
+        """Vermerkt das beendete Angebot am Buch."""
+
+
+class EbayMarketplace(Marketplace):
+    """Verkäufe über GetSellerTransactions (ModTime-Fenster), Beenden mit EndFixedPriceItem."""
+
+    name = 'ebay'
+    # GetSellerTransactions erlaubt höchstens 30 Tage Rückblick
+    MAX_LOOKBACK = timedelta(days=29)
+
+    def __init__(self, api=None, overlap: timedelta = timedelta(minutes=2),
+                 initial_lookback: timedelta = timedelta(days=1)):
+        if api is None:
+            from app.ebay_api import EbayAPI
+            api = EbayAPI()
+        self.api = api
+        self.overlap = overlap
+        self.initial_lookback = initial_lookback
+
+    def poll_sales(self, cursor):
+        now = datetime.utcnow()
+        start = datetime.fromisoformat(cursor) - self.overlap if cursor else now - self.initial_lookback
+        start = max(start, now - self.MAX_LOOKBACK)
+
+        transactions = []
+        page = 1
+        while True:
+            data = self.api.get_seller_transactions(start, now, page=page)
+            page_transactions = (data.get('TransactionArray') or {}).get('Transaction') or []
+            if isinstance(page_transactions, dict):
+                page_transactions = [page_transactions]
+            transactions.extend(page_transactions)
+            total_pages = int((data.get('PaginationResult') or {}).get('TotalNumberOfPages') or 0)
+            if page >= total_pages and str(data.get('HasMoreTransactions', 'false')).lower() != 'true':
+                break
+            page += 1
+
+        item_ids = {str((t.get('Item') or {}).get('ItemID')) for t in transactions}
+        books = dict(db.session.query(Book.ebay_listing_id, Book.id)
+                     .filter(Book.ebay_listing_id.in_(item_ids))) if item_ids else {}
+        events = []
+        for transaction in transactions:
+            item_id = str((transaction.get('Item') or {}).get('ItemID'))
+            events.append(SaleEvent(
+                marketplace=self.name,
+                sale_ref=f"{item_id}-{transaction.get('TransactionID', '')}",
+                book_id=books.get(item_id),
+                sold_at=_parse_ebay_time(transaction.get('CreatedDate')) or now
+            ))
+        return events, now.isoformat()
+
+    def is_listed(self, book):
+        return bool(book.ebay_listing_id) and book.ebay_listing_status == 'active'
+
+    def end_listing(self, book):
+        return self.api.end_listing(book.ebay_listing_id)
+
+    def mark_sold(self, book):
+        book.ebay_listing_status = 'sold'
+        book.ebay_last_sync = datetime.utcnow()
+
+    def mark_ended(self, book):
+        book.ebay_listing_status = 'ended'
+        book.ebay_last_sync = datetime.utcnow()
+
+
+class BooklookerMarketplace(Marketplace):
+    """Verkäufe über die Bestellabfrage (tagesgenau, mit Überlappung), Entfernen über /article."""
+
+    name = 'booklooker'
+
+    def __init__(self, api=None, tz: Optional[str] = None):
+        if api is None:
+            from app.booklooker_api import get_booklooker_api
+            api = get_booklooker_api()
+        self.api = api
+        # Booklooker liefert Bestellzeiten in deutscher Ortszeit
+        self.tz = ZoneInfo(tz or os.getenv('BOOKLOOKER_TIMEZONE', 'Europe/Berlin'))
+
+    def _local(self, value: datetime) -> datetime:
+        """UTC-Zeitpunkt (naiv) in Booklooker-Ortszeit."""
+        return value.replace(tzinfo=timezone.utc).astimezone(self.tz)
+
+    def _sold_at(self, value: Any, default: datetime) -> datetime:
+        try:
+            local = datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return default
+        return local.replace(tzinfo=self.tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def poll_sales(self, cursor):
+        now = datetime.utcnow()
+        since = datetime.fromisoformat(cursor) if cursor else now
+        # Die Bestellabfrage ist tagesgenau in Booklooker-Ortszeit; ein Tag Überlappung
+        # deckt Tagesgrenzen ab, Dubletten filtert der Handler
+        items = self.api.get_orders(self._local(since - timedelta(days=1)), self._local(now))
+        events = [
+            SaleEvent(
+                marketplace=self.name,
+                sale_ref=f"{item['order_id']}-{item['order_no']}",
+                book_id=int(item['order_no']) if item['order_no'].isdigit() else None,
+                sold_at=self._sold_at(item.get('order_date'), now)
+            )
+            for item in items
+        ]
+        return events, now.isoformat()
+
+    def is_listed(self, book):
+        return book.booklooker_status in BOOKLOOKER_LISTED_STATUSES
+
+    def end_listing(self, book):
+        return self.api.remove_article(book.id)
+
+    def mark_sold(self, book):
+        book.booklooker_status = 'sold'
+        book.booklooker_last_sync = datetime.utcnow()
+
+    def mark_ended(self, book):
+        book.booklooker_status = 'removed'
+        book.booklooker_listing_error = None
+        book.booklooker_last_sync = datetime.utcnow()
+
+
+class StockSyncService:
+    """Fragt alle Marktplätze ab und gibt Verkäufe an die jeweils anderen weiter."""
+
+    CHECKPOINT_NAME = 'stock_sync'
+    # Advisory-Lock, damit nur ein Prozess gleichzeitig abfragt und weitergibt
+    LOCK_KEY = 'job:stock_sync'
+    RETRY_LIMIT = 100
+
+    def __init__(self, marketplaces: Optional[List[Marketplace]] = None,
+                 target: Optional[timedelta] = None):
+        self.marketplaces = marketplaces if marketplaces is not None else default_marketplaces()
+        self.target = target or timedelta(seconds=int(os.getenv('STOCK_SYNC_TARGET_SECONDS', 120)))
+
+    def run_once(self) -> Dict[str, Any]:
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        state = dict(checkpoint.state or {})
+        cursors = dict(state.get('cursors') or {})
+        stats = {
+            'started_at': datetime.utcnow().isoformat(),
+            'sales': 0,
+            'duplicates': 0,
+            'propagated': 0,
+            'failed': 0,
+            'retried': 0,
+            'errors': {}
+        }
+
+        self._retry_pending(stats)
+        for marketplace in self.marketplaces:
+            try:
+                events, cursor = marketplace.poll_sales(cursors.get(marketplace.name))
+            except Exception as e:
+                logging.error(f"Verkäufe von {marketplace.name} nicht abrufbar: {str(e)}")
+                db.session.rollback()
+                stats['errors'][marketplace.name] = str(e)
+                continue
+            for event in events:
+                self.handle(event, stats)
+            cursors[marketplace.name] = cursor
+
+        stats['finished_at'] = datetime.utcnow().isoformat()
+        checkpoint = JobCheckpoint.load(self.CHECKPOINT_NAME)
+        state['cursors'] = cursors
+        state['last_run'] = stats
+        checkpoint.state = state
+        db.session.commit()
+        return stats
+
+    def handle(self, event: SaleEvent, stats: Dict[str, Any]) -> Optional[StockSyncEvent]:
+        """Verarbeitet einen Verkauf genau einmal und beendet die übrigen Angebote."""
+        if StockSyncEvent.query.filter_by(marketplace=event.marketplace, sale_ref=event.sale_ref).first():
+            stats['duplicates'] += 1
+            return None
+        record = StockSyncEvent(
+            book_id=event.book_id,
+            marketplace=event.marketplace,
+            sale_ref=event.sale_ref,
+            sold_at=event.sold_at,
+            detected_at=event.detected_at
+        )
+        # Hat ein anderer Prozess denselben Verkauf gerade eingetragen, nur diesen überspringen
+        try:
+            with db.session.begin_nested():
+                db.session.add(record)
+        except IntegrityError:
+            stats['duplicates'] += 1
+            return None
+        stats['sales'] += 1
+        book = db.session.get(Book, event.book_id) if event.book_id else None
+        if book is None:
+            record.error = 'Kein Buch zum Verkauf gefunden'
+            db.session.commit()
+            return record
+
+        source = self._marketplace(event.marketplace)
+        if source is not None:
+            source.mark_sold(book)
+        book.status = 'sold'
+        self._propagate(record, book, stats)
+        return record
+
+    def _propagate(self, record: StockSyncEvent, book: Book, stats: Dict[str, Any]):
+        ended = dict(record.ended or {})
+        errors = []
+        for marketplace in self.marketplaces:
+            if marketplace.name == record.marketplace or not marketplace.is_listed(book):
+                continue
+            try:
+                result = marketplace.end_listing(book)
+            except Exception as e:
+                result = {'success': False, 'message': str(e)}
+            ended[marketplace.name] = result.get('message')
+            if result.get('success'):
+                marketplace.mark_ended(book)
+            else:
+                errors.append(f"{marketplace.name}: {result.get('message')}")
+
+        record.ended = ended
+        if errors:
+            record.error = '; '.join(errors)
+            stats['failed'] += 1
+            logging.error(f"Buch {book.id} nach Verkauf bei {record.marketplace} noch gelistet: {record.error}")
+        else:
+            record.error = None
+            record.propagated_at = datetime.utcnow()
+            record.delay_seconds = (record.propagated_at - record.sold_at).total_seconds()
+            stats['propagated'] += 1
+            if record.delay_seconds > self.target.total_seconds():
+                logging.warning(f"Bestandsabgleich für Buch {book.id} nach {record.delay_seconds:.0f}s "
+                                f"(Ziel {self.target.total_seconds():.0f}s)")
+        db.session.commit()
+
+    def _retry_pending(self, stats: Dict[str, Any]):
+        pending = (StockSyncEvent.query
+                   .filter(StockSyncEvent.propagated_at.is_(None), StockSyncEvent.book_id.isnot(None))
+                   .order_by(StockSyncEvent.id)
+                   .limit(self.RETRY_LIMIT)
+                   .all())
+        for record in pending:
+            book = db.session.get(Book, record.book_id)
+            if book is None:
+                continue
+            stats['retried'] += 1
+            self._propagate(record, book, stats)
+
+    def _marketplace(self, name: str) -> Optional[Marketplace]:
+        return next((m for m in self.marketplaces if m.name == name), None)
+
+
+def default_marketplaces() -> List[Marketplace]:
+    """Alle konfigurierten Marktplätze."""
+    marketplaces: List[Marketplace] = []
+    if os.getenv('EBAY_TOKEN'):
+        marketplaces.append(EbayMarketplace())
+    if os.getenv('BOOKLOOKER_API_KEY'):
+        marketplaces.append(BooklookerMarketplace())
+    return marketplaces
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+
+def propagation_stats(since: timedelta = timedelta(days=7),
+                      target: Optional[timedelta] = None) -> Dict[str, Any]:
+    """Verzögerung vom Verkauf bis zum Beenden der übrigen Angebote im Zeitraum."""
+    target = target or timedelta(seconds=int(os.getenv('STOCK_SYNC_TARGET_SECONDS', 120)))
+    cutoff = datetime.utcnow() - since
+    delays = sorted(delay for delay, in db.session.query(StockSyncEvent.delay_seconds)
+                    .filter(StockSyncEvent.propagated_at >= cutoff))
+    pending = (StockSyncEvent.query
+               .filter(StockSyncEvent.propagated_at.is_(None), StockSyncEvent.book_id.isnot(None),
+                       StockSyncEvent.detected_at >= cutoff)
+               .count())
+    stats = {'count': len(delays), 'pending': pending, 'target_seconds': target.total_seconds()}
+    if delays:
+        stats.update({
+            'p50_seconds': round(_percentile(delays, 0.5), 1),
+            'p95_seconds': round(_percentile(delays, 0.95), 1),
+            'max_seconds': round(delays[-1], 1),
+            'over_target': sum(1 for delay in delays if delay > target.total_seconds())
+        })
+    return stats
+
+
+class StockSyncWorker:
+    """
+    Fragt die Marktplätze periodisch nach Verkäufen ab (Intervall STOCK_SYNC_INTERVAL
+    in Sekunden; für das Ziel von zwei Minuten höchstens 60). Laufen mehrere Prozesse,
+    überspringt ein Prozess den Lauf, wenn ein anderer ihn innerhalb des Intervalls
+    erledigt hat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.interval = 0
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def init_app(self, app):
+        """Startet den Worker, sofern ein Intervall und mindestens zwei Marktplätze konfiguriert sind."""
+        self.interval = int(app.config.get('STOCK_SYNC_INTERVAL') or os.getenv('STOCK_SYNC_INTERVAL', 0))
+        if self.interval <= 0 or app.testing:
+            return
+        if not (os.getenv('EBAY_TOKEN') and os.getenv('BOOKLOOKER_API_KEY')):
+            return
+        self.start(app)
+
+    def start(self, app) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, args=(app,), name='stock-sync', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logging.error(f"Bestandsabgleich fehlgeschlagen: {str(e)}")
+                    self.last_error = str(e)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Ein Lauf, sofern nicht ein anderer Prozess ihn gerade ausführt oder erledigt hat."""
+        with try_advisory_lock(StockSyncService.LOCK_KEY) as acquired:
+            if not acquired:
+                return None
+            checkpoint = JobCheckpoint.load(StockSyncService.CHECKPOINT_NAME)
+            last_run = ((checkpoint.state or {}).get('last_run') or {}).get('finished_at')
+            if last_run and datetime.fromisoformat(last_run) > datetime.utcnow() - timedelta(seconds=self.interval * 0.9):
+                db.session.rollback()
+                return None
+            stats = StockSyncService().run_once()
+        self.last_stats = stats
+        self.last_error = None
+        return stats
+
+
+stock_sync_worker = StockSyncWorker()
+
@@ -0,0 +1,100 @@
+"""
+Micro-Benchmark der Booklooker-Importdateien.
+
+Vergleicht das frühere Vorgehen (Temporärdatei schreiben, flush/fsync, zum
+Protokollieren erneut lesen und für den Upload ein weiteres Mal öffnen) mit der
+Erzeugung im Speicher (iter_import_files) für 1, 100 und 10.000 Zeilen.
+Benötigt weder Netzwerk noch Datenbank.
+
+    python -m benchmarks.bench_booklooker_tsv --repeat 5
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+from app.booklooker_api import BooklookerAPI
+
+SIZES = (1, 100, 10_000)
+
+
+def build_books(count):
+    """Synthetische Bücher mit den Attributen, die der Export liest."""
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            title=f'Titel {i}',
+            author='Mustermann, Max',
+            publisher='Verlag',
+            edition='2. Auflage',
+            publication_year=1990 + i % 30,
+            condition='Good',
+            description='**Zustand:** Gut erhalten, leichte Gebrauchsspuren. ' * 4,
+            isbn=f'978{i:010d}',
+            weight=400,
+            price=5.0 + i % 20,
+            format='Hardcover'
+        )
+        for i in range(count)
+    ]
+
+
+def export_tempfile(api, books, tmp_root=None):
+    """Früheres Vorgehen: Temporärdatei mit fsync, erneutes Lesen für Log und Upload."""
+    tmp_dir = tempfile.mkdtemp(dir=tmp_root)
+    try:
+        path = os.path.join(tmp_dir, 'booklooker.txt')
+        with open(path, 'w', encoding='utf-8', newline='') as tmp_file:
+            writer = csv.writer(tmp_file, delimiter='\t', quoting=csv.QUOTE_MINIMAL, quotechar='"')
+            for book in books:
+                # Validierung wie beim Upload, damit beide Varianten dieselbe Arbeit leisten
+                api.validate_book_data(book, validate_price=False)
+                writer.writerow(api._book_to_row(book))
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        with open(path, 'r', encoding='utf-8') as log_file:
+            log_file.read()
+        with open(path, 'rb') as upload_file:
+            return len(upload_file.read())
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def export_in_memory(api, books, tmp_root=None):
+    errors = {}
+    return sum(import_file['size'] for import_file in api.iter_import_files(books, errors, validate_price=False))
+
+
+MODES = {
+    'tempfile+fsync': export_tempfile,
+    'in-memory': export_in_memory,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5, help='Wiederholungen pro Messung (Median)')
+    parser.add_argument('--tmpdir', default=None,
+                        help='Verzeichnis für Temporärdateien (fsync auf tmpfs ist kaum messbar)')
+    args = parser.parse_args()
+
+    api = BooklookerAPI()
+    for size in SIZES:
+        books = build_books(size)
+        for mode, export in MODES.items():
+            durations = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                total = export(api, books, args.tmpdir)
+                durations.append(time.perf_counter() - start)
+            durations.sort()
+            median = durations[len(durations) // 2]
+            print(f"{size:>6} Zeilen  {mode:<15} {median * 1000:9.2f}ms  "
+                  f"({size / median:,.0f} Zeilen/s, {total} Bytes)")
+
+
+if __name__ == '__main__':
+    main()
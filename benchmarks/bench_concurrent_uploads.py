@@ -0,0 +1,112 @@
+"""
+Benchmark gleichzeitiger Uploads gegen simulierte Backends.
+
+Jeder Upload ruft eine simulierte Gemini-Analyse (blockierend, feste Latenz) und
+die Marktdatenerhebung über Fixture-Quellen (asynchron, feste Latenz) auf. Die
+Uploads laufen in einem Thread-Pool wie unter gunicorn gthread. Verglichen werden:
+
+  per-request-loop  neuer Event-Loop und neue HTTP-Session pro Upload (asyncio.run)
+  shared-loop       gemeinsamer Hintergrund-Loop (async_runtime), Gemini im Request-Thread
+  shared-inline     gemeinsamer Loop, Gemini blockierend innerhalb der Coroutine (Anti-Muster)
+
+    python -m benchmarks.bench_concurrent_uploads --uploads 200 --threads 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.market_sources import DEFAULT_SOURCES, FixtureMarketSource, register_adapter
+from app.controllers.price_analysis_controller import PriceAnalysisController
+from app.utils.async_runtime import async_runtime
+from app.utils.cache_manager import CacheManager
+from app.utils.http_session import close_client_session
+from benchmarks.bench_market_sources import build_fixtures
+
+
+def fake_gemini(latency):
+    """Simulierte Bildanalyse: blockiert wie der synchrone Gemini-Client."""
+    time.sleep(latency)
+
+
+def upload_per_request_loop(controller, query, gemini_latency):
+    fake_gemini(gemini_latency)
+
+    async def _collect():
+        try:
+            return await controller.collect_market_data_batch([query], force_refresh=True)
+        finally:
+            await close_client_session()
+
+    return asyncio.run(_collect())
+
+
+def upload_shared_loop(controller, query, gemini_latency):
+    fake_gemini(gemini_latency)
+    return async_runtime.run(controller.collect_market_data_batch([query], force_refresh=True))
+
+
+def upload_shared_inline(controller, query, gemini_latency):
+    async def _upload():
+        fake_gemini(gemini_latency)
+        return await controller.collect_market_data_batch([query], force_refresh=True)
+
+    return async_runtime.run(_upload())
+
+
+MODES = {
+    'per-request-loop': upload_per_request_loop,
+    'shared-loop': upload_shared_loop,
+    'shared-inline': upload_shared_inline,
+}
+
+
+def run(mode, queries, threads, gemini_latency, controller):
+    upload = MODES[mode]
+    durations = []
+
+    def _timed(query):
+        start = time.perf_counter()
+        upload(controller, query, gemini_latency)
+        durations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(_timed, queries))
+    elapsed = time.perf_counter() - start
+    durations.sort()
+    return elapsed, statistics.median(durations), durations[int(len(durations) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--uploads', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Anzahl Request-Threads (entspricht GUNICORN_THREADS)')
+    parser.add_argument('--gemini-latency', type=float, default=0.2,
+                        help='Simulierte Dauer der Bildanalyse in Sekunden')
+    parser.add_argument('--market-latency', type=float, default=0.05,
+                        help='Simulierte Antwortzeit pro Marktquelle in Sekunden')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        queries = build_fixtures(directory, args.uploads)
+        for name in DEFAULT_SOURCES:
+            register_adapter(FixtureMarketSource(name, os.path.join(directory, f'{name}.json'),
+                                                 latency=args.market_latency))
+        controller = PriceAnalysisController(
+            cache_manager=CacheManager(os.path.join(directory, 'cache')),
+            market_deadline=3600
+        )
+        for mode in MODES:
+            elapsed, p50, p95 = run(mode, queries, args.threads, args.gemini_latency, controller)
+            print(f"{mode:<17} {len(queries)} Uploads in {elapsed:.2f}s "
+                  f"({len(queries) / elapsed:.1f}/s), p50 {p50 * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms")
+    async_runtime.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark des eBay-Sammel-Listings gegen einen lokalen Trading-Endpunkt.
+
+Startet einen simulierten Trading-Server (AddFixedPriceItem mit fester Latenz,
+GetCategories mit kleinem Kategoriebaum) und stellt synthetische Bücher ein:
+
+  sequential  eine Verbindung, ein Aufruf nach dem anderen (bisher: create_listing je Buch)
+  bulk-N      EbayBulkLister.submit mit N Workern und einer Verbindung pro Worker
+
+Benötigt weder eBay-Zugangsdaten noch Datenbank.
+
+    python -m benchmarks.bench_ebay_bulk_listing --items 200 --latency 0.05
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+
+NAMESPACE = 'urn:ebay:apis:eBLBaseComponents'
+CATEGORIES = (
+    ('267', 'Bücher', '267', 1, False),
+    ('268', 'Antiquarische Bücher', '267', 2, False),
+    ('269', 'Kinder- & Jugendbücher', '268', 3, True),
+    ('270', 'Theater & Bühne', '268', 3, True),
+)
+
+
+class FakeTradingHandler(BaseHTTPRequestHandler):
+    """Beantwortet Trading-API-Aufrufe anhand des Headers X-EBAY-API-CALL-NAME."""
+
+    latency = 0.05
+    fail_every = 0
+    item_ids = itertools.count(110000000000)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        verb = self.headers.get('X-EBAY-API-CALL-NAME', '')
+        if verb == 'GetCategories':
+            body = '<CategoryVersion>1</CategoryVersion><CategoryArray>' + ''.join(
+                f'<Category><CategoryID>{cid}</CategoryID><CategoryName>{escape(name)}</CategoryName>'
+                f'<CategoryParentID>{parent}</CategoryParentID><CategoryLevel>{level}</CategoryLevel>'
+                f'<LeafCategory>{"true" if leaf else "false"}</LeafCategory></Category>'
+                for cid, name, parent, level, leaf in CATEGORIES
+            ) + '</CategoryArray>'
+            ack = 'Success'
+        else:
+            time.sleep(self.latency)
+            item_id = next(self.item_ids)
+            if self.fail_every and item_id % self.fail_every == 0:
+                ack = 'Failure'
+                body = ('<Errors><ShortMessage>Ungültige Angabe</ShortMessage><ErrorCode>37</ErrorCode>'
+                        '<SeverityCode>Error</SeverityCode></Errors>')
+            else:
+                ack = 'Success'
+                body = f'<ItemID>{item_id}</ItemID>'
+        payload = (f'<?xml version="1.0" encoding="UTF-8"?><{verb}Response xmlns="{NAMESPACE}">'
+                   f'<Ack>{ack}</Ack>{body}</{verb}Response>').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_trading(latency=0.05, fail_every=0):
+    """Startet den Server im Hintergrund und richtet EbayAPI per Umgebungsvariablen darauf aus."""
+    FakeTradingHandler.latency = latency
+    FakeTradingHandler.fail_every = fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTradingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['EBAY_TRADING_DOMAIN'] = f'127.0.0.1:{server.server_address[1]}'
+    os.environ['EBAY_TRADING_HTTPS'] = 'false'
+    os.environ.setdefault('EBAY_CATEGORY_CACHE_DIR', tempfile.mkdtemp(prefix='ebay_categories_'))
+    return server
+
+
+def build_books(count):
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            title=f'Märchenbuch {i}',
+            author='Mustermann, Max',
+            description='Kinderbuch mit farbigen Illustrationen',
+            category='Kinderbuch',
+            condition='Gut',
+            publication_year=1925,
+            price=19.90
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='Antwortzeit pro AddFixedPriceItem in Sekunden')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 8, 16])
+    args = parser.parse_args()
+
+    server = start_fake_trading(args.latency)
+    from app.ebay_api import EbayAPI
+    from app.utils.ebay_bulk_lister import EbayBulkLister
+
+    api = EbayAPI()
+    payloads = {book.id: api.build_item_data(book) for book in build_books(args.items)}
+
+    start = time.perf_counter()
+    results = [api.submit_listing(item_data) for item_data in payloads.values()]
+    elapsed = time.perf_counter() - start
+    print(f"{'sequential':<12} {args.items / elapsed:8.1f} Bücher/s  "
+          f"({sum(r['success'] for r in results)} eingestellt)")
+
+    for concurrency in args.concurrency:
+        lister = EbayBulkLister(concurrency=concurrency, calls_per_second=0)
+        start = time.perf_counter()
+        results = lister.submit(payloads)
+        elapsed = time.perf_counter() - start
+        print(f"{'bulk-' + str(concurrency):<12} {args.items / elapsed:8.1f} Bücher/s  "
+              f"({sum(r['success'] for r in results.values())} eingestellt)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Prüfung und Benchmark des eBay-Statusabgleichs gegen einen lokalen Trading-Endpunkt.
+
+Der simulierte Server verhält sich bei den Filtern wie eBay: GetSellerList verlangt
+EndTimeFrom/EndTimeTo (bzw. StartTime*) und filtert nicht nach Änderungszeit,
+GetSellerEvents filtert nach ModTimeFrom/ModTimeTo und liefert höchstens
+MAX_SELLER_EVENTS Angebote. Ablauf:
+
+  full         erster Lauf ohne Checkpoint (GetSellerList nach Endzeit, seitenweise)
+  incremental  nach Änderungen an --changed Angeboten (GetSellerEvents)
+  burst        mehr als MAX_SELLER_EVENTS Änderungen innerhalb einer Minute; erwartet
+               wird der Wechsel auf den vollständigen Abgleich
+
+Anschließend wird der Status jedes Buches mit dem Server verglichen. Benötigt die
+.env des Projekts, aber keine eBay-Zugangsdaten; die Bücher liegen in einer
+temporären SQLite-Datenbank.
+
+    python -m benchmarks.bench_ebay_listing_sync --items 10000 --changed 4000
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_ebay_bulk_listing import NAMESPACE
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+class FakeSellerHandler(BaseHTTPRequestHandler):
+    """Beantwortet GetSellerList und GetSellerEvents aus der Angebotsliste `listings`."""
+
+    listings = {}
+    max_events = 3000
+    calls = {}
+
+    def do_POST(self):
+        request = ET.fromstring(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        verb = self.headers.get('X-EBAY-API-CALL-NAME', '')
+        self.calls[verb] = self.calls.get(verb, 0) + 1
+        fields = {child.tag.split('}')[-1]: child for child in request}
+
+        def timestamp(name):
+            return datetime.strptime(fields[name].text, TIME_FORMAT) if name in fields else None
+
+        ack, body = 'Success', ''
+        if verb == 'GetSellerList':
+            end_from, end_to = timestamp('EndTimeFrom'), timestamp('EndTimeTo')
+            if end_from is None and timestamp('StartTimeFrom') is None:
+                ack = 'Failure'
+                body = ('<Errors><ShortMessage>Start- oder Endzeitfenster fehlt</ShortMessage>'
+                        '<ErrorCode>21</ErrorCode><SeverityCode>Error</SeverityCode></Errors>')
+            else:
+                pagination = {child.tag.split('}')[-1]: int(child.text) for child in fields['Pagination']}
+                per_page, page = pagination['EntriesPerPage'], pagination['PageNumber']
+                matches = [item for item in self.listings.values() if end_from <= item['end_time'] <= end_to]
+                pages = max(1, -(-len(matches) // per_page))
+                body = (self._items(matches[(page - 1) * per_page:page * per_page])
+                        + f'<PaginationResult><TotalNumberOfPages>{pages}</TotalNumberOfPages>'
+                          f'<TotalNumberOfEntries>{len(matches)}</TotalNumberOfEntries></PaginationResult>'
+                        + f'<HasMoreItems>{"true" if page < pages else "false"}</HasMoreItems>')
+        elif verb == 'GetSellerEvents':
+            mod_from, mod_to = timestamp('ModTimeFrom'), timestamp('ModTimeTo')
+            matches = [item for item in self.listings.values() if mod_from <= item['mod_time'] <= mod_to]
+            body = self._items(matches[:self.max_events]) + f'<TimeTo>{fields["ModTimeTo"].text}</TimeTo>'
+        else:
+            ack = 'Failure'
+            body = f'<Errors><ShortMessage>{verb} nicht simuliert</ShortMessage></Errors>'
+
+        payload = (f'<?xml version="1.0" encoding="UTF-8"?><{verb}Response xmlns="{NAMESPACE}">'
+                   f'<Ack>{ack}</Ack>{body}</{verb}Response>').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def _items(items):
+        return '<ItemArray>' + ''.join(
+            f'<Item><ItemID>{item["item_id"]}</ItemID><SellingStatus>'
+            f'<ListingStatus>{item["status"]}</ListingStatus><QuantitySold>{item["sold"]}</QuantitySold>'
+            f'</SellingStatus></Item>'
+            for item in items
+        ) + '</ItemArray>'
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_listings(count, now):
+    """Laufende und in den letzten Wochen beendete Angebote."""
+    listings = {}
+    for i in range(count):
+        active = i % 3 != 0
+        end_time = now + timedelta(days=random.uniform(1, 30)) if active \
+            else now - timedelta(days=random.uniform(1, 60))
+        listings[str(120000000000 + i)] = {
+            'item_id': str(120000000000 + i),
+            'status': 'Active' if active else 'Completed',
+            'sold': 0 if active or i % 2 else 1,
+            'end_time': end_time,
+            'mod_time': now - timedelta(days=random.uniform(1, 90))
+        }
+    return listings
+
+
+def expected_status(item):
+    if item['status'] == 'Active':
+        return 'active'
+    return 'sold' if item['sold'] else 'ended'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--changed', type=int, default=4000, help='Angebote, die vor dem zweiten Lauf verkauft werden')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSellerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['EBAY_TRADING_DOMAIN'] = f'127.0.0.1:{server.server_address[1]}'
+    os.environ['EBAY_TRADING_HTTPS'] = 'false'
+    database = os.path.join(tempfile.mkdtemp(prefix='ebay_sync_'), 'bench.db')
+
+    from app import create_app, db
+    from app.ebay_api import EbayAPI
+    from app.models import Book, JobCheckpoint
+    from app.utils.ebay_listing_sync import EbayListingSync
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        FakeSellerHandler.listings = build_listings(args.items, now)
+        db.session.bulk_insert_mappings(Book, [
+            {'title': f'Buch {item_id}', 'author': 'Mustermann, Max', 'condition': 'Good',
+             'category': 'Books', 'description': 'Benchmark', 'price': 9.9, 'ebay_listing_id': item_id}
+            for item_id in FakeSellerHandler.listings
+        ])
+        db.session.commit()
+        sync = EbayListingSync(api=EbayAPI())
+
+        for label in ('full', 'incremental', 'burst'):
+            if label == 'burst':
+                # Alle Änderungen zur selben Sekunde, damit auch das kleinste Fenster voll bleibt
+                burst_at = datetime.utcnow() - timedelta(seconds=2)
+                active = [item for item in FakeSellerHandler.listings.values() if item['status'] == 'Active']
+                for item in active[:FakeSellerHandler.max_events + 1]:
+                    item.update(status='Completed', sold=1, mod_time=burst_at)
+            if label == 'incremental':
+                # Der erste Lauf liegt eine Stunde zurück; die Verkäufe verteilen sich auf diese
+                # Stunde, damit volle GetSellerEvents-Antworten halbiert werden können
+                changed_at = datetime.utcnow()
+                checkpoint = JobCheckpoint.load(EbayListingSync.CHECKPOINT_NAME)
+                checkpoint.state = {**checkpoint.state, 'mod_time_to': (changed_at - timedelta(hours=1)).isoformat()}
+                db.session.commit()
+                for item in random.sample(list(FakeSellerHandler.listings.values()), args.changed):
+                    item.update(status='Completed', sold=1,
+                                mod_time=changed_at - timedelta(seconds=random.uniform(2, 3600)))
+            FakeSellerHandler.calls.clear()
+            start = time.perf_counter()
+            stats = sync.run()
+            elapsed = time.perf_counter() - start
+
+            local = dict(db.session.query(Book.ebay_listing_id, Book.ebay_listing_status))
+            wrong = sum(1 for item_id, item in FakeSellerHandler.listings.items()
+                        if local.get(item_id) != expected_status(item))
+            print(f"{label:<12} {elapsed:6.2f}s  {stats['items']:6} Angebote  {stats['mode']:<6}  "
+                  f"{FakeSellerHandler.calls}  {'OK' if not wrong else f'{wrong} abweichende Status'}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
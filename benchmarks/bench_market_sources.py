@@ -0,0 +1,78 @@
+"""
+Benchmark der Preis-Pipeline mit Offline-Fixture-Quellen.
+
+Vergleicht Einzelabfragen (ein Upstream-Request pro Titel) mit gebündelten
+ISBN-Abfragen für eine größere Menge Bücher. Benötigt kein Netzwerk.
+
+    python -m benchmarks.bench_market_sources --books 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app.market_sources import DEFAULT_SOURCES, FixtureMarketSource, register_adapter
+from app.controllers.price_analysis_controller import PriceAnalysisController
+from app.utils.book_keys import MarketQuery
+from app.utils.cache_manager import CacheManager
+from app.utils.http_session import close_client_session
+
+
+def build_fixtures(directory, count):
+    """Erzeugt synthetische Fixture-Dateien mit `count` Titeln pro Quelle."""
+    queries = []
+    offers = {}
+    for i in range(count):
+        query = MarketQuery(isbn=f"978{i:010d}", condition='Good')
+        queries.append(query)
+        offers[query.item_key] = [
+            {'price': 5.0 + (i + j) % 20, 'currency': 'EUR', 'condition': 'Gut'}
+            for j in range(5)
+        ]
+    for name in DEFAULT_SOURCES:
+        with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as f:
+            json.dump(offers, f)
+    return queries
+
+
+async def run(queries, directory, latency, batch_size):
+    adapters = []
+    for name in DEFAULT_SOURCES:
+        adapter = FixtureMarketSource(name, os.path.join(directory, f'{name}.json'),
+                                      latency=latency, max_batch_size=batch_size)
+        register_adapter(adapter)
+        adapters.append(adapter)
+
+    controller = PriceAnalysisController(
+        cache_manager=CacheManager(os.path.join(directory, 'cache')),
+        market_deadline=3600
+    )
+    start = time.perf_counter()
+    try:
+        results = await controller.collect_market_data_batch(queries, force_refresh=True)
+    finally:
+        await close_client_session()
+    elapsed = time.perf_counter() - start
+    requests = sum(adapter.request_count for adapter in adapters)
+    return elapsed, requests, len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulierte Antwortzeit pro Upstream-Request in Sekunden')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        queries = build_fixtures(directory, args.books)
+        for batch_size in (1, 50):
+            elapsed, requests, count = asyncio.run(run(queries, directory, args.latency, batch_size))
+            print(f"Batch-Größe {batch_size:>3}: {count} Bücher in {elapsed:.2f}s "
+                  f"({count / elapsed * 60:.0f} Bücher/min), {requests} Upstream-Requests")
+
+
+if __name__ == '__main__':
+    main()
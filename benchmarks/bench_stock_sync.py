@@ -0,0 +1,167 @@
+"""
+Prüfung und Benchmark des marktplatzübergreifenden Bestandsabgleichs (app.utils.stock_sync)
+gegen lokale Stellvertreter der eBay- und Booklooker-Clients.
+
+Alle Bücher sind auf beiden Marktplätzen gelistet. Ein Teil wird bei eBay, ein Teil
+bei Booklooker verkauft; danach läuft StockSyncService zweimal:
+
+  first   erkennt die Verkäufe und beendet die Angebote auf dem jeweils anderen Marktplatz
+  second  dieselben Verkäufe erneut im Überlappungsfenster, es darf nichts doppelt passieren
+
+Geprüft wird, dass jedes verkaufte Buch auf dem anderen Marktplatz beendet, als
+verkauft markiert und innerhalb des Ziels (STOCK_SYNC_TARGET_SECONDS) weitergegeben
+wurde. Benötigt die .env des Projekts, aber keine Zugangsdaten; die Bücher liegen in
+einer temporären SQLite-Datenbank.
+
+    python -m benchmarks.bench_stock_sync --books 2000 --sales 300
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+
+class LocalEbayClient:
+    """
+    Stellvertreter für EbayAPI mit den vom Bestandsabgleich genutzten Aufrufen.
+    Verkäufe werden mit sell() angelegt; beendete Angebote stehen in `ended`.
+    """
+
+    def __init__(self, page_size: int = 200):
+        self.page_size = page_size
+        self.transactions: List[Dict[str, Any]] = []
+        self.ended: Dict[str, datetime] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def sell(self, item_id: str, sold_at: Optional[datetime] = None):
+        sold_at = sold_at or datetime.utcnow()
+        with self._lock:
+            self.transactions.append({
+                'Item': {'ItemID': str(item_id)},
+                'TransactionID': str(next(self._ids)),
+                'CreatedDate': sold_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                '_modified': sold_at
+            })
+
+    def get_seller_transactions(self, mod_time_from, mod_time_to, page=1, entries_per_page=200):
+        with self._lock:
+            matching = [t for t in self.transactions if mod_time_from <= t['_modified'] <= mod_time_to]
+        entries_per_page = min(entries_per_page, self.page_size)
+        chunk = matching[(page - 1) * entries_per_page:page * entries_per_page]
+        pages = max(1, math.ceil(len(matching) / entries_per_page))
+        return {
+            'TransactionArray': {'Transaction': [{k: v for k, v in t.items() if k != '_modified'} for t in chunk]},
+            'PaginationResult': {'TotalNumberOfPages': str(pages)},
+            'HasMoreTransactions': 'true' if page < pages else 'false'
+        }
+
+    def end_listing(self, item_id, reason='NotAvailable'):
+        with self._lock:
+            already = item_id in self.ended
+            self.ended.setdefault(item_id, datetime.utcnow())
+        return {'success': True, 'message': 'Angebot war bereits beendet' if already else 'Angebot beendet'}
+
+
+class LocalBooklookerClient:
+    """
+    Stellvertreter für BooklookerAPI mit den vom Bestandsabgleich genutzten Aufrufen.
+    Bestellzeiten werden wie bei Booklooker in deutscher Ortszeit geliefert.
+    """
+
+    def __init__(self, tz: str = 'Europe/Berlin'):
+        self.tz = ZoneInfo(tz)
+        self.orders: List[Dict[str, Any]] = []
+        self.removed: Dict[str, datetime] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def sell(self, order_no, sold_at: Optional[datetime] = None):
+        sold_at = (sold_at or datetime.utcnow()).replace(tzinfo=timezone.utc).astimezone(self.tz)
+        with self._lock:
+            self.orders.append({
+                'order_no': str(order_no),
+                'order_id': str(next(self._ids)),
+                'order_date': sold_at.strftime('%Y-%m-%d %H:%M:%S')
+            })
+
+    def get_orders(self, date_from, date_to):
+        first, last = date_from.strftime('%Y-%m-%d'), date_to.strftime('%Y-%m-%d')
+        with self._lock:
+            return [dict(order) for order in self.orders if first <= order['order_date'][:10] <= last]
+
+    def remove_article(self, order_no):
+        with self._lock:
+            self.removed.setdefault(str(order_no), datetime.utcnow())
+        return {'success': True, 'message': 'Artikel bei Booklooker entfernt'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--sales', type=int, default=300, help='Verkäufe je Marktplatz')
+    args = parser.parse_args()
+    database = os.path.join(tempfile.mkdtemp(prefix='stock_sync_'), 'bench.db')
+
+    from app import create_app, db
+    from app.models import Book
+    from app.utils.stock_sync import (BooklookerMarketplace, EbayMarketplace, StockSyncService,
+                                      propagation_stats)
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(Book, [
+            {'id': i, 'title': f'Buch {i}', 'author': 'Mustermann, Max', 'condition': 'Good',
+             'category': 'Books', 'description': 'Benchmark', 'price': 9.9,
+             'ebay_listing_id': str(130000000000 + i), 'ebay_listing_status': 'active',
+             'booklooker_status': 'active'}
+            for i in range(1, args.books + 1)
+        ])
+        db.session.commit()
+
+        ebay, booklooker = LocalEbayClient(), LocalBooklookerClient()
+        sold = random.sample(range(1, args.books + 1), 2 * args.sales)
+        sold_on_ebay, sold_on_booklooker = sold[:args.sales], sold[args.sales:]
+        for book_id in sold_on_ebay:
+            ebay.sell(130000000000 + book_id)
+        for book_id in sold_on_booklooker:
+            booklooker.sell(book_id)
+
+        service = StockSyncService(marketplaces=[EbayMarketplace(api=ebay), BooklookerMarketplace(api=booklooker)])
+        for label in ('first', 'second'):
+            start = time.perf_counter()
+            stats = service.run_once()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<8} {elapsed:6.2f}s  {stats['sales']:5} Verkäufe  {stats['duplicates']:5} doppelt  "
+                  f"{stats['propagated']:5} weitergegeben  {stats['failed']} fehlgeschlagen  {stats['errors'] or ''}")
+
+        books = {book.id: book for book in Book.query.filter(Book.id.in_(sold))}
+        problems = []
+        for book_id in sold_on_ebay:
+            if str(book_id) not in booklooker.removed or books[book_id].booklooker_status != 'removed':
+                problems.append(f"Buch {book_id}: bei Booklooker noch gelistet")
+        for book_id in sold_on_booklooker:
+            if str(130000000000 + book_id) not in ebay.ended or books[book_id].ebay_listing_status != 'ended':
+                problems.append(f"Buch {book_id}: bei eBay noch gelistet")
+        problems += [f"Buch {book_id}: nicht als verkauft markiert" for book_id, book in books.items()
+                     if book.status != 'sold']
+        if len(ebay.ended) + len(booklooker.removed) != len(sold):
+            problems.append(f"{len(ebay.ended) + len(booklooker.removed)} Angebote beendet, erwartet {len(sold)}")
+
+        delays = propagation_stats()
+        print(f"Verzögerung: p50 {delays.get('p50_seconds')}s, p95 {delays.get('p95_seconds')}s, "
+              f"max {delays.get('max_seconds')}s, {delays.get('over_target', 0)} über dem Ziel "
+              f"von {delays['target_seconds']:.0f}s")
+        print('OK' if not problems else '\n'.join(problems[:20]))
+
+
+if __name__ == '__main__':
+    main()
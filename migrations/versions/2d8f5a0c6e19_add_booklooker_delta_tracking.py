@@ -0,0 +1,33 @@
+"""Add booklooker delta tracking
+
+Revision ID: 2d8f5a0c6e19
+Revises: 9c3e6a1f4b72
+Create Date: 2026-10-19 16:48:13.559021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8f5a0c6e19'
+down_revision = '9c3e6a1f4b72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('booklooker_dirty_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_book_booklooker_dirty_at', 'book', ['booklooker_dirty_at'])
+    op.create_table('booklooker_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('booklooker_tombstone')
+    op.drop_index('ix_book_booklooker_dirty_at', table_name='book')
+    op.drop_column('book', 'booklooker_dirty_at')
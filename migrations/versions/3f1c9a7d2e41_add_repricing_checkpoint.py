@@ -0,0 +1,36 @@
+"""Add market snapshot timestamp and job checkpoints
+
+Revision ID: 3f1c9a7d2e41
+Revises: b6e602ed21d8
+Create Date: 2026-10-19 09:12:04.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2e41'
+down_revision = 'b6e602ed21d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('market_snapshot_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_book_market_snapshot_at', 'book', ['market_snapshot_at'])
+
+    op.create_table(
+        'job_checkpoint',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('state', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('job_checkpoint')
+    op.drop_index('ix_book_market_snapshot_at', table_name='book')
+    op.drop_column('book', 'market_snapshot_at')
@@ -0,0 +1,24 @@
+"""Add ebay listed price
+
+Revision ID: 4c8d1e6b9f53
+Revises: 7e2b4c9a1d36
+Create Date: 2026-10-19 19:24:07.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8d1e6b9f53'
+down_revision = '7e2b4c9a1d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('ebay_listed_price', sa.Numeric(precision=10, scale=2), nullable=True))
+
+
+def downgrade():
+    op.drop_column('book', 'ebay_listed_price')
@@ -0,0 +1,26 @@
+"""Add comparable offer index
+
+Revision ID: 5b9f0e3a8c27
+Revises: c2d7e4f9a613
+Create Date: 2026-10-19 12:41:08.772915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9f0e3a8c27'
+down_revision = 'c2d7e4f9a613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('market_offer', sa.Column('edition_key', sa.String(length=100), nullable=True))
+    op.create_index('ix_market_offer_comparables', 'market_offer', ['isbn', 'edition_key', 'observed_at'])
+
+
+def downgrade():
+    op.drop_index('ix_market_offer_comparables', table_name='market_offer')
+    op.drop_column('market_offer', 'edition_key')
@@ -0,0 +1,24 @@
+"""Add ebay listing id index
+
+Revision ID: 7e2b4c9a1d36
+Revises: 2d8f5a0c6e19
+Create Date: 2026-10-19 18:02:41.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b4c9a1d36'
+down_revision = '2d8f5a0c6e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_book_ebay_listing_id', 'book', ['ebay_listing_id'])
+
+
+def downgrade():
+    op.drop_index('ix_book_ebay_listing_id', table_name='book')
@@ -0,0 +1,52 @@
+"""Add price observations and rollups
+
+Revision ID: 8a4e5b1c7d90
+Revises: 3f1c9a7d2e41
+Create Date: 2026-10-19 10:03:51.502117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e5b1c7d90'
+down_revision = '3f1c9a7d2e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'price_observation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_key', sa.String(length=300), nullable=False),
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('condition', sa.String(length=50), nullable=True),
+        sa.Column('price', sa.Numeric(10, 2), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('observed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_price_observation_item_observed', 'price_observation', ['item_key', 'observed_at'])
+
+    op.create_table(
+        'price_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_key', sa.String(length=300), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('price_sum', sa.Numeric(14, 2), nullable=False),
+        sa.Column('price_min', sa.Numeric(10, 2), nullable=True),
+        sa.Column('price_max', sa.Numeric(10, 2), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('item_key', 'period', 'period_start', name='uq_price_rollup_item_period')
+    )
+
+
+def downgrade():
+    op.drop_table('price_rollup')
+    op.drop_index('ix_price_observation_item_observed', table_name='price_observation')
+    op.drop_table('price_observation')
@@ -0,0 +1,24 @@
+"""Add book sparte
+
+Revision ID: 9c3e6a1f4b72
+Revises: e41b7c9d2f58
+Create Date: 2026-10-19 15:26:51.402337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e6a1f4b72'
+down_revision = 'e41b7c9d2f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book', sa.Column('sparte', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    op.drop_column('book', 'sparte')
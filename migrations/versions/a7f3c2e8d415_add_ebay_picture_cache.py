@@ -0,0 +1,35 @@
+"""Add ebay picture cache
+
+Revision ID: a7f3c2e8d415
+Revises: 4c8d1e6b9f53
+Create Date: 2026-10-19 20:37:55.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7f3c2e8d415'
+down_revision = '4c8d1e6b9f53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ebay_picture',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('source_url', sa.String(length=500), nullable=True),
+        sa.Column('ebay_url', sa.String(length=500), nullable=False),
+        sa.Column('use_by', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash')
+    )
+    op.create_index('ix_ebay_picture_source_url', 'ebay_picture', ['source_url'])
+
+
+def downgrade():
+    op.drop_index('ix_ebay_picture_source_url', table_name='ebay_picture')
+    op.drop_table('ebay_picture')
@@ -0,0 +1,50 @@
+"""Add parsed market offers
+
+Revision ID: c2d7e4f9a613
+Revises: 8a4e5b1c7d90
+Create Date: 2026-10-19 11:20:14.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d7e4f9a613'
+down_revision = '8a4e5b1c7d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'market_offer',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=True),
+        sa.Column('item_key', sa.String(length=300), nullable=False),
+        sa.Column('isbn', sa.String(length=13), nullable=True),
+        sa.Column('price', sa.Numeric(10, 2), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('condition', sa.String(length=100), nullable=True),
+        sa.Column('platform', sa.String(length=100), nullable=True),
+        sa.Column('seller', sa.String(length=255), nullable=True),
+        sa.Column('link', sa.String(length=1000), nullable=True),
+        sa.Column('edition_kind', sa.String(length=20), nullable=False),
+        sa.Column('same_edition', sa.Boolean(), nullable=False),
+        sa.Column('edition', sa.String(length=100), nullable=True),
+        sa.Column('publication_year', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('observed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_market_offer_book_id', 'market_offer', ['book_id'])
+    op.create_index('ix_market_offer_isbn', 'market_offer', ['isbn'])
+    op.create_index('ix_market_offer_item_observed', 'market_offer', ['item_key', 'observed_at'])
+
+
+def downgrade():
+    op.drop_index('ix_market_offer_item_observed', table_name='market_offer')
+    op.drop_index('ix_market_offer_isbn', table_name='market_offer')
+    op.drop_index('ix_market_offer_book_id', table_name='market_offer')
+    op.drop_table('market_offer')
@@ -0,0 +1,41 @@
+"""Add stock sync events
+
+Revision ID: d5a9e1f3b7c2
+Revises: a7f3c2e8d415
+Create Date: 2026-10-19 22:11:30.457781
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a9e1f3b7c2'
+down_revision = 'a7f3c2e8d415'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_sync_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=True),
+        sa.Column('marketplace', sa.String(length=20), nullable=False),
+        sa.Column('sale_ref', sa.String(length=100), nullable=False),
+        sa.Column('sold_at', sa.DateTime(), nullable=False),
+        sa.Column('detected_at', sa.DateTime(), nullable=False),
+        sa.Column('propagated_at', sa.DateTime(), nullable=True),
+        sa.Column('delay_seconds', sa.Float(), nullable=True),
+        sa.Column('ended', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('marketplace', 'sale_ref', name='uq_stock_sync_event_sale')
+    )
+    op.create_index('ix_stock_sync_event_book_id', 'stock_sync_event', ['book_id'])
+    op.create_index('ix_stock_sync_event_propagated_at', 'stock_sync_event', ['propagated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_sync_event_propagated_at', table_name='stock_sync_event')
+    op.drop_index('ix_stock_sync_event_book_id', table_name='stock_sync_event')
+    op.drop_table('stock_sync_event')
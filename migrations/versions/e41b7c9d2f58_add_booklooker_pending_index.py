@@ -0,0 +1,24 @@
+"""Add booklooker pending index
+
+Revision ID: e41b7c9d2f58
+Revises: 5b9f0e3a8c27
+Create Date: 2026-10-19 14:02:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c9d2f58'
+down_revision = '5b9f0e3a8c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_book_booklooker_pending', 'book', ['booklooker_status', 'booklooker_upload_file'])
+
+
+def downgrade():
+    op.drop_index('ix_book_booklooker_pending', table_name='book')